@@ -0,0 +1,97 @@
+"""
+Badge evaluation: BadgeEngine (bulk rebuild once, O(1) reads) versus the
+per-request evaluateBadges approach (linear search of product.json and a
+full filter of repairs.json on every call).
+
+    python benchmarks/bench_badges.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dpp_app'))
+
+from badge_engine import YEAR_SECONDS, BadgeEngine, parse_timestamp  # noqa: E402
+
+BADGES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dpp_app', 'app', 'data', 'badges.json')
+
+
+def synthetic_catalog(size, seed=42):
+    rng = random.Random(seed)
+    products = [{"productId": f"LV-SYN-{i:08d}", "craftsmanshipHours": rng.randint(2, 30)} for i in range(size)]
+    repairs = [{"productId": f"LV-SYN-{rng.randrange(size):08d}", "carbonSavedKg": 1.5} for _ in range(size)]
+    ownership = [
+        {"productId": f"LV-SYN-{i:08d}", "ownership": {
+            "currentOwner": {"clientId": f"CL-{i:06d}"},
+            "firstActivation": {"activatedAt": f"20{rng.randint(15, 26)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00Z"},
+            "transferHistory": [],
+        }}
+        for i in range(size)
+    ]
+    return products, repairs, ownership
+
+
+def evaluate_per_request(badges, products, repairs, product_id, started_at, now):
+    """Port of evaluateBadges"""
+    repair_count = len([r for r in repairs if r['productId'] == product_id])
+    product = next((p for p in products if p['productId'] == product_id), products[0])
+    hours = product.get('craftsmanshipHours') or 0
+    years_owned = (now - parse_timestamp(started_at)) / YEAR_SECONDS
+    achieved = {
+        "first-owner": True,
+        "craftsmanship-heritage": hours >= 10,
+        "sustainability-guardian": repair_count >= 2,
+        "three-year-steward": years_owned >= 3,
+    }
+    return [{**badge, "achieved": achieved.get(badge['id'], badge['achieved'])} for badge in badges]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--reads', type=int, default=100_000)
+    parser.add_argument('--loop-reads', type=int, default=200,
+                        help="Reads timed with the per-request evaluation (it is O(catalog) per read)")
+    args = parser.parse_args()
+
+    with open(BADGES_PATH) as f:
+        badges = json.load(f)
+    now = datetime(2026, 10, 18, tzinfo=timezone.utc).timestamp()
+
+    print(f"{'products':>10} {'rebuild s':>10} {'read µs':>9} {'per-request µs':>15} {'sweep 1y s':>11}")
+    for size in args.sizes:
+        products, repairs, ownership = synthetic_catalog(size)
+        rng = random.Random(size)
+
+        start = time.perf_counter()
+        engine = BadgeEngine(badges, products, repairs, ownership, now=now)
+        rebuild_seconds = time.perf_counter() - start
+
+        ids = [f"LV-SYN-{rng.randrange(size):08d}" for _ in range(args.reads)]
+        start = time.perf_counter()
+        for product_id in ids:
+            engine.badges(product_id)
+        read_us = (time.perf_counter() - start) / len(ids) * 1e6
+
+        sample = [rng.randrange(size) for _ in range(args.loop_reads)]
+        start = time.perf_counter()
+        for i in sample:
+            record = ownership[i]
+            expected = evaluate_per_request(badges, products, repairs, record['productId'],
+                                            record['ownership']['firstActivation']['activatedAt'], now)
+            assert [b['achieved'] for b in expected] == [b['achieved'] for b in engine.badges(record['productId'])]
+        loop_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        start = time.perf_counter()
+        engine.sweep(now + YEAR_SECONDS)
+        sweep_seconds = time.perf_counter() - start
+
+        print(f"{size:>10} {rebuild_seconds:>10.2f} {read_us:>9.2f} {loop_us:>15,.0f} {sweep_seconds:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
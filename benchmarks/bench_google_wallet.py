@@ -0,0 +1,92 @@
+"""
+Google Wallet save-link signing throughput, with a locally generated key
+(nothing is sent to Google).
+
+Compares parsing the key per link against the cached signer, one object
+per JWT against several, and bulk signing across a process pool.
+
+    python benchmarks/bench_google_wallet.py --passes 2000 --workers 1 2 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dpp_app'))
+
+import google_wallet  # noqa: E402
+
+ISSUER_ID = "3388000000012345678"
+
+
+def synthetic_products(count):
+    return [
+        {
+            "productId": f"LV-SYN-{i:08d}",
+            "cert": f"LV-DPP-{i:08X}",
+            "name": "Tailored Wool Jacket",
+            "owner": f"CL-{i:06d}",
+            "blockchainHash": f"0x{i:064x}",
+            "verificationUrl": f"http://localhost:3000/dpp/certificate?verify=LV-DPP-{i:08X}",
+        }
+        for i in range(count)
+    ]
+
+
+def timed(label, passes, fn):
+    start = time.perf_counter()
+    links = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<44} {elapsed:>8.2f} s {passes / elapsed:>10,.0f} passes/s {links:>7} links")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--passes', type=int, default=2000)
+    parser.add_argument('--objects-per-link', type=int, nargs='+', default=[1, 5, 10])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        key_path = os.path.join(directory, 'key.json')
+        with open(key_path, 'w') as f:
+            json.dump(google_wallet.generate_service_account(), f)
+
+        products = synthetic_products(args.passes)
+        objects = [google_wallet.pass_object(product, ISSUER_ID) for product in products]
+        classes = (google_wallet.pass_class(ISSUER_ID),)
+        print(f"{args.passes} passes, cpus={os.cpu_count()}")
+
+        def parse_key_every_time():
+            sample = objects[:max(1, args.passes // 10)]
+            for obj in sample:
+                with open(key_path) as f:
+                    signer = google_wallet.WalletSigner(json.load(f))
+                google_wallet.save_link(signer, [obj], classes)
+            return len(sample)
+        start = time.perf_counter()
+        count = parse_key_every_time()
+        elapsed = time.perf_counter() - start
+        print(f"  {'key parsed per link, 1 object/link':<44} {elapsed:>8.2f} s {count / elapsed:>10,.0f} passes/s "
+              f"(sample of {count})")
+
+        signer = google_wallet.load_signer(key_path)
+        for per_link in args.objects_per_link:
+            timed(f"cached key, {per_link} object(s)/link", args.passes,
+                  lambda: len(google_wallet.save_links(signer, objects, ISSUER_ID, max_objects=per_link)))
+
+        batches = list(google_wallet.batch_objects(objects, max_objects=1))
+        claims_list = [google_wallet.save_claims(signer, batch, classes) for batch in batches]
+        for workers in args.workers:
+            timed(f"sign_bulk, 1 object/link, {workers} worker(s)", args.passes,
+                  lambda: len(google_wallet.sign_bulk(key_path, claims_list, workers)))
+
+        token = google_wallet.save_link(signer, objects[:3], classes)[len(google_wallet.SAVE_URL_BASE):]
+        claims = google_wallet.verify_jwt(token, signer.public_key())
+        assert [obj['id'] for obj in claims['payload']['genericObjects']] == [obj['id'] for obj in objects[:3]]
+
+
+if __name__ == '__main__':
+    main()
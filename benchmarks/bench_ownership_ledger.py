@@ -0,0 +1,87 @@
+"""
+Ownership transfer throughput as the catalog grows: append-only ledger
+versus rewriting the whole ownership.json on every transfer.
+
+    python benchmarks/bench_ownership_ledger.py --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dpp_app'))
+
+from ownership_ledger import OwnershipLedger, new_ownership_record, now_iso  # noqa: E402
+
+
+def synthetic_catalog(size):
+    return [
+        new_ownership_record(f"LV-SYN-{i:08d}", {
+            "currentOwner": {"clientId": f"CL-{i:06d}"},
+            "transactionId": f"TX-{i:08d}",
+            "transferDate": "2025-03-18T15:01:00Z",
+        })
+        for i in range(size)
+    ]
+
+
+def bench_ledger(directory, catalog, transfers):
+    snapshot = os.path.join(directory, 'ownership.json')
+    with open(snapshot, 'w') as f:
+        json.dump(catalog, f)
+    ledger = OwnershipLedger(snapshot, snapshot + '.log', compact_every=10 ** 9, compact_interval=3600)
+    product_ids = [random.choice(catalog)['productId'] for _ in range(transfers)]
+
+    start = time.perf_counter()
+    for i, product_id in enumerate(product_ids):
+        ledger.transfer(product_id, f"CL-NEW-{i}", f"TX-NEW-{i}")
+    elapsed = time.perf_counter() - start
+    ledger.close()
+    return transfers / elapsed
+
+
+def bench_rewrite(directory, catalog, transfers):
+    """The current Next.js approach: read, findIndex, mutate, rewrite everything"""
+    path = os.path.join(directory, 'ownership-rewrite.json')
+    with open(path, 'w') as f:
+        json.dump(catalog, f, indent=2)
+    product_ids = [random.choice(catalog)['productId'] for _ in range(transfers)]
+
+    start = time.perf_counter()
+    for i, product_id in enumerate(product_ids):
+        with open(path) as f:
+            data = json.load(f)
+        index = next(n for n, item in enumerate(data) if item['productId'] == product_id)
+        data[index]['ownership']['currentOwner'] = {"clientId": f"CL-NEW-{i}"}
+        data[index]['ownership']['transferHistory'].append({"toClientId": f"CL-NEW-{i}", "transferDate": now_iso()})
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+    elapsed = time.perf_counter() - start
+    return transfers / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--transfers', type=int, default=500)
+    parser.add_argument('--rewrite-max-size', type=int, default=10000,
+                        help="Skip the whole-file rewrite baseline above this catalog size")
+    args = parser.parse_args()
+
+    print(f"{'catalog':>10} {'ledger tx/s':>12} {'rewrite tx/s':>13}")
+    for size in args.sizes:
+        catalog = synthetic_catalog(size)
+        with tempfile.TemporaryDirectory() as directory:
+            ledger_rate = bench_ledger(directory, catalog, args.transfers)
+            rewrite = "skipped"
+            if size <= args.rewrite_max_size:
+                rewrite_transfers = max(10, args.transfers // 20)
+                rewrite = f"{bench_rewrite(directory, catalog, rewrite_transfers):.0f}"
+        print(f"{size:>10} {ledger_rate:>12.0f} {rewrite:>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Apple Wallet .pkpass build throughput, with locally generated certificates
+(nothing is sent to Apple or AirWallet).
+
+Compares re-reading the certificates and re-rendering the images per pass
+against the cached builder, bulk building across a process pool, and the
+certificate index against a list-and-scan lookup.
+
+    python benchmarks/bench_pkpass.py --passes 2000 --workers 1 2 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dpp_app'))
+
+import apple_wallet  # noqa: E402
+
+PASS_TYPE_ID = "pass.com.louisvuitton.dpp"
+TEAM_ID = "LVDPPDEV01"
+THUMBNAIL = os.path.join(apple_wallet.PUBLIC_DIR, 'louis-vuitton-keepall-bag.jpg')
+
+
+def synthetic_products(count):
+    return [
+        {
+            "productId": f"LV-SYN-{i:08d}",
+            "cert": f"LV-DPP-{i:08X}",
+            "name": "Tailored Wool Jacket",
+            "owner": f"CL-{i:06d}",
+            "blockchainHash": f"0x{i:064x}",
+            "verificationUrl": f"http://localhost:3000/dpp/certificate?verify=LV-DPP-{i:08X}",
+        }
+        for i in range(count)
+    ]
+
+
+def timed(label, passes, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<48} {elapsed:>8.2f} s {passes / elapsed:>10,.0f} passes/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--passes', type=int, default=2000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--lookups', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {}
+        for name, data in apple_wallet.generate_certificates(PASS_TYPE_ID, TEAM_ID).items():
+            paths[name] = os.path.join(directory, name)
+            with open(paths[name], 'wb') as f:
+                f.write(data)
+        config = apple_wallet.builder_config(paths['pass-cert.pem'], paths['pass-key.pem'], paths['wwdr.pem'],
+                                             PASS_TYPE_ID, TEAM_ID)
+        products = synthetic_products(args.passes)
+        items = [(product, THUMBNAIL) for product in products]
+        print(f"{args.passes} passes with icon + thumbnail, cpus={os.cpu_count()}")
+
+        sample = items[:max(1, args.passes // 20)]
+
+        def uncached():
+            # What a per-pass service does: load the signer and render/hash every image each time
+            for product, thumbnail in sample:
+                signer = apple_wallet.PassSigner(*(apple_wallet._read(paths[name])
+                                                   for name in ('pass-cert.pem', 'pass-key.pem', 'wwdr.pem')))
+                assets = apple_wallet.AssetBundle({
+                    **apple_wallet.render_image_assets('icon', apple_wallet.DEFAULT_ICON),
+                    **apple_wallet.render_image_assets('thumbnail', thumbnail),
+                })
+                apple_wallet.pkpass_bytes(apple_wallet.pass_json(product, PASS_TYPE_ID, TEAM_ID), assets, signer)
+        elapsed = timed(f"uncached assets + signer (sample of {len(sample)})", len(sample), uncached)
+
+        builder = apple_wallet.make_builder(config)
+        builder.assets_for(THUMBNAIL)
+        cached = timed("cached assets + signer", args.passes,
+                       lambda: [builder.build(product, thumbnail) for product, thumbnail in items])
+        print(f"  {'speedup':<48} {elapsed / len(sample) / (cached / args.passes):>8.1f}x")
+
+        for workers in args.workers:
+            timed(f"build_bulk, {workers} worker(s)", args.passes,
+                  lambda: apple_wallet.build_bulk(config, items, workers))
+
+        index = apple_wallet.PassIndex(os.path.join(directory, 'passes'))
+        results = [builder.build(product) for product in products]
+        start = time.perf_counter()
+        for product, (serial, data, digest) in zip(products, results):
+            product_id, certificate_id = apple_wallet.product_ids(product)
+            index.put(certificate_id, product_id, serial, data, digest)
+        print(f"  {'index.put (write .pkpass + append index)':<48} {time.perf_counter() - start:>8.2f} s")
+
+        wanted = [products[(i * 7919) % len(products)]['cert'] for i in range(args.lookups)]
+        entries = list(index._by_certificate.values())
+        start = time.perf_counter()
+        for certificate_id in wanted:
+            next(entry for entry in entries if entry['certificateId'] == certificate_id)
+        scan = (time.perf_counter() - start) / len(wanted)
+        start = time.perf_counter()
+        for certificate_id in wanted:
+            index.find(certificate_id)
+        lookup = (time.perf_counter() - start) / len(wanted)
+        print(f"  {'list-and-scan lookup':<48} {scan * 1e6:>8.2f} us")
+        print(f"  {'PassIndex.find':<48} {lookup * 1e6:>8.2f} us")
+
+        data = open(index.path(index.find(products[0]['cert'])), 'rb').read()
+        assert apple_wallet.read_pkpass(data)['serialNumber'] == apple_wallet.serial_number(products[0]['cert'])
+        assert len(apple_wallet.PassIndex(index.directory)) == len(products)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Throughput of bulk QR generation as the process pool grows.
+
+    python benchmarks/bench_qr_batch.py --items 2000
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dpp_app'))
+
+import qr_batch  # noqa: E402
+
+
+def synthetic_products(count):
+    return [
+        {
+            "id": f"LV-JKT-4521-{i:06d}",
+            "cert": f"LV-DPP-{i:06X}",
+            "verificationUrl": f"http://localhost:3000/dpp/certificate?verify=LV-CERT-{i:06d}",
+        }
+        for i in range(count)
+    ]
+
+
+def run(products, workers):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Warm the pool so process start-up is not measured
+        list(executor.map(qr_batch.render_product, range(workers), products[:workers]))
+        start = time.perf_counter()
+        rendered = sum(1 for _ in qr_batch.iter_rendered(products, executor, workers=workers))
+        elapsed = time.perf_counter() - start
+    return rendered / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    products = synthetic_products(args.items)
+    worker_counts = sorted({1, 2, 4, 8, 16, args.max_workers} & set(range(1, args.max_workers + 1)))
+
+    print(f"{'workers':>8} {'items/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in worker_counts:
+        rate = run(products, workers)
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>10.0f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
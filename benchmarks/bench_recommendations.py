@@ -0,0 +1,121 @@
+"""
+Quiz recommendation latency over a synthetic catalog (product.json,
+materials.json and sustainability.json shaped records).
+
+Compares a Python loop scoring every product with the vectorized top-k,
+cold (first time a combination of answers is seen) and memoized.
+
+    python benchmarks/bench_recommendations.py --sizes 1000 10000 100000
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'demo_app_elvia'))
+
+import recommendation_engine as reco  # noqa: E402
+
+CATEGORIES = [
+    ("Leather Goods – Handbags", ["Alma", "Speedy", "Neverfull", "Pochette"]),
+    ("Leather Goods – Travel", ["Keepall", "Horizon", "Duffle"]),
+    ("Ready-to-Wear – Outerwear", ["Puffer", "Parka", "Bomber Jacket", "Trench"]),
+    ("Ready-to-Wear – Knitwear", ["Wool Sweater", "Cashmere Cardigan"]),
+]
+MATERIALS = ["Calfskin Leather", "Epi Leather", "Monogram Canvas", "Econyl Regenerated Nylon", "RDS Down",
+             "Virgin Wool", "Elastane", "Cotton"]
+
+# Every combination the quiz can produce (see app.py)
+QUIZ = {
+    "Maroquinerie Iconique": (["Quotidien", "Voyage"], ["Cuir Épi", "Toile Monogram"]),
+    "Prêt-à-porter Technique": (["Performance Froid", "Mi-saison"], ["Nylon Econyl®", "Duvet RDS"]),
+}
+ANSWERS = [
+    {"type": t, "usage": u, "matiere": m, "valeur": v}
+    for t, (usages, matieres) in QUIZ.items()
+    for u, m, v in itertools.product(usages, matieres, reco.QUIZ_VALEURS)
+]
+
+
+def synthetic_catalog(count, rng):
+    products, materials, sustainability = [], [], []
+    for i in range(count):
+        category, names = rng.choice(CATEGORIES)
+        product_id = f"LV-SYN-{i:08d}"
+        main, second = rng.sample(MATERIALS, 2)
+        share = rng.choice((100, 90, 70, 55))
+        composition = [{"material": main, "percentage": share}]
+        if share < 100:
+            composition.append({"material": second, "percentage": 100 - share})
+        products.append({"productId": product_id, "name": f"{rng.choice(names)} {i}", "category": category})
+        materials.append({"productId": product_id, "materials": {"main": {"composition": composition}}})
+        sustainability.append({"productId": product_id, "environmentalImpact": {
+            "carbonFootprintKgCO2e": round(rng.uniform(5, 40), 1),
+            "circularityScore": round(rng.uniform(4, 10), 1),
+        }})
+    return reco.join_catalog(products, materials, sustainability)
+
+
+def loop_top(items, answers, k):
+    # Ce que ferait une boucle Python : chaque article noté un par un
+    w = reco.RecommendationEngine.weights(answers).tolist()
+    scored = []
+    for index, row in enumerate(ENGINE.features.tolist()):
+        scored.append((sum(a * b for a, b in zip(row, w)), index))
+    scored.sort(key=lambda pair: (-pair[0], pair[1]))
+    return scored[:k]
+
+
+ENGINE = None
+
+
+def main():
+    global ENGINE
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('-k', type=int, default=3)
+    parser.add_argument('--rounds', type=int, default=20, help="Cold passes over every quiz combination")
+    parser.add_argument('--loop-limit', type=int, default=10_000, help="Largest size for the Python loop baseline")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    print(f"{len(ANSWERS)} quiz combinations, k={args.k}")
+    print(f"{'SKUs':>9} {'build':>9} {'loop':>11} {'cold top-k':>11} {'p99 cold':>10} {'memoized':>10}")
+    for size in args.sizes:
+        items = synthetic_catalog(size, rng)
+        start = time.perf_counter()
+        ENGINE = engine = reco.RecommendationEngine(items)
+        build = time.perf_counter() - start
+
+        cold = []
+        for _ in range(args.rounds):
+            for answers in ANSWERS:
+                key = tuple(answers.get(q) for q in reco.QUESTIONS)
+                start = time.perf_counter()
+                result = engine._compute_top(key, args.k)
+                cold.append(time.perf_counter() - start)
+        cold.sort()
+
+        for answers in ANSWERS:
+            engine.top(answers, args.k)
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for answers in ANSWERS:
+                engine.top(answers, args.k)
+        memoized = (time.perf_counter() - start) / (args.rounds * len(ANSWERS))
+
+        loop = ''
+        if size <= args.loop_limit:
+            start = time.perf_counter()
+            expected = loop_top(items, ANSWERS[-1], args.k)
+            loop = f"{(time.perf_counter() - start) * 1e3:>9.2f}ms"
+            assert [i for _, i in expected] == [i for i, _ in engine.top(ANSWERS[-1], args.k)], (expected, result)
+
+        print(f"{size:>9,} {build:>8.2f}s {loop:>11} {sum(cold) / len(cold) * 1e3:>9.3f}ms "
+              f"{cold[int(len(cold) * 0.99) - 1] * 1e3:>8.3f}ms {memoized * 1e6:>8.2f}us")
+
+
+if __name__ == '__main__':
+    main()
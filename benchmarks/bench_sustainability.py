@@ -0,0 +1,92 @@
+"""
+Fleet sustainability metrics: vectorized SustainabilityEngine versus a
+per-item loop that mirrors calculateEnvironmentalImpact (linear find over
+sustainability.json, repair filter per call).
+
+    python benchmarks/bench_sustainability.py --products 1000 --items 10000 100000 1000000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dpp_app'))
+
+from sustainability_engine import IMPACT_FIELDS, SustainabilityEngine, to_datetime64  # noqa: E402
+
+NOW = datetime(2026, 10, 18, tzinfo=timezone.utc)
+
+
+def synthetic_data(products, items, seed=42):
+    rng = random.Random(seed)
+    sustainability = [
+        {"productId": f"LV-SYN-{i:08d}",
+         "environmentalImpact": {"carbonFootprintKgCO2e": round(rng.uniform(5, 40), 1)}}
+        for i in range(products)
+    ]
+    repairs = [
+        {"productId": f"LV-SYN-{rng.randrange(products):08d}", "carbonSavedKg": round(rng.uniform(0.5, 5), 1)}
+        for _ in range(products * 2)
+    ]
+    product_ids = [f"LV-SYN-{rng.randrange(products):08d}" for _ in range(items)]
+    start_dates = [
+        (NOW - timedelta(minutes=rng.randrange(10 * 365 * 24 * 60))).strftime('%Y-%m-%dT%H:%M:%SZ')
+        for _ in range(items)
+    ]
+    return sustainability, repairs, product_ids, start_dates
+
+
+def loop_impact(sustainability, repairs, product_id, start_date):
+    """Line-by-line port of calculateEnvironmentalImpact"""
+    data = next((s for s in sustainability if s['productId'] == product_id), sustainability[0])
+    base = data['environmentalImpact'].get('carbonFootprintKgCO2e') or 14.8
+    start = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+    duration_days = math.floor((NOW - start).total_seconds() * 1000 / (1000 * 60 * 60 * 24))
+    duration_years = duration_days / 365
+    saved = sum(r['carbonSavedKg'] for r in repairs if r['productId'] == product_id)
+    adjusted = max(0, base - saved)
+    daily = adjusted / duration_days * 1000 if duration_days > 0 else 0
+    fast_fashion_total = 24.8 * max(duration_years, 1)
+    lv_total = adjusted / max(duration_years, 1)
+    comparison = math.floor((fast_fashion_total - lv_total) / fast_fashion_total * 100 + 0.5)
+    return base, saved, adjusted, duration_years, daily, comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--items', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--loop-sample', type=int, default=2000,
+                        help="Items timed with the per-item loop (extrapolated to the full batch)")
+    args = parser.parse_args()
+
+    now = to_datetime64(NOW.strftime('%Y-%m-%dT%H:%M:%S'))
+    print(f"{'items':>10} {'engine s':>10} {'items/s':>12} {'loop s (est)':>14} {'speedup':>9}")
+    for items in args.items:
+        sustainability, repairs, product_ids, start_dates = synthetic_data(args.products, items)
+
+        start = time.perf_counter()
+        engine = SustainabilityEngine(sustainability, repairs)
+        batch = engine.impact_batch(product_ids, start_dates, now=now)
+        engine_seconds = time.perf_counter() - start
+
+        sample = min(items, args.loop_sample)
+        start = time.perf_counter()
+        expected = [loop_impact(sustainability, repairs, product_ids[i], start_dates[i]) for i in range(sample)]
+        loop_seconds = (time.perf_counter() - start) * items / sample
+
+        for i, row in enumerate(expected):
+            got = tuple(batch[field][i] for field in IMPACT_FIELDS)
+            assert np.allclose(got, row), (product_ids[i], got, row)
+
+        print(f"{items:>10} {engine_seconds:>10.3f} {items / engine_seconds:>12,.0f} "
+              f"{loop_seconds:>14.2f} {loop_seconds / engine_seconds:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
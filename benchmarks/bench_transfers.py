@@ -0,0 +1,76 @@
+"""
+Transfer request lookup, claim and expiry latency as pending transfers grow.
+
+Compares TransferService (in memory, no log) with the transfer.service.ts
+approach of parsing one JSON blob and scanning it on every lookup.
+
+    python benchmarks/bench_transfers.py --sizes 1000 10000 100000 500000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dpp_app'))
+
+from transfer_service import TransferService  # noqa: E402
+
+NOW = 1_800_000_000.0
+
+
+def per_call_us(fn, args):
+    start = time.perf_counter()
+    for arg in args:
+        fn(arg)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 500_000])
+    parser.add_argument('--lookups', type=int, default=2_000)
+    parser.add_argument('--scan-limit', type=int, default=10_000,
+                        help="Largest size for the JSON blob + scan baseline")
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    print(f"{'pending':>9} {'create/s':>10} {'by code':>9} {'by id':>9} {'owner':>9} {'claim':>9} "
+          f"{'sweep/s':>10} {'blob scan':>11}")
+    for size in args.sizes:
+        service = TransferService(ttl=3600)
+        start = time.perf_counter()
+        created = [service.create(f"P{i}", f"C{i}", f"CL-{i % (size // 4 + 1)}", now=NOW + i * 1e-3)
+                   for i in range(size)]
+        create_rate = size / (time.perf_counter() - start)
+
+        sample = [created[rng.randrange(size)] for _ in range(args.lookups)]
+        by_code = per_call_us(lambda t: service.get_by_code(t['transferCode'], now=NOW), sample)
+        by_id = per_call_us(lambda t: service.get(t['transferId'], now=NOW), sample)
+        by_owner = per_call_us(lambda t: service.pending_for_owner(t['currentOwnerId'], now=NOW), sample)
+
+        claimable = {t['transferId']: t for t in sample}.values()
+
+        def claim(t):
+            service.approve(t['transferId'], t['approvalToken'], now=NOW)
+            service.complete(t['transferId'], "CL-NEW", now=NOW)
+        claim_us = per_call_us(claim, list(claimable))
+
+        start = time.perf_counter()
+        expired = service.sweep(now=NOW + 3600 + size)
+        sweep_rate = expired / (time.perf_counter() - start)
+        assert service.stats()['live'] == 0
+
+        scan = ''
+        if size <= args.scan_limit:
+            blob = json.dumps(created)
+            codes = [t['transferCode'] for t in sample[:max(1, args.lookups // 20)]]
+            scan_us = per_call_us(lambda code: next(t for t in json.loads(blob) if t['transferCode'] == code), codes)
+            scan = f"{scan_us:>9.0f}us"
+        print(f"{size:>9,} {create_rate:>10,.0f} {by_code:>7.2f}us {by_id:>7.2f}us {by_owner:>7.2f}us "
+              f"{claim_us:>7.2f}us {sweep_rate:>10,.0f} {scan:>11}")
+
+
+if __name__ == '__main__':
+    main()
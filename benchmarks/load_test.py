@@ -0,0 +1,134 @@
+"""
+Local load test for the wallet service.
+
+Starts the service in the requested mode(s), hammers one route with
+concurrent keep-alive clients and reports p50/p99 latency and req/s.
+
+    python benchmarks/load_test.py --mode both --path /preview-wallet --concurrency 32 --duration 10
+    python benchmarks/load_test.py --url http://127.0.0.1:5000/health   # against a running server
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+DPP_APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dpp_app')
+
+SERVER_COMMANDS = {
+    # Old mode: Flask's built-in threaded server
+    'flask': lambda port: [sys.executable, '-c', f"import wallet_backend; wallet_backend.app.run(port={port})"],
+    'asgi': lambda port: [sys.executable, 'wallet_asgi.py', '--port', str(port)],
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def wait_until_healthy(host, port, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def run_load(host, port, path, concurrency, duration):
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        local_latencies = []
+        local_statuses = Counter()
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                local_statuses[response.status] += 1
+            except (OSError, http.client.HTTPException):
+                local_statuses['error'] += 1
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+                continue
+            local_latencies.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "reqPerSec": len(latencies) / elapsed,
+        "p50Ms": percentile(latencies, 0.50) * 1000,
+        "p99Ms": percentile(latencies, 0.99) * 1000,
+        "statuses": dict(statuses),
+    }
+
+
+def print_report(label, report):
+    print(f"{label:>8}: {report['reqPerSec']:8.1f} req/s   p50 {report['p50Ms']:7.2f} ms   "
+          f"p99 {report['p99Ms']:7.2f} ms   {report['requests']} requests {report['statuses']}")
+
+
+def run_mode(mode, port, args):
+    server = subprocess.Popen(SERVER_COMMANDS[mode](port), cwd=DPP_APP_DIR,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_healthy('127.0.0.1', port):
+            print(f"{mode:>8}: server did not start")
+            return
+        print_report(mode, run_load('127.0.0.1', port, args.path, args.concurrency, args.duration))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=['flask', 'asgi', 'both'], default='both')
+    parser.add_argument('--url', help="Load-test an already running server instead")
+    parser.add_argument('--path', default='/preview-wallet')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    if args.url:
+        url = urlsplit(args.url)
+        path = url.path + (f"?{url.query}" if url.query else "")
+        print_report('target', run_load(url.hostname, url.port or 80, path or '/', args.concurrency, args.duration))
+        return
+
+    modes = ['flask', 'asgi'] if args.mode == 'both' else [args.mode]
+    for mode in modes:
+        run_mode(mode, args.port, args)
+
+
+if __name__ == '__main__':
+    main()
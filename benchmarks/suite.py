@@ -0,0 +1,330 @@
+"""
+Offline benchmark suite for the wallet service, QR rendering, the ELVIA
+agent and passport lookups.
+
+Each case is timed in rounds (iterations per round are calibrated so a
+round lasts about --round-time seconds) and reported as the median and
+best time per operation. Results are written as JSON; --compare checks
+them against a stored baseline and exits with status 1 if any case got
+slower by more than --threshold.
+
+    python benchmarks/suite.py -o benchmarks/baseline.json
+    python benchmarks/suite.py --compare benchmarks/baseline.json
+    python benchmarks/suite.py --only qr template --quick
+    python benchmarks/suite.py --only catalog --catalog-sizes 1000 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'dpp_app'))
+sys.path.insert(0, os.path.join(ROOT, 'demo_app_elvia'))
+
+GROUPS = ('qr', 'template', 'flask', 'agent', 'catalog')
+
+
+def measure(fn, round_time=0.2, rounds=5):
+    """Per-operation timings of fn() in seconds: (median, best, iterations per round)"""
+    fn()  # warm-up
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= round_time / 5 or number >= 1_000_000:
+            break
+        number *= 10
+    number = max(1, int(number * round_time / max(elapsed, 1e-9)))
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples), min(samples), number
+
+
+class Suite:
+    def __init__(self, round_time, rounds):
+        self.round_time = round_time
+        self.rounds = rounds
+        self.results = {}
+
+    def bench(self, name, fn, **params):
+        median, best, number = measure(fn, self.round_time, self.rounds)
+        self.results[name] = {
+            "medianUs": round(median * 1e6, 3),
+            "bestUs": round(best * 1e6, 3),
+            "opsPerSec": round(1 / median, 1),
+            "iterations": number,
+            **({"params": params} if params else {}),
+        }
+        print(f"  {name:<52} {median * 1e6:>12,.1f} µs  {1 / median:>12,.0f} ops/s", flush=True)
+
+    def record(self, name, seconds, **params):
+        """One-off timing (e.g. a build step), stored like a bench result"""
+        self.results[name] = {
+            "medianUs": round(seconds * 1e6, 3),
+            "bestUs": round(seconds * 1e6, 3),
+            "opsPerSec": round(1 / seconds, 3) if seconds else None,
+            "iterations": 1,
+            **({"params": params} if params else {}),
+        }
+        print(f"  {name:<52} {seconds:>12,.2f} s", flush=True)
+
+
+# -- cases -----------------------------------------------------------------
+
+def bench_qr(suite, quick):
+    import wallet_backend
+
+    url_lengths = (40, 120) if quick else (40, 120, 300)
+    box_sizes = (10,) if quick else (5, 10, 20)
+    for length in url_lengths:
+        prefix = wallet_backend.qr_batch.VERIFICATION_URL_BASE
+        prefix += 'X' * max(0, length - len(prefix) - 8)
+        for box in box_sizes:
+            counter = iter(range(10 ** 9))
+            # Fresh URL every call: measures rendering, not the cache
+            suite.bench(f"qr.base64.cold.url{length}.box{box}",
+                        lambda: wallet_backend.generate_qr_code_base64(f"{prefix}{next(counter):08d}", box_size=box),
+                        urlLength=length, boxSize=box)
+        url = f"{prefix}{0:08d}"
+        suite.bench(f"qr.base64.cached.url{length}",
+                    lambda: wallet_backend.generate_qr_code_base64(url), urlLength=length)
+        counter = iter(range(10 ** 9))
+        suite.bench(f"qr.svg.cold.url{length}",
+                    lambda: wallet_backend.generate_qr_code_base64(f"{prefix}{next(counter):08d}", fmt='svg'),
+                    urlLength=length)
+
+
+def bench_template(suite, quick):
+    from flask import render_template_string
+    import wallet_backend
+
+    app = wallet_backend.app
+    with app.test_request_context('/preview-wallet'):
+        data = wallet_backend.build_preview_data('inline', 'png', lambda cert, ext: f"/qr/{cert}.{ext}")
+        # What preview_wallet used to do: compile HTML_TEMPLATE on every request
+        suite.bench("template.render_template_string",
+                    lambda: render_template_string(wallet_backend.HTML_TEMPLATE, data=data))
+        suite.bench("template.precompiled", lambda: wallet_backend.wallet_template.render(data=data))
+        suite.bench("template.build_preview_data.inline",
+                    lambda: wallet_backend.build_preview_data('inline', 'png', lambda cert, ext: ''))
+
+
+def bench_flask(suite, quick):
+    import wallet_backend
+
+    client = wallet_backend.app.test_client()
+
+    def get(path):
+        def call():
+            response = client.get(path)
+            response.get_data()
+            assert response.status_code == 200, (path, response.status_code)
+        return call
+
+    suite.bench("flask.preview-wallet", get('/preview-wallet'))
+    suite.bench("flask.preview-wallet.qr-link", get('/preview-wallet?qr=link'))
+    suite.bench("flask.generate-wallet-link", get('/generate-wallet-link'))
+    suite.bench("flask.health", get('/health'))
+
+
+def bench_agent(suite, quick):
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langchain_core.messages import AIMessage, HumanMessage
+    from elvia_agent import ElviaAgent
+    from response_cache import ResponseCache
+
+    llm = FakeListChatModel(responses=["Avec plaisir, Alex. Votre Alma BB mérite un entretien annuel."])
+    history = [
+        HumanMessage(content="Bonjour ELVIA"),
+        AIMessage(content="Bonjour Alex, comment puis-je vous aider ?"),
+        HumanMessage(content="Comment entretenir mon sac ?"),
+        AIMessage(content="Un chiffon doux et sec suffit pour le cuir Épi."),
+    ]
+
+    uncached = ElviaAgent("offline", "Alex", llm=llm, cache=None)
+    suite.bench("agent.ask.uncached", lambda: uncached.ask("Quand faire réviser mon Alma ?", history))
+
+    cached = ElviaAgent("offline", "Alex", llm=llm, cache=ResponseCache())
+    suite.bench("agent.ask.cached", lambda: cached.ask("Quand faire réviser mon Alma ?", history))
+
+    counter = iter(range(10 ** 9))
+    suite.bench("agent.ask.cache-miss",
+                lambda: cached.ask(f"Question numéro {next(counter)} ?", history))
+
+
+def synthetic_data_dir(directory, size, seed=42):
+    """app/data-shaped JSON files with size passports"""
+    rng = random.Random(seed)
+    products, certificates, ownership, nfc = [], [], [], []
+    for i in range(size):
+        product_id = f"LV-SYN-{i:08d}"
+        certificate_id = f"LV-DPP-{i:08X}"
+        nfc_uid = f"NFC-{i:012X}"
+        owner_id = f"CL-{rng.randrange(size):08d}"
+        products.append({
+            "productId": product_id, "name": "Tailored Wool Jacket", "styleCode": "LV-JKT-4521",
+            "digitalId": certificate_id, "authenticationStatus": "AUTHENTIC",
+            "craftsmanshipHours": rng.randint(2, 30),
+        })
+        certificates.append({"certificate": {
+            "certificateId": certificate_id, "productId": product_id, "transactionId": f"TX-{i:08d}",
+            "blockchainHash": None, "nfcPublicKey": nfc_uid, "issuedAt": "2025-03-18T14:32:00Z",
+        }})
+        ownership.append({"productId": product_id, "ownership": {
+            "status": "ACTIVE", "currentOwner": {"clientId": owner_id},
+            "firstActivation": {"transactionId": f"TX-{i:08d}", "activatedAt": "2025-03-18T15:01:00Z"},
+            "transferHistory": [],
+        }})
+        nfc.append({
+            "nfcUid": nfc_uid, "productId": product_id, "certificateId": certificate_id,
+            "blockchainHash": f"0x{i:064x}", "ownerId": owner_id, "status": "ACTIVE",
+        })
+    for name, rows in (('product', products), ('certificate', certificates),
+                       ('ownership', ownership), ('nfc_mapping', nfc)):
+        with open(os.path.join(directory, f'{name}.json'), 'w') as f:
+            json.dump(rows, f)
+
+
+def bench_catalog(suite, quick, sizes):
+    from passport_store import PassportStore, build_store
+
+    for size in sizes:
+        directory = tempfile.mkdtemp(prefix='dpp-bench-')
+        try:
+            synthetic_data_dir(directory, size)
+            store_path = os.path.join(directory, 'passports.bin')
+            start = time.perf_counter()
+            build_store(directory, store_path)
+            suite.record(f"catalog.{size}.build_store", time.perf_counter() - start, passports=size)
+
+            store = PassportStore(store_path)
+            rng = random.Random(size)
+            ids = [rng.randrange(size) for _ in range(10_000)]
+            keys = iter(ids * 10 ** 3)
+            suite.bench(f"catalog.{size}.by_product_id",
+                        lambda: store.by_product_id(f"LV-SYN-{next(keys):08d}"), passports=size)
+            suite.bench(f"catalog.{size}.by_certificate_id",
+                        lambda: store.by_certificate_id(f"LV-DPP-{next(keys):08X}"), passports=size)
+            suite.bench(f"catalog.{size}.by_nfc_tag",
+                        lambda: store.by_nfc_tag(f"NFC-{next(keys):012X}"), passports=size)
+            suite.bench(f"catalog.{size}.miss",
+                        lambda: store.by_product_id("LV-SYN-UNKNOWN"), passports=size)
+
+            if size <= 100_000:
+                # The frontend's approach: load the JSON and find() through it
+                with open(os.path.join(directory, 'product.json')) as f:
+                    products = json.load(f)
+
+                def linear_find():
+                    product_id = f"LV-SYN-{next(keys):08d}"
+                    return next(p for p in products if p['productId'] == product_id)
+
+                suite.bench(f"catalog.{size}.linear_find", linear_find, passports=size)
+            del store
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+# -- results ---------------------------------------------------------------
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "createdAt": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison table; returns the names of regressed cases"""
+    regressions = []
+    print(f"\n{'case':<52} {'baseline µs':>12} {'now µs':>12} {'change':>9}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<52} {'-':>12} {result['medianUs']:>12,.1f} {'new':>9}")
+            continue
+        change = result['medianUs'] / before['medianUs'] - 1 if before['medianUs'] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '  improved'
+        print(f"{name:<52} {before['medianUs']:>12,.1f} {result['medianUs']:>12,.1f} {change:>+8.0%}{flag}")
+    for name in baseline:
+        if name not in results:
+            print(f"{name:<52} {baseline[name]['medianUs']:>12,.1f} {'-':>12} {'missing':>9}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=list(GROUPS))
+    parser.add_argument('--quick', action='store_true', help="Fewer parameter combinations and smaller catalogs")
+    parser.add_argument('--catalog-sizes', type=int, nargs='+', default=None,
+                        help="Passports per synthetic catalog (default 10^3..10^6, or 10^3..10^4 with --quick)")
+    parser.add_argument('--round-time', type=float, default=0.2)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('-o', '--output', help="Write results JSON here (e.g. to store a new baseline)")
+    parser.add_argument('--compare', metavar='BASELINE', help="Baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Relative slowdown of the median that counts as a regression (default 0.25)")
+    args = parser.parse_args()
+
+    sizes = args.catalog_sizes or ([1000, 10_000] if args.quick else [1000, 10_000, 100_000, 1_000_000])
+    suite = Suite(args.round_time, args.rounds)
+    runners = {
+        'qr': lambda: bench_qr(suite, args.quick),
+        'template': lambda: bench_template(suite, args.quick),
+        'flask': lambda: bench_flask(suite, args.quick),
+        'agent': lambda: bench_agent(suite, args.quick),
+        'catalog': lambda: bench_catalog(suite, args.quick, sizes),
+    }
+    for group in GROUPS:
+        if group in args.only:
+            print(f"[{group}]", flush=True)
+            runners[group]()
+
+    output = {"meta": metadata(), "results": suite.results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(suite.results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print("\nNo regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
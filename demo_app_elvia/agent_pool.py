@@ -0,0 +1,112 @@
+import hashlib
+import os
+import threading
+import time
+
+import httpx
+from langchain_mistralai.chat_models import ChatMistralAI
+
+MISTRAL_BASE_URL = os.environ.get("MISTRAL_BASE_URL") or "https://api.mistral.ai/v1"
+
+
+class _PoolEntry:
+    def __init__(self, chain, client, async_client):
+        self.chain = chain
+        self.client = client
+        self.async_client = async_client
+        self.last_used = time.monotonic()
+
+    def close(self):
+        self.client.close()
+        # Le client asynchrone est fermé avec sa boucle ; on le laisse au ramasse-miettes
+
+
+class AgentPool:
+    """
+    Chaînes ELVIA partagées par tout le processus, une par (clé API, modèle).
+
+    Chaque entrée garde son ChatMistralAI et ses clients HTTP keep-alive :
+    les connexions HTTPS vers Mistral sont réutilisées d'un message à l'autre
+    et d'une session Streamlit à l'autre. Les entrées inutilisées depuis
+    idle_timeout secondes sont fermées.
+    """
+
+    def __init__(self, idle_timeout=900, max_connections=20, keepalive_expiry=60, timeout=120):
+        self.idle_timeout = idle_timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = timeout
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.builds = 0
+        self.reuses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(api_key, model):
+        # On ne garde pas la clé en clair comme clé de dictionnaire
+        return hashlib.sha256(api_key.encode()).hexdigest(), model
+
+    def _headers(self, api_key):
+        return {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Authorization": f"Bearer {api_key}",
+        }
+
+    def _create(self, api_key, model, temperature, build_chain):
+        client = httpx.Client(base_url=MISTRAL_BASE_URL, headers=self._headers(api_key),
+                              limits=self.limits, timeout=self.timeout)
+        async_client = httpx.AsyncClient(base_url=MISTRAL_BASE_URL, headers=self._headers(api_key),
+                                         limits=self.limits, timeout=self.timeout)
+        llm = ChatMistralAI(
+            api_key=api_key,
+            temperature=temperature,
+            model=model,
+            client=client,
+            async_client=async_client,
+        )
+        return _PoolEntry(build_chain(llm), client, async_client)
+
+    def get_chain(self, api_key, model, temperature, build_chain):
+        """Renvoie la chaîne compilée pour cette clé et ce modèle, en la créant au besoin"""
+        self.evict_idle()
+        key = self._key(api_key, model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = self._create(api_key, model, temperature, build_chain)
+                self.builds += 1
+            else:
+                self.reuses += 1
+            entry.last_used = time.monotonic()
+            return entry.chain
+
+    def evict_idle(self, force=False):
+        now = time.monotonic()
+        # Balayage au plus une fois par minute
+        if not force and now - self._last_sweep < 60:
+            return
+        with self._lock:
+            self._last_sweep = now
+            idle = [key for key, entry in self._entries.items() if now - entry.last_used > self.idle_timeout]
+            for key in idle:
+                self._entries.pop(key).close()
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "chains": len(self._entries),
+                "builds": self.builds,
+                "reuses": self.reuses,
+                "evictions": self.evictions,
+            }
+
+
+# Pool partagé par toutes les sessions du processus Streamlit
+default_pool = AgentPool()
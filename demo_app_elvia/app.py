@@ -1,6 +1,12 @@
 import streamlit as st
+import os
+import threading
 import time
+from urllib.parse import urlencode, urlsplit, urlunsplit, parse_qsl
 from elvia_agent import ElviaAgent 
+from conversation_memory import ConversationMemory
+from response_cache import default_cache
+from recommendation_engine import get_engine
 from langchain_core.messages import HumanMessage, AIMessage
 
 # =================================================================
@@ -98,6 +104,40 @@ st.markdown("""
 PILLOW_IMG = "https://fr.louisvuitton.com/images/is/image/lv/1/PP_VP_L/louis-vuitton-doudoune-a-manches-longues-pillow--FOOW21E54900_PM2_Front%20view.png?wid=4096&hei=4096"
 ALMA_IMG = "https://fr.louisvuitton.com/images/is/image/lv/1/PP_VP_L/louis-vuitton-sac-alma-bb--M27525_PM2_Front%20view.png"
 
+# Visuels des produits du DPP (comme PRODUCT_IMAGES dans app/collection/page.tsx)
+PRODUCT_IMAGES = {
+    "LV-JKT-4521-000987": "https://eu.louisvuitton.com/images/is/image/lv/1/PP_VP_L/louis-vuitton-tailored-bomber--HTB40WLGT151_PM2_Front%20view.png?wid=2400&hei=2400",
+    "LV-BAG-M27974-001234": "https://us.louisvuitton.com/images/is/image/lv/1/PP_VP_L/louis-vuitton-speedy-p9-bandouliere-25--M27974_PM2_Front%20view.png?wid=2400&hei=2400",
+}
+
+# Icônes de la démo, ajoutées au catalogue du DPP pour le moteur de recommandation
+ICONES_DEMO = [
+    {"productId": "alma", "name": "Alma BB", "ref": "M27525", "category": "Leather Goods – Handbags",
+     "composition": {"Epi Leather": 100}, "carbonKg": 22.4, "tags": ["quotidien"], "img": ALMA_IMG},
+    {"productId": "pillow", "name": "Doudoune Pillow", "ref": "1AAIJD", "category": "Ready-to-Wear – Outerwear",
+     "composition": {"Econyl Regenerated Nylon": 100}, "carbonKg": 18.2, "tags": ["froid"], "img": PILLOW_IMG},
+]
+
+def image_article(item):
+    return item.get("img") or PRODUCT_IMAGES.get(item["productId"])
+
+# Proxy d'images du wallet (dpp_app, route /img) : variantes redimensionnées, WebP/AVIF, en cache.
+# Sans proxy, on demande directement la bonne taille au serveur d'images LV (paramètres wid/hei).
+IMAGE_PROXY_URL = os.environ.get("IMAGE_PROXY_URL", "").rstrip("/")
+CARD_IMG_WIDTH = 500    # carte produit : 250px affichés, x2 pour les écrans haute densité
+RESULT_IMG_WIDTH = 800  # page de recommandation : colonne de gauche
+
+def image_url(src, width):
+    """URL de l'image src à la largeur affichée (x2)"""
+    if IMAGE_PROXY_URL:
+        return f"{IMAGE_PROXY_URL}/img?" + urlencode({"src": src, "w": width})
+    url = urlsplit(src)
+    if "louisvuitton.com" not in url.netloc:
+        return src
+    params = dict(parse_qsl(url.query))
+    params.update({"wid": width, "hei": width})
+    return urlunsplit(url._replace(query=urlencode(params)))
+
 if 'collection' not in st.session_state:
     st.session_state.collection = [
         {"id": "alma", "name": "Alma BB", "ref": "M27525", "carbon": 22.4, "img": ALMA_IMG, "entretien": "Octobre 2026", "matiere": "Cuir Épi"},
@@ -106,6 +146,8 @@ if 'collection' not in st.session_state:
 
 if 'page' not in st.session_state: st.session_state.page = "login"
 if 'chat_history' not in st.session_state: st.session_state.chat_history = []
+# Mémoire envoyée à ELVIA : résumé + fenêtre récente (chat_history ne sert qu'à l'affichage)
+if 'elvia_memory' not in st.session_state: st.session_state.elvia_memory = ConversationMemory()
 if 'quiz_step' not in st.session_state: st.session_state.quiz_step = 0
 if 'quiz_answers' not in st.session_state: st.session_state.quiz_answers = {}
 
@@ -124,13 +166,26 @@ if st.session_state.page != "login":
             with st.chat_message(msg.type, avatar=avatar): st.markdown(msg.content)
 
         if prompt := st.chat_input("Une question pour ELVIA ?", disabled=not user_mistral_key):
+            # Un nouveau message interrompt la réponse encore en cours
+            if 'elvia_cancel' in st.session_state: st.session_state.elvia_cancel.set()
+            cancel = st.session_state.elvia_cancel = threading.Event()
+
             agent = ElviaAgent(user_mistral_key, user_name=st.session_state.user_name)
+            memory = st.session_state.elvia_memory
             st.session_state.chat_history.append(HumanMessage(content=prompt))
             with st.chat_message("user"): st.markdown(prompt)
             with st.chat_message("assistant", avatar="👜"):
-                response = agent.ask(prompt, st.session_state.chat_history)
-                st.markdown(response)
-                st.session_state.chat_history.append(AIMessage(content=response))
+                # Affichage au fil des tokens
+                response = st.write_stream(agent.ask_stream(prompt, memory, cancel=cancel))
+                memory.add(HumanMessage(content=prompt))
+                if not cancel.is_set():
+                    st.session_state.chat_history.append(AIMessage(content=response))
+                    memory.add(AIMessage(content=response))
+
+        cache_stats = default_cache.stats()
+        if cache_stats['hits'] + cache_stats['semanticHits'] + cache_stats['coalesced'] + cache_stats['misses']:
+            st.caption(f"Cache ELVIA : {cache_stats['hitRate']:.0%} de réponses instantanées · "
+                       f"{cache_stats['savedSeconds']:.1f} s économisées")
 
 # =================================================================
 # 4. LOGIQUE DES PAGES
@@ -167,7 +222,7 @@ elif st.session_state.page == "home":
             st.markdown(f"""
                 <div class="product-card">
                     <div>
-                        <img src="{item['img']}" class="product-img">
+                        {f'<img src="{image_url(item["img"], CARD_IMG_WIDTH)}" class="product-img" loading="lazy">' if item['img'] else ''}
                         <h3>{item['name']}</h3>
                         <p style="color:#D4AF37; font-size:1.1rem;">{item['matiere']} | REF: {item['ref']}</p>
                     </div>
@@ -222,13 +277,19 @@ elif st.session_state.page == "quiz":
 elif st.session_state.page == "result":
     st.title("Votre Recommandation")
     c1, c2 = st.columns([1, 1.3])
-    is_leather = st.session_state.quiz_answers['type'] == "Maroquinerie Iconique"
-    res_name = "Alma BB" if is_leather else "Doudoune Pillow"
-    res_img = ALMA_IMG if is_leather else PILLOW_IMG
+    # Tout le catalogue est noté ; résultat mémoïsé par combinaison de réponses
+    recos = get_engine(ICONES_DEMO).recommend(st.session_state.quiz_answers, k=3)
+    best = st.session_state.recommendation = recos[0]
+    res_img = image_article(best)
     
-    with c1: st.image(res_img, use_container_width=True)
+    with c1:
+        if res_img: st.image(image_url(res_img, RESULT_IMG_WIDTH), use_container_width=True)
     with c2:
-        st.header(res_name)
+        st.header(best['name'])
+        if best.get('carbonKg') is not None:
+            st.caption(f"{best.get('category', '')} · {best['carbonKg']} kg CO2e")
+        if len(recos) > 1:
+            st.write("Autres pièces proches : " + ", ".join(r['name'] for r in recos[1:]))
         # NOUVEAU BOUTON DPP
         if st.button("📖 VOIR LE PASSEPORT NUMÉRIQUE (DPP)"):
             st.info("Chargement des données de traçabilité sécurisées par la Maison Louis Vuitton...")
@@ -256,13 +317,13 @@ elif st.session_state.page == "blockchain_form":
             with st.spinner("Cryptage des données sur le consortium Aura..."):
                 time.sleep(2)
                 # Ajout effectif à la collection
-                is_leather = st.session_state.quiz_answers['type'] == "Maroquinerie Iconique"
+                best = st.session_state.recommendation
                 new_item = {
                     "id": f"new_{len(st.session_state.collection)}",
-                    "name": "Alma BB" if is_leather else "Doudoune Pillow", 
-                    "ref": "M27525" if is_leather else "1AAIJD", 
-                    "carbon": 22.4 if is_leather else 18.2, 
-                    "img": ALMA_IMG if is_leather else PILLOW_IMG, 
+                    "name": best['name'],
+                    "ref": best.get('ref') or best.get('styleCode', ''),
+                    "carbon": best.get('carbonKg') or 0,
+                    "img": image_article(best),
                     "entretien": "Janvier 2028", 
                     "matiere": st.session_state.quiz_answers['matiere']
                 }
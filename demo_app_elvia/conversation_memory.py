@@ -0,0 +1,98 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import SystemMessage
+
+# Un seul thread de résumé pour tout le processus, hors du chemin des requêtes
+_summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="elvia-summary")
+
+
+def estimate_tokens(text):
+    # Approximation (~4 caractères par token) : le tokenizer Mistral n'est pas disponible hors ligne
+    return max(1, len(text) // 4)
+
+
+class ConversationMemory:
+    """
+    Mémoire bornée pour ElviaAgent.
+
+    - fenêtre récente limitée à token_budget tokens (comptés une seule fois par message)
+    - les messages sortis de la fenêtre sont résumés en arrière-plan par
+      summarizer(résumé_précédent, messages) -> nouveau résumé
+    - prompt_messages() ne bloque jamais : il renvoie le dernier résumé disponible + la fenêtre
+    - si les résumés échouent, seuls les max_pending derniers messages en attente sont gardés
+
+    La taille du prompt reste donc stable quelle que soit la longueur de la conversation.
+    """
+
+    def __init__(self, summarizer=None, token_budget=1500, summary_budget=300, count_tokens=estimate_tokens,
+                 max_pending=100):
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.max_pending = max_pending
+        self.count_tokens = count_tokens
+
+        self.summary = ""
+        self._window = deque()  # (message, tokens)
+        self._window_tokens = 0
+        self._pending = []  # messages sortis de la fenêtre, pas encore résumés
+        self._summarizing = False
+        self._lock = threading.Lock()
+
+    def add(self, message):
+        tokens = self.count_tokens(message.content)
+        with self._lock:
+            self._window.append((message, tokens))
+            self._window_tokens += tokens
+            # On garde toujours au moins le dernier message
+            while self._window_tokens > self.token_budget and len(self._window) > 1:
+                old, old_tokens = self._window.popleft()
+                self._window_tokens -= old_tokens
+                self._pending.append(old)
+            # Pendant un résumé, ses messages sont en tête de _pending : on n'y touche pas
+            if not self._summarizing and len(self._pending) > self.max_pending:
+                del self._pending[:len(self._pending) - self.max_pending]
+        self._schedule_summary()
+
+    def _schedule_summary(self):
+        with self._lock:
+            if self._summarizing or not self._pending or self.summarizer is None:
+                return
+            self._summarizing = True
+            batch = list(self._pending)
+            previous = self.summary
+        _summary_executor.submit(self._summarize, previous, batch)
+
+    def _summarize(self, previous, batch):
+        try:
+            summary = self.summarizer(previous, batch)
+        except Exception as e:
+            print(f"⚠️  Résumé de conversation impossible : {e}")
+            with self._lock:
+                self._summarizing = False
+            return
+
+        # Le résumé lui-même reste borné
+        if self.count_tokens(summary) > self.summary_budget:
+            summary = summary[-self.summary_budget * 4:]
+        with self._lock:
+            self.summary = summary
+            del self._pending[:len(batch)]
+            self._summarizing = False
+        # D'autres messages ont pu sortir de la fenêtre entre-temps
+        self._schedule_summary()
+
+    def prompt_messages(self):
+        """Historique à envoyer au modèle : résumé des anciens échanges + fenêtre récente"""
+        with self._lock:
+            messages = [message for message, _ in self._window]
+            summary = self.summary
+        if summary:
+            messages.insert(0, SystemMessage(content=f"Résumé de la conversation précédente : {summary}"))
+        return messages
+
+    def prompt_tokens(self):
+        with self._lock:
+            return self._window_tokens + (self.count_tokens(self.summary) if self.summary else 0)
@@ -1,48 +1,184 @@
 import os
-from langchain_mistralai.chat_models import ChatMistralAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.messages import HumanMessage, AIMessage
+from agent_pool import default_pool
+from conversation_memory import ConversationMemory
+from response_cache import default_cache
+
+# Prompt système commun à tous les clients ; le nom est une variable du prompt
+SYSTEM_PROMPT = (
+    "Vous êtes ELVIA, l'IA majordome de la Maison Louis Vuitton. "
+    "Vous vous adressez à l'utilisateur par son nom : {user_name}. "
+    "Votre ton est noble et expert. Vous accompagnez le client dans la pérennité de sa collection."
+)
+
+# Compilé une seule fois pour tous les clients
+PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SYSTEM_PROMPT),
+    MessagesPlaceholder(variable_name="chat_history"),
+    ("human", "{input}"),
+])
+
+# Résumé incrémental des anciens échanges (voir ConversationMemory)
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Vous résumez une conversation entre ELVIA et un client de la Maison Louis Vuitton. "
+               "Conservez les faits utiles (pièces, matières, préférences, demandes en cours) en moins de 150 mots."),
+    ("human", "Résumé actuel : {summary}\n\nNouveaux échanges :\n{transcript}\n\nNouveau résumé :"),
+])
+
+NOT_CONFIGURED = "Désolé, ELVIA n'est pas configurée. Veuillez vérifier votre clé API."
+
+MODEL_NAME = "mistral-small-latest"
+TEMPERATURE = 0.6
+
+def build_chain(llm):
+    return (RunnablePassthrough() | PROMPT | llm)
+
+def summarize(llm, summary, messages):
+    """Met à jour le résumé de conversation avec des messages sortis de la fenêtre"""
+    transcript = "\n".join(
+        f"{'Client' if msg.type == 'human' else 'ELVIA'} : {msg.content}" for msg in messages
+    )
+    response = (SUMMARY_PROMPT | llm).invoke({"summary": summary or "(aucun)", "transcript": transcript})
+    return response.content
+
+def pooled_summarizer(pool, api_key, model_name=MODEL_NAME):
+    """
+    summarizer de ConversationMemory adossé au pool. La mémoire survit à l'agent
+    qui l'a servie en premier et le pool ferme les chaînes inactives : on lui
+    redemande donc une chaîne vivante à chaque résumé, sans en garder aucune.
+    """
+    def summarizer(summary, messages):
+        chain = pool.get_chain(api_key, model_name, TEMPERATURE, build_chain)
+        return summarize(chain.last, summary, messages)
+    return summarizer
 
 class ElviaAgent:
-    def __init__(self, api_key, user_name): # L'argument est ici
+    def __init__(self, api_key, user_name, llm=None, cache=default_cache, history_window=4,
+                 pool=default_pool): # L'argument est ici
         self.api_key = api_key
         self.user_name = user_name 
-        self.model_name = "mistral-small-latest"
+        self.model_name = MODEL_NAME
+        # llm : modèle injecté (ex. faux LLM pour tester hors ligne)
+        self.llm = llm
+        # cache : ResponseCache partagé, ou None pour interroger Mistral à chaque fois
+        self.cache = cache
+        self.history_window = history_window
+        # pool : chaînes et connexions HTTP partagées par tout le processus
+        self.pool = pool
         self.chain = self._build_chain()
 
-    def _get_system_prompt(self):
-        # Utilise le nom récupéré dynamiquement
-        return (
-            f"Vous êtes ELVIA, l'IA majordome de la Maison Louis Vuitton. "
-            f"Vous vous adressez à l'utilisateur par son nom : {self.user_name}. "
-            "Votre ton est noble et expert. Vous accompagnez le client dans la pérennité de sa collection."
-        )
-
     def _build_chain(self):
+        if self.llm is not None:
+            return build_chain(self.llm)
+
         if not self.api_key or self.api_key == "VOTRE_CLE_MISTRAL_ICI":
             return None
-            
-        llm = ChatMistralAI(
-            api_key=self.api_key, 
-            temperature=0.6, 
-            model=self.model_name
-        )
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", self._get_system_prompt()),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-        ])
-        
-        return (RunnablePassthrough() | prompt | llm)
 
-    def ask(self, query, history):
-        if not self.chain:
-            return "Désolé, ELVIA n'est pas configurée. Veuillez vérifier votre clé API."
-        
-        response = self.chain.invoke({
+        # Une seule chaîne par (clé, modèle) : l'agent n'est qu'un porteur du nom du client
+        return self.pool.get_chain(self.api_key, self.model_name, TEMPERATURE, build_chain)
+
+    def _history_messages(self, history):
+        # history : liste de messages, ou ConversationMemory (résumé + fenêtre récente)
+        if isinstance(history, ConversationMemory):
+            if history.summarizer is None and self.chain:
+                if self.llm is not None:
+                    llm = self.llm
+                    history.summarizer = lambda summary, messages: summarize(llm, summary, messages)
+                else:
+                    history.summarizer = pooled_summarizer(self.pool, self.api_key, self.model_name)
+            return history.prompt_messages()
+        return history
+
+    def _inputs(self, query, history):
+        return {
+            "user_name": self.user_name,
             "chat_history": history,
             "input": query
-        })
-        return response.content
\ No newline at end of file
+        }
+
+    def _invoke(self, query, history):
+        response = self.chain.invoke(self._inputs(query, history))
+        return response.content
+
+    def _cache_args(self, query, history):
+        # Les réponses s'adressent au client par son nom : il fait partie de la clé, via le prompt rendu
+        window = history[-self.history_window:] if self.history_window else []
+        key_history = [(msg.type, msg.content) for msg in window]
+        return SYSTEM_PROMPT.format(user_name=self.user_name), key_history, query
+
+    def ask(self, query, history):
+        if not self.chain:
+            return NOT_CONFIGURED
+
+        history = self._history_messages(history)
+        if self.cache is None:
+            return self._invoke(query, history)
+
+        return self.cache.get_or_compute(*self._cache_args(query, history), lambda: self._invoke(query, history))
+
+    def _stream(self, query, history):
+        # Fragments de texte de chain.stream ; fermer le générateur ferme la requête HTTP
+        stream = self.chain.stream(self._inputs(query, history))
+        try:
+            for chunk in stream:
+                if isinstance(chunk.content, str) and chunk.content:
+                    yield chunk.content
+        finally:
+            stream.close()
+
+    async def _astream(self, query, history):
+        stream = self.chain.astream(self._inputs(query, history))
+        try:
+            async for chunk in stream:
+                if isinstance(chunk.content, str) and chunk.content:
+                    yield chunk.content
+        finally:
+            await stream.aclose()
+
+    def ask_stream(self, query, history, cancel=None):
+        """
+        Générateur des fragments de la réponse, au fil de chain.stream.
+        cancel : threading.Event ; dès qu'il est levé, le flux est interrompu.
+        Les questions identiques simultanées partagent un seul appel (voir
+        ResponseCache.stream_or_compute) ; seules les réponses complètes sont mises en cache.
+        """
+        if not self.chain:
+            yield NOT_CONFIGURED
+            return
+
+        history = self._history_messages(history)
+        if self.cache is None:
+            parts = self._stream(query, history)
+        else:
+            parts = self.cache.stream_or_compute(*self._cache_args(query, history),
+                                                 lambda: self._stream(query, history))
+        try:
+            for part in parts:
+                if cancel is not None and cancel.is_set():
+                    return
+                yield part
+        finally:
+            # Un flux interrompu n'est pas mis en cache, et sa requête HTTP est fermée
+            parts.close()
+
+    async def aask_stream(self, query, history, cancel=None):
+        """Version asynchrone de ask_stream, au fil de chain.astream"""
+        if not self.chain:
+            yield NOT_CONFIGURED
+            return
+
+        history = self._history_messages(history)
+        if self.cache is None:
+            parts = self._astream(query, history)
+        else:
+            parts = self.cache.astream_or_compute(*self._cache_args(query, history),
+                                                  lambda: self._astream(query, history))
+        try:
+            async for part in parts:
+                if cancel is not None and cancel.is_set():
+                    return
+                yield part
+        finally:
+            await parts.aclose()
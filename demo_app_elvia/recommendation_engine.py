@@ -0,0 +1,253 @@
+"""
+Moteur de recommandation du diagnostic (page « result »).
+
+Le catalogue (product.json + materials.json + sustainability.json du DPP)
+est chargé une fois en une matrice NumPy de caractéristiques, une ligne par
+produit :
+
+- univers (maroquinerie / prêt-à-porter), d'après la catégorie
+- usages (quotidien, voyage, froid, mi-saison), d'après le nom, la
+  catégorie et les matières, ou les tags fournis
+- composition par famille de matière (cuir, toile, synthétique, duvet, laine, autre)
+- empreinte carbone et circularité, normalisées sur le catalogue
+
+Les réponses du quiz (type, usage, matiere, valeur) deviennent un vecteur
+de poids ; le score de tout le catalogue est un produit matrice-vecteur et
+le top-k un argpartition. L'espace des réponses est fini : chaque
+combinaison n'est calculée qu'une fois.
+"""
+import json
+import os
+import threading
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+
+DPP_DATA_DIR = os.environ.get(
+    "DPP_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dpp_app", "app", "data"),
+)
+
+QUESTIONS = ("type", "usage", "matiere", "valeur")
+
+UNIVERS = ("maroquinerie", "pret_a_porter")
+USAGES = ("quotidien", "voyage", "froid", "mi_saison")
+FAMILLES = ("cuir", "toile", "synthetique", "duvet", "laine", "autre")
+COLUMNS = (
+    [f"univers:{u}" for u in UNIVERS]
+    + [f"usage:{u}" for u in USAGES]
+    + [f"matiere:{f}" for f in FAMILLES]
+    + ["bas_carbone", "circularite"]
+)
+COLUMN = {name: i for i, name in enumerate(COLUMNS)}
+
+# Mots-clés (minuscules, sans accents) cherchés dans les noms de matières
+FAMILLE_KEYWORDS = {
+    "cuir": ("leather", "cuir", "calfskin", "lambskin", "epi", "taurillon"),
+    "toile": ("canvas", "toile", "monogram", "damier"),
+    "synthetique": ("nylon", "econyl", "polyamide", "polyester", "elastane"),
+    "duvet": ("down", "duvet", "rds"),
+    "laine": ("wool", "laine", "cashmere", "merino"),
+}
+# Mots-clés cherchés dans le nom, la catégorie et les matières
+USAGE_KEYWORDS = {
+    "quotidien": ("handbag", "tote", "alma", "speedy", "neverfull", "wallet", "pochette"),
+    "voyage": ("travel", "keepall", "luggage", "duffle", "trolley", "horizon", "backpack", "voyage"),
+    "froid": ("down", "duvet", "puffer", "doudoune", "parka", "coat", "wool", "pillow"),
+    "mi_saison": ("jacket", "blouson", "bomber", "trench", "shirt", "veste"),
+}
+
+# Réponses du quiz (libellés de app.py) -> colonnes
+QUIZ_TYPES = {"Maroquinerie Iconique": "univers:maroquinerie", "Prêt-à-porter Technique": "univers:pret_a_porter"}
+QUIZ_USAGES = {"Quotidien": "usage:quotidien", "Voyage": "usage:voyage",
+               "Performance Froid": "usage:froid", "Mi-saison": "usage:mi_saison"}
+QUIZ_MATIERES = {"Cuir Épi": "matiere:cuir", "Toile Monogram": "matiere:toile",
+                 "Nylon Econyl®": "matiere:synthetique", "Duvet RDS": "matiere:duvet"}
+# Priorité -> (poids de la matière choisie, poids bas carbone, poids circularité)
+QUIZ_VALEURS = {
+    "Esthétique": (2.0, 0.0, 0.0),
+    "Équilibre": (1.5, 0.5, 0.25),
+    "Impact Réduit": (1.0, 1.5, 0.75),
+}
+POIDS_TYPE = 3.0
+POIDS_USAGE = 1.0
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+@lru_cache(maxsize=4096)
+def famille(material):
+    name = normalize(material)
+    for fam, keywords in FAMILLE_KEYWORDS.items():
+        if any(k in name for k in keywords):
+            return fam
+    return "autre"
+
+
+@lru_cache(maxsize=1024)
+def univers(category):
+    category = normalize(category)
+    if "leather" in category or "maroquinerie" in category:
+        return "maroquinerie"
+    if "ready-to-wear" in category or "pret-a-porter" in category:
+        return "pret_a_porter"
+    return None
+
+
+def main_composition(materials):
+    """{matière: pourcentage} du composant principal (premier avec une composition détaillée)"""
+    for component in (materials or {}).values():
+        if isinstance(component, dict) and isinstance(component.get("composition"), list):
+            return {c["material"]: c.get("percentage", 0) for c in component["composition"]}
+    return {}
+
+
+def join_catalog(products, materials=(), sustainability=()):
+    """Un article par produit, avec sa composition, son carbone et sa circularité"""
+    by_materials = {m["productId"]: m.get("materials") for m in materials}
+    by_impact = {s["productId"]: s.get("environmentalImpact") or {} for s in sustainability}
+    items = []
+    for product in products:
+        composition = main_composition(by_materials.get(product["productId"]))
+        if not composition and product.get("material"):
+            composition = {product["material"]: 100}
+        impact = by_impact.get(product["productId"], {})
+        items.append({
+            **product,
+            "composition": composition,
+            "carbonKg": impact.get("carbonFootprintKgCO2e"),
+            "circularity": impact.get("circularityScore"),
+        })
+    return items
+
+
+def usage_tags(item):
+    if item.get("tags"):
+        return [t for t in item["tags"] if t in USAGES]
+    text = normalize(" ".join([item.get("name", ""), item.get("category", ""), *item.get("composition", {})]))
+    return [usage for usage, keywords in USAGE_KEYWORDS.items() if any(k in text for k in keywords)]
+
+
+def _scaled(values, invert=False):
+    # Min-max sur le catalogue ; les valeurs manquantes prennent la moyenne
+    values = np.asarray(values, dtype=np.float64)
+    missing = np.isnan(values)
+    if missing.all():
+        return np.full(values.shape, 0.5)
+    values[missing] = values[~missing].mean()
+    span = values.max() - values.min()
+    scaled = (values - values.min()) / span if span else np.full(values.shape, 0.5)
+    return 1.0 - scaled if invert else scaled
+
+
+class RecommendationEngine:
+    def __init__(self, items):
+        self.items = list(items)
+        n = len(self.items)
+        features = np.zeros((n, len(COLUMNS)), dtype=np.float32)
+        carbon = np.full(n, np.nan)
+        circularity = np.full(n, np.nan)
+
+        for row, item in enumerate(self.items):
+            u = univers(item.get("category", ""))
+            if u:
+                features[row, COLUMN[f"univers:{u}"]] = 1
+            for usage in usage_tags(item):
+                features[row, COLUMN[f"usage:{usage}"]] = 1
+            composition = item.get("composition") or {}
+            total = sum(composition.values())
+            for material, percentage in composition.items():
+                if total:
+                    features[row, COLUMN[f"matiere:{famille(material)}"]] += percentage / total
+            if item.get("carbonKg") is not None:
+                carbon[row] = item["carbonKg"]
+            if item.get("circularity") is not None:
+                circularity[row] = item["circularity"]
+
+        features[:, COLUMN["bas_carbone"]] = _scaled(carbon, invert=True)
+        features[:, COLUMN["circularite"]] = _scaled(circularity)
+        # Une colonne contiguë par caractéristique : le score ne lit que les
+        # colonnes de poids non nul (5 sur 14 au plus)
+        self.columns = np.ascontiguousarray(features.T)
+        self.features = self.columns.T
+        self._top = lru_cache(maxsize=1024)(self._compute_top)
+
+    @classmethod
+    def from_data_dir(cls, data_dir=DPP_DATA_DIR, extra=()):
+        """Catalogue du DPP (+ articles déjà joints, ex. les icônes de la démo)"""
+        data = {}
+        for name in ("product", "materials", "sustainability"):
+            path = os.path.join(data_dir, f"{name}.json")
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    data[name] = json.load(f)
+        items = join_catalog(data.get("product", []), data.get("materials", []), data.get("sustainability", []))
+        # Les articles fournis passent en premier : ils gagnent les égalités
+        return cls(list(extra) + items)
+
+    @staticmethod
+    def weights(answers):
+        """Vecteur de poids des réponses ; une réponse inconnue ou absente ne compte pas"""
+        w = np.zeros(len(COLUMNS), dtype=np.float32)
+        poids_matiere, poids_carbone, poids_circularite = QUIZ_VALEURS.get(answers.get("valeur"), QUIZ_VALEURS["Équilibre"])
+        if answers.get("type") in QUIZ_TYPES:
+            w[COLUMN[QUIZ_TYPES[answers["type"]]]] = POIDS_TYPE
+        if answers.get("usage") in QUIZ_USAGES:
+            w[COLUMN[QUIZ_USAGES[answers["usage"]]]] = POIDS_USAGE
+        if answers.get("matiere") in QUIZ_MATIERES:
+            w[COLUMN[QUIZ_MATIERES[answers["matiere"]]]] = poids_matiere
+        w[COLUMN["bas_carbone"]] = poids_carbone
+        w[COLUMN["circularite"]] = poids_circularite
+        return w
+
+    def scores(self, answers):
+        """Score de chaque article du catalogue"""
+        w = self.weights(answers)
+        scores = np.zeros(len(self.items), dtype=np.float32)
+        buffer = np.empty_like(scores)
+        for column in np.flatnonzero(w):
+            np.multiply(self.columns[column], w[column], out=buffer)
+            scores += buffer
+        return scores
+
+    def _compute_top(self, key, k):
+        scores = self.scores(dict(zip(QUESTIONS, key)))
+        k = min(k, len(scores))
+        if k == 0:
+            return ()
+        if k < len(scores):
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(len(scores))
+        # Score décroissant, puis ordre du catalogue
+        top = top[np.lexsort((top, -scores[top]))]
+        return tuple((int(i), float(scores[i])) for i in top)
+
+    def top(self, answers, k=3):
+        """[(indice dans items, score)] des k meilleurs articles, mémoïsé par combinaison de réponses"""
+        key = tuple(answers.get(q) for q in QUESTIONS)
+        return self._top(key, k)
+
+    def recommend(self, answers, k=3):
+        """Les k articles les plus proches des réponses, avec leur score"""
+        return [{**self.items[i], "score": score} for i, score in self.top(answers, k)]
+
+    def cache_info(self):
+        return self._top.cache_info()
+
+
+_default_engine = None
+_default_lock = threading.Lock()
+
+
+def get_engine(extra=()):
+    """Moteur partagé par toutes les sessions du processus, construit au premier appel"""
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = RecommendationEngine.from_data_dir(DPP_DATA_DIR, extra)
+        return _default_engine
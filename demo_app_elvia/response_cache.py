@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+def normalize_text(text):
+    # Minuscules, espaces compactés, ponctuation finale ignorée
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.…")
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class _Flight:
+    """Appel LLM en cours, partagé par les demandes identiques simultanées"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """
+    Cache des réponses d'ELVIA, partagé par tous les clients du processus.
+
+    - niveau exact : clé = prompt système (rendu avec le nom du client) + fenêtre
+      d'historique + question normalisée, avec TTL et éviction LRU ; les réponses
+      ne sont jamais réécrites, une réponse n'est donc servie qu'au même nom de client
+    - niveau sémantique optionnel : si `embed` est fourni (ex. MistralAIEmbeddings().embed_query),
+      une question proche (cosinus >= similarity_threshold) dans le même contexte réutilise la réponse
+    - single-flight : des questions identiques simultanées partagent un seul appel,
+      y compris en streaming (les suivants rejouent la réponse complète du premier)
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, embed=None, similarity_threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+
+        self._entries = OrderedDict()  # clé -> (réponse, expiration, latence d'origine)
+        self._vectors = {}  # contexte -> {clé: embedding}
+        self._flights = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.upstream_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def context_key(system_prompt, history):
+        # history : liste de (type, contenu), ex. [("human", "...")]
+        parts = [normalize_text(system_prompt)]
+        parts += [f"{role}:{normalize_text(content)}" for role, content in history]
+        return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+    @staticmethod
+    def make_key(context, query):
+        return hashlib.sha256(f"{context}\x1e{normalize_text(query)}".encode()).hexdigest()
+
+    def _lookup(self, key):
+        # Appelé avec le verrou
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, latency = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        self.saved_seconds += latency
+        return value
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        for vectors in self._vectors.values():
+            vectors.pop(key, None)
+
+    def _store(self, key, context, value, latency, vector):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl, latency)
+            self._entries.move_to_end(key)
+            if vector is not None:
+                self._vectors.setdefault(context, {})[key] = vector
+            while len(self._entries) > self.max_entries:
+                oldest, _ = self._entries.popitem(last=False)
+                self._remove(oldest)
+
+    def _semantic_lookup(self, context, vector):
+        with self._lock:
+            candidates = list(self._vectors.get(context, {}).items())
+        best_key, best_score = None, self.similarity_threshold
+        for key, other in candidates:
+            score = _cosine(vector, other)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+        with self._lock:
+            value = self._lookup(best_key)
+            if value is not None:
+                self.semantic_hits += 1
+            return value
+
+    def _join(self, key):
+        """(réponse en cache, None, False), ou (None, vol, True si l'on doit faire l'appel)"""
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                self.hits += 1
+                return value, None, False
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                return None, flight, True
+            self.coalesced += 1
+            return None, flight, False
+
+    def _land(self, key, flight):
+        with self._lock:
+            self._flights.pop(key, None)
+        flight.done.set()
+
+    def _record_miss(self):
+        with self._lock:
+            self.misses += 1
+        return time.monotonic()
+
+    def _record_answer(self, key, context, value, started, vector=None):
+        latency = time.monotonic() - started
+        with self._lock:
+            self.upstream_seconds += latency
+        self._store(key, context, value, latency, vector)
+
+    def get_or_compute(self, system_prompt, history, query, compute):
+        """Renvoie la réponse en cache, ou appelle compute() une seule fois pour toutes les demandes identiques"""
+        context = self.context_key(system_prompt, history)
+        key = self.make_key(context, query)
+
+        value, flight, leader = self._join(key)
+        if value is not None:
+            return value
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            if flight.value is not None:
+                return flight.value
+            # Le premier demandeur a abandonné : on reprend l'appel
+            return self.get_or_compute(system_prompt, history, query, compute)
+
+        try:
+            vector = self.embed(normalize_text(query)) if self.embed else None
+            value = self._semantic_lookup(context, vector) if vector is not None else None
+            if value is None:
+                started = self._record_miss()
+                value = compute()
+                self._record_answer(key, context, value, started, vector)
+            flight.value = value
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    def stream_or_compute(self, system_prompt, history, query, stream):
+        """
+        Version streamée de get_or_compute : stream() produit les fragments de la réponse.
+        Le premier demandeur les relaie au fil de l'eau ; les demandes identiques simultanées
+        attendent sa réponse complète puis la rejouent d'un bloc. Seule une réponse complète
+        est mise en cache ; si le premier demandeur ferme le flux, un suivant reprend l'appel.
+        """
+        context = self.context_key(system_prompt, history)
+        key = self.make_key(context, query)
+        while True:
+            value, flight, leader = self._join(key)
+            if leader:
+                break
+            if value is None:
+                flight.done.wait()
+                if flight.error is not None:
+                    raise flight.error
+                value = flight.value
+            if value is not None:
+                yield value
+                return
+
+        try:
+            started = self._record_miss()
+            parts = []
+            source = stream()
+            try:
+                for part in source:
+                    parts.append(part)
+                    yield part
+            finally:
+                source.close()
+            flight.value = "".join(parts)
+            self._record_answer(key, context, flight.value, started)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    async def astream_or_compute(self, system_prompt, history, query, astream):
+        """Version asynchrone de stream_or_compute ; astream() produit un générateur asynchrone"""
+        context = self.context_key(system_prompt, history)
+        key = self.make_key(context, query)
+        while True:
+            value, flight, leader = self._join(key)
+            if leader:
+                break
+            if value is None:
+                # Attente hors de la boucle d'événements
+                await asyncio.to_thread(flight.done.wait)
+                if flight.error is not None:
+                    raise flight.error
+                value = flight.value
+            if value is not None:
+                yield value
+                return
+
+        try:
+            started = self._record_miss()
+            parts = []
+            source = astream()
+            try:
+                async for part in source:
+                    parts.append(part)
+                    yield part
+            finally:
+                await source.aclose()
+            flight.value = "".join(parts)
+            self._record_answer(key, context, flight.value, started)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    def stats(self):
+        with self._lock:
+            served = self.hits + self.semantic_hits + self.coalesced
+            total = served + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semanticHits": self.semantic_hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "hitRate": served / total if total else 0.0,
+                "upstreamSeconds": round(self.upstream_seconds, 3),
+                "savedSeconds": round(self.saved_seconds, 3),
+            }
+
+
+# Cache partagé par tous les agents et toutes les sessions du processus
+default_cache = ResponseCache()
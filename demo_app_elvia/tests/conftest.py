@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules d'ELVIA sont des fichiers à plat dans demo_app_elvia/, importés par leur nom (comme dans app.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
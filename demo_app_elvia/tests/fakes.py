@@ -0,0 +1,53 @@
+"""Faux LLM et pool hors ligne : aucun appel à Mistral."""
+import time
+from typing import Any
+
+import httpx
+from langchain_core.language_models.fake_chat_models import FakeListChatModel, GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from agent_pool import AgentPool, _PoolEntry
+
+
+class CountingLLM(GenericFakeChatModel):
+    """Répond toujours `answer`, fragment par fragment, en comptant les appels"""
+    answer: str = "Bonjour, la Maison vous salue"
+    delay: float = 0.0
+    calls: int = 0
+
+    def __init__(self, **kwargs):
+        super().__init__(messages=iter(()), **kwargs)
+
+    def _generate(self, *args, **kwargs):
+        self.messages = iter([AIMessage(content=self.answer)])
+        self.calls += 1
+        return super()._generate(*args, **kwargs)
+
+    def _stream(self, *args, **kwargs):
+        # GenericFakeChatModel._stream passe par _generate, qui compte l'appel
+        for chunk in super()._stream(*args, **kwargs):
+            time.sleep(self.delay)
+            yield chunk
+
+
+class ClientBoundLLM(FakeListChatModel):
+    """Comme ChatMistralAI : inutilisable une fois son client HTTP fermé"""
+    client: Any = None
+
+    def _call(self, *args, **kwargs):
+        if self.client.is_closed:
+            raise RuntimeError("Cannot send a request, as the client has been closed.")
+        return super()._call(*args, **kwargs)
+
+
+class FakeAgentPool(AgentPool):
+    """AgentPool dont les chaînes utilisent un faux LLM lié à son client HTTP"""
+
+    def __init__(self, responses=("Résumé",), **kwargs):
+        super().__init__(**kwargs)
+        self.responses = list(responses)
+
+    def _create(self, api_key, model, temperature, build_chain):
+        client, async_client = httpx.Client(), httpx.AsyncClient()
+        llm = ClientBoundLLM(responses=self.responses, client=client)
+        return _PoolEntry(build_chain(llm), client, async_client)
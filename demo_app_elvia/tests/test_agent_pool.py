@@ -0,0 +1,47 @@
+from elvia_agent import ElviaAgent, build_chain
+from fakes import FakeAgentPool
+
+
+def test_one_chain_per_key_and_model():
+    pool = FakeAgentPool()
+    first = pool.get_chain("key", "model", 0.6, build_chain)
+
+    assert pool.get_chain("key", "model", 0.6, build_chain) is first
+    assert pool.get_chain("key", "other-model", 0.6, build_chain) is not first
+    assert pool.get_chain("other-key", "model", 0.6, build_chain) is not first
+    assert pool.stats() == {"chains": 3, "builds": 3, "reuses": 1, "evictions": 0}
+
+
+def test_agents_share_the_pooled_chain():
+    pool = FakeAgentPool()
+    louis = ElviaAgent("key", "Louis", cache=None, pool=pool)
+    marie = ElviaAgent("key", "Marie", cache=None, pool=pool)
+
+    assert louis.chain is marie.chain
+    assert pool.stats()["builds"] == 1
+
+
+def test_idle_chains_are_closed_and_rebuilt_on_demand():
+    pool = FakeAgentPool(idle_timeout=0)
+    first = pool.get_chain("key", "model", 0.6, build_chain)
+    pool.evict_idle(force=True)
+
+    assert first.last.client.is_closed
+    assert pool.stats()["chains"] == 0
+    second = pool.get_chain("key", "model", 0.6, build_chain)
+    assert second is not first
+    assert second.invoke({"user_name": "Louis", "chat_history": [], "input": "Bonjour"}).content == "Résumé"
+
+
+def test_recent_chains_are_kept():
+    pool = FakeAgentPool(idle_timeout=900)
+    first = pool.get_chain("key", "model", 0.6, build_chain)
+    pool.evict_idle(force=True)
+
+    assert pool.get_chain("key", "model", 0.6, build_chain) is first
+    assert not first.last.client.is_closed
+
+
+def test_unconfigured_key_has_no_chain():
+    assert ElviaAgent("VOTRE_CLE_MISTRAL_ICI", "Louis", pool=FakeAgentPool()).ask("Bonjour", []) == \
+        "Désolé, ELVIA n'est pas configurée. Veuillez vérifier votre clé API."
@@ -0,0 +1,98 @@
+import threading
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from conversation_memory import ConversationMemory
+from elvia_agent import ElviaAgent
+from fakes import FakeAgentPool
+
+
+def one_token(text):
+    return 1
+
+
+def settle(memory, timeout=5):
+    # Les résumés tournent sur un thread d'arrière-plan
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with memory._lock:
+            if not memory._summarizing:
+                return
+        time.sleep(0.01)
+    raise AssertionError("summary still running")
+
+
+def test_window_stays_within_budget_and_keeps_the_latest_messages():
+    memory = ConversationMemory(token_budget=3, count_tokens=one_token)
+    for i in range(10):
+        memory.add(HumanMessage(content=f"q{i}"))
+
+    assert [m.content for m in memory.prompt_messages()] == ["q7", "q8", "q9"]
+    assert memory.prompt_tokens() == 3
+
+
+def test_messages_leaving_the_window_are_summarized():
+    seen = []
+
+    def summarizer(previous, batch):
+        seen.append((previous, [m.content for m in batch]))
+        return previous + "".join(m.content for m in batch)
+
+    memory = ConversationMemory(summarizer=summarizer, token_budget=2, count_tokens=one_token)
+    for i in range(4):
+        memory.add(HumanMessage(content=str(i)))
+        settle(memory)
+
+    messages = memory.prompt_messages()
+    assert isinstance(messages[0], SystemMessage)
+    assert messages[0].content.endswith("01")
+    assert [m.content for m in messages[1:]] == ["2", "3"]
+    assert seen == [("", ["0"]), ("0", ["1"])]
+
+
+def test_failing_summarizer_keeps_a_bounded_backlog():
+    def failing(previous, batch):
+        raise RuntimeError("LLM unavailable")
+
+    memory = ConversationMemory(summarizer=failing, token_budget=1, count_tokens=one_token, max_pending=5)
+    for i in range(50):
+        memory.add(HumanMessage(content=str(i)))
+        settle(memory)
+
+    assert len(memory._pending) <= 5
+    assert [m.content for m in memory.prompt_messages()] == ["49"]
+
+
+def test_summaries_survive_the_pool_evicting_the_first_chain():
+    pool = FakeAgentPool(idle_timeout=0)
+    memory = ConversationMemory(token_budget=1, count_tokens=one_token)
+
+    agent = ElviaAgent("test-key", "Louis", cache=None, pool=pool)
+    agent._history_messages(memory)
+    assert memory.summarizer is not None
+
+    # La chaîne qui a servi la conversation est fermée par le pool
+    pool.evict_idle(force=True)
+    assert pool.stats()["evictions"] == 1
+
+    memory.add(HumanMessage(content="Bonjour"))
+    memory.add(AIMessage(content="Bonjour Louis"))
+    settle(memory)
+
+    assert memory.summary == "Résumé"
+    assert memory._pending == []
+    assert pool.stats()["builds"] == 2
+
+
+def test_concurrent_adds_keep_counts_consistent():
+    memory = ConversationMemory(token_budget=50, count_tokens=one_token)
+    threads = [threading.Thread(target=lambda: [memory.add(HumanMessage(content="x")) for _ in range(100)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert memory.prompt_tokens() == 50
+    assert len(memory.prompt_messages()) == 50
@@ -0,0 +1,113 @@
+import threading
+import time
+
+from elvia_agent import ElviaAgent
+from fakes import CountingLLM
+from response_cache import ResponseCache
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_exact_hit_ignores_case_spacing_and_final_punctuation():
+    cache = ResponseCache()
+    calls = []
+    compute = lambda: calls.append(1) or "réponse"
+
+    assert cache.get_or_compute("prompt", [], "Quel cuir ?", compute) == "réponse"
+    assert cache.get_or_compute("prompt", [], "  quel   CUIR", compute) == "réponse"
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_context_is_part_of_the_key():
+    cache = ResponseCache()
+    cache.get_or_compute("prompt", [("human", "a")], "q", lambda: "un")
+
+    assert cache.get_or_compute("prompt", [("human", "b")], "q", lambda: "deux") == "deux"
+    assert cache.get_or_compute("autre prompt", [("human", "a")], "q", lambda: "trois") == "trois"
+
+
+def test_entries_expire_and_are_evicted_lru():
+    cache = ResponseCache(max_entries=2, ttl=0.05)
+    for q in ("a", "b", "c"):
+        cache.get_or_compute("p", [], q, lambda: q)
+    assert cache.stats()["entries"] == 2
+    assert cache.get_or_compute("p", [], "a", lambda: "recalculé") == "recalculé"
+
+    time.sleep(0.06)
+    assert cache.get_or_compute("p", [], "b", lambda: "expiré") == "expiré"
+
+
+def test_semantic_hit_within_the_same_context():
+    vectors = {"quel cuir": [1.0, 0.0], "quel cuir utilisez-vous": [0.99, 0.05], "horaires": [0.0, 1.0]}
+    cache = ResponseCache(embed=vectors.__getitem__)
+    cache.get_or_compute("p", [], "Quel cuir ?", lambda: "Cuir Épi")
+
+    assert cache.get_or_compute("p", [], "Quel cuir utilisez-vous ?", lambda: "autre") == "Cuir Épi"
+    assert cache.get_or_compute("p", [], "Horaires ?", lambda: "10h-19h") == "10h-19h"
+    assert cache.stats()["semanticHits"] == 1
+
+
+def test_identical_concurrent_questions_share_one_call():
+    cache = ResponseCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return "réponse"
+
+    results = run_concurrently(8, lambda: cache.get_or_compute("p", [], "q", compute))
+    assert results == ["réponse"] * 8
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 7
+
+
+def test_identical_concurrent_streams_share_one_llm_call():
+    llm = CountingLLM(answer="Bonjour Louis, la Maison vous salue", delay=0.005)
+    agent = ElviaAgent(None, "Louis", llm=llm, cache=ResponseCache())
+
+    results = run_concurrently(8, lambda: "".join(agent.ask_stream("Qui êtes-vous ?", [])))
+    assert results == ["Bonjour Louis, la Maison vous salue"] * 8
+    assert llm.calls == 1
+
+
+def test_cancelled_stream_is_not_cached():
+    llm = CountingLLM(answer="Une réponse en plusieurs fragments")
+    cache = ResponseCache()
+    agent = ElviaAgent(None, "Louis", llm=llm, cache=cache)
+
+    cancel = threading.Event()
+    stream = agent.ask_stream("q", [], cancel=cancel)
+    next(stream)
+    cancel.set()
+    assert list(stream) == []
+    assert cache.stats()["entries"] == 0
+
+    assert "".join(agent.ask_stream("q", [])) == "Une réponse en plusieurs fragments"
+    assert "".join(agent.ask_stream("q", [])) == "Une réponse en plusieurs fragments"
+    assert llm.calls == 2
+
+
+def test_answers_are_cached_per_user_name_and_never_rewritten():
+    cache = ResponseCache()
+    louis = ElviaAgent(None, "Louis", llm=CountingLLM(answer="la Maison Louis Vuitton"), cache=cache)
+    marie = ElviaAgent(None, "Marie", llm=CountingLLM(answer="Bonjour Marie"), cache=cache)
+
+    assert louis.ask("Qui êtes-vous ?", []) == "la Maison Louis Vuitton"
+    assert marie.ask("Qui êtes-vous ?", []) == "Bonjour Marie"
+    assert "".join(louis.ask_stream("Qui êtes-vous ?", [])) == "la Maison Louis Vuitton"
@@ -0,0 +1,531 @@
+"""
+Apple Wallet (.pkpass) passes for product passports, built locally.
+
+apple-wallet.service.ts creates each pass through the AirWallet API (an
+image upload, then a create call) and finds passes by downloading all of
+them and scanning. Here a pass is assembled in-process:
+
+    pass.json      built from the wallet's product data
+    icon/logo/...  shared images, resized, encoded and SHA-1 hashed once
+    manifest.json  the cached image hashes plus the hash of pass.json
+    signature      detached PKCS#7 signature of manifest.json
+
+so issuing a pass costs one JSON dump, one hash, one signature and a zip,
+with no third-party round trip. The QR code is not an image: Wallet
+renders it from the "barcodes" entry of pass.json.
+
+- the signer certificate and key are parsed once per process (and per worker)
+- image assets are built once per source image; product images are keyed by path
+- build_bulk() spreads signing over a process pool for mass issuance
+- PassIndex keeps built passes on disk, indexed by certificate ID
+
+For development, generate a local CA and signer certificate:
+    python apple_wallet.py generate-certs -o wallet-dev-certs
+Passes signed with them are well-formed but iOS will refuse to install them.
+"""
+import argparse
+import datetime
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from PIL import Image
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import pkcs7
+from cryptography.x509.oid import NameOID
+
+MIMETYPE = 'application/vnd.apple.pkpass'
+
+BACKGROUND_COLOR = "rgb(13, 11, 8)"  # #0d0b08, Louis Vuitton black
+FOREGROUND_COLOR = "rgb(255, 255, 255)"
+LABEL_COLOR = "rgb(159, 132, 83)"  # #9f8453, Louis Vuitton gold
+ORGANIZATION_NAME = "Louis Vuitton"
+
+PUBLIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'public')
+DEFAULT_ICON = os.path.join(PUBLIC_DIR, 'apple-icon.png')
+
+# Asset role -> (width, height) at 1x, per Apple's pass image guidelines; @2x and @3x are derived
+IMAGE_SIZES = {
+    'icon': (29, 29),
+    'logo': (160, 50),
+    'thumbnail': (90, 90),
+}
+SCALES = (1, 2, 3)
+
+
+def _sha1(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def _compact_json(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+# -- assets ------------------------------------------------------------------
+
+def _encode_png(source, size):
+    image = source.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, 'PNG', optimize=True)
+    return out.getvalue()
+
+
+def render_image_assets(role, path):
+    """{file name: PNG bytes} for one image role at every scale"""
+    width, height = IMAGE_SIZES[role]
+    with Image.open(path) as source:
+        source = source.convert('RGBA')
+        return {
+            f"{role}{'' if scale == 1 else f'@{scale}x'}.png": _encode_png(source, (width * scale, height * scale))
+            for scale in SCALES
+        }
+
+
+class AssetBundle:
+    """Files shared by many passes, with their manifest entries hashed once"""
+
+    def __init__(self, files):
+        self.files = dict(files)
+        self.manifest = {name: _sha1(data) for name, data in self.files.items()}
+
+    def merged(self, other):
+        """A bundle with other's files added (or replacing ours)"""
+        bundle = AssetBundle.__new__(AssetBundle)
+        bundle.files = {**self.files, **other.files}
+        bundle.manifest = {**self.manifest, **other.manifest}
+        return bundle
+
+
+@lru_cache(maxsize=256)
+def _load_assets(role, path, mtime_ns):
+    return AssetBundle(render_image_assets(role, path))
+
+
+def load_assets(role, path):
+    """Bundle for one image role, rendered once per process (re-rendered if the file changes)"""
+    return _load_assets(role, os.path.abspath(path), os.stat(path).st_mtime_ns)
+
+
+# -- signing -------------------------------------------------------------------
+
+class PassSigner:
+    """A Pass Type ID certificate and key plus the Apple WWDR intermediate, parsed once"""
+
+    def __init__(self, cert_pem, key_pem, wwdr_pem, password=None):
+        self.certificate = x509.load_pem_x509_certificate(cert_pem)
+        self.private_key = serialization.load_pem_private_key(key_pem, password=password)
+        self.wwdr = x509.load_pem_x509_certificate(wwdr_pem)
+
+    def sign(self, manifest):
+        """Detached DER PKCS#7 signature of manifest.json"""
+        return (
+            pkcs7.PKCS7SignatureBuilder()
+            .set_data(manifest)
+            .add_signer(self.certificate, self.private_key, hashes.SHA256())
+            .add_certificate(self.wwdr)
+            .sign(serialization.Encoding.DER, [pkcs7.PKCS7Options.DetachedSignature, pkcs7.PKCS7Options.Binary])
+        )
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@lru_cache(maxsize=8)
+def _load_signer(cert_path, key_path, wwdr_path, password, mtimes):
+    return PassSigner(_read(cert_path), _read(key_path), _read(wwdr_path), password)
+
+
+def load_signer(cert_path, key_path, wwdr_path, password=None):
+    """Signer for PEM files, parsed once per process (reloaded if a file changes)"""
+    paths = tuple(os.path.abspath(p) for p in (cert_path, key_path, wwdr_path))
+    mtimes = tuple(os.stat(p).st_mtime_ns for p in paths)
+    return _load_signer(*paths, password.encode() if isinstance(password, str) else password, mtimes)
+
+
+def generate_certificates(pass_type_id="pass.com.louisvuitton.dpp", team_id="LVDPPDEV01", key_size=2048, days=365):
+    """
+    A local stand-in for the Apple WWDR CA and a Pass Type ID certificate
+    issued by it (never sent anywhere). Returns PEM bytes for
+    {"wwdr.pem", "pass-cert.pem", "pass-key.pem"}.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    ca_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    ca_name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "LV DPP Development WWDR CA")])
+    ca_cert = (
+        x509.CertificateBuilder()
+        .subject_name(ca_name).issuer_name(ca_name)
+        .public_key(ca_key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=days))
+        .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
+        .sign(ca_key, hashes.SHA256())
+    )
+    key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(x509.Name([
+            x509.NameAttribute(NameOID.USER_ID, pass_type_id),
+            x509.NameAttribute(NameOID.COMMON_NAME, f"Pass Type ID: {pass_type_id}"),
+            x509.NameAttribute(NameOID.ORGANIZATIONAL_UNIT_NAME, team_id),
+        ]))
+        .issuer_name(ca_name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=days))
+        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+        .sign(ca_key, hashes.SHA256())
+    )
+    return {
+        "wwdr.pem": ca_cert.public_bytes(serialization.Encoding.PEM),
+        "pass-cert.pem": cert.public_bytes(serialization.Encoding.PEM),
+        "pass-key.pem": key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ),
+    }
+
+
+# -- pass.json -----------------------------------------------------------------
+
+def serial_number(certificate_id):
+    return re.sub(r'[^\w.-]', '_', certificate_id)
+
+
+def _field(key, label, value):
+    return {"key": key, "label": label, "value": value}
+
+
+def product_ids(product_data):
+    """(product ID, certificate ID) of the wallet's product data"""
+    product_id = product_data.get('productId') or product_data.get('id')
+    return product_id, product_data.get('certificateId') or product_data.get('cert') or product_id
+
+
+def pass_json(product_data, pass_type_id, team_id, organization=ORGANIZATION_NAME):
+    """pass.json for one product (the fields of createLVCertificatePass), shaped from the wallet's product data"""
+    product_id, certificate_id = product_ids(product_data)
+    name = product_data.get('name') or product_id
+
+    back_fields = [
+        _field("productName", "Product Name", name),
+        _field("productId", "Product ID", product_id),
+        _field("certificateId", "Certificate ID", certificate_id),
+    ]
+    if product_data.get('blockchainHash'):
+        back_fields.append(_field("blockchainHash", "Blockchain Hash", product_data['blockchainHash']))
+    back_fields.append(_field("about", "About", "This digital certificate is permanently recorded on the "
+                                                "Aura Blockchain network for authenticity verification."))
+
+    data = {
+        "formatVersion": 1,
+        "passTypeIdentifier": pass_type_id,
+        "teamIdentifier": team_id,
+        "serialNumber": serial_number(certificate_id),
+        "organizationName": organization,
+        "description": "Blockchain-verified Digital Product Passport",
+        "logoText": "LOUIS VUITTON",
+        "backgroundColor": BACKGROUND_COLOR,
+        "foregroundColor": FOREGROUND_COLOR,
+        "labelColor": LABEL_COLOR,
+        "generic": {
+            "primaryFields": [_field("product", "Certificate of Authenticity", name)],
+            "secondaryFields": [
+                _field("productId", "PRODUCT ID", product_id),
+                _field("certificate", "CERTIFICATE", certificate_id),
+            ],
+            "auxiliaryFields": [_field("owner", "OWNER", product_data['owner'])] if product_data.get('owner') else [],
+            "backFields": back_fields,
+        },
+    }
+    if product_data.get('verificationUrl'):
+        data["barcodes"] = [{
+            "format": "PKBarcodeFormatQR",
+            "message": product_data['verificationUrl'],
+            "messageEncoding": "iso-8859-1",
+            "altText": certificate_id,
+        }]
+    return data
+
+
+# -- bundles -------------------------------------------------------------------
+
+def manifest_json(pass_bytes, assets):
+    """manifest.json for a pass: the bundle's cached hashes plus the hash of pass.json"""
+    return _compact_json({**assets.manifest, "pass.json": _sha1(pass_bytes)})
+
+
+def pkpass_bytes(pass_data, assets, signer):
+    """
+    Zip a signed .pkpass. Only pass.json is hashed here; the asset hashes
+    come from the bundle. Returns (bytes, sha1 of manifest.json), the
+    latter identifying the pass contents.
+    """
+    pass_bytes = _compact_json(pass_data)
+    manifest = manifest_json(pass_bytes, assets)
+
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w') as bundle:
+        bundle.writestr('pass.json', pass_bytes, zipfile.ZIP_DEFLATED)
+        # PNGs are already compressed
+        for name, data in assets.files.items():
+            bundle.writestr(name, data, zipfile.ZIP_STORED)
+        bundle.writestr('manifest.json', manifest, zipfile.ZIP_DEFLATED)
+        bundle.writestr('signature', signer.sign(manifest), zipfile.ZIP_STORED)
+    return out.getvalue(), _sha1(manifest)
+
+
+def read_pkpass(data):
+    """pass.json of a .pkpass, after checking every file against manifest.json; raises ValueError"""
+    with zipfile.ZipFile(io.BytesIO(data)) as bundle:
+        manifest = json.loads(bundle.read('manifest.json'))
+        names = set(bundle.namelist()) - {'manifest.json', 'signature'}
+        if names != set(manifest):
+            raise ValueError("manifest.json does not list the bundle's files")
+        for name in names:
+            if _sha1(bundle.read(name)) != manifest[name]:
+                raise ValueError(f"Hash mismatch for {name}")
+        if not pkcs7.load_der_pkcs7_certificates(bundle.read('signature')):
+            raise ValueError("Signature carries no certificates")
+        return json.loads(bundle.read('pass.json'))
+
+
+class PassBuilder:
+    """Builds passes for one Pass Type ID with a shared signer and shared assets"""
+
+    def __init__(self, signer, pass_type_id, team_id, organization=ORGANIZATION_NAME,
+                 icon_path=DEFAULT_ICON, logo_path=None):
+        self.signer = signer
+        self.pass_type_id = pass_type_id
+        self.team_id = team_id
+        self.organization = organization
+        self.assets = load_assets('icon', icon_path)
+        if logo_path:
+            self.assets = self.assets.merged(load_assets('logo', logo_path))
+        self._with_thumbnail = {}
+
+    def assets_for(self, thumbnail_path=None):
+        """Shared assets, plus a product thumbnail when a local image path is given"""
+        if not thumbnail_path:
+            return self.assets
+        bundle = self._with_thumbnail.get(thumbnail_path)
+        if bundle is None:
+            bundle = self._with_thumbnail[thumbnail_path] = \
+                self.assets.merged(load_assets('thumbnail', thumbnail_path))
+        return bundle
+
+    def pass_json(self, product_data):
+        return pass_json(product_data, self.pass_type_id, self.team_id, self.organization)
+
+    def digest(self, product_data, thumbnail_path=None):
+        """Manifest hash the pass would have, without signing; tells whether a stored pass is current"""
+        return _sha1(manifest_json(_compact_json(self.pass_json(product_data)), self.assets_for(thumbnail_path)))
+
+    def build(self, product_data, thumbnail_path=None):
+        """(serial number, .pkpass bytes, manifest hash) for one product"""
+        data = self.pass_json(product_data)
+        bundle, digest = pkpass_bytes(data, self.assets_for(thumbnail_path), self.signer)
+        return data['serialNumber'], bundle, digest
+
+
+# -- bulk building in a process pool ---------------------------------------------
+
+_worker_builder = None
+
+
+def make_builder(config):
+    cert_path, key_path, wwdr_path, password, pass_type_id, team_id, organization, icon_path, logo_path = config
+    return PassBuilder(load_signer(cert_path, key_path, wwdr_path, password), pass_type_id, team_id,
+                       organization, icon_path, logo_path)
+
+
+def _init_worker(config):
+    global _worker_builder
+    _worker_builder = make_builder(config)
+
+
+def _build_chunk(items):
+    return [_worker_builder.build(product_data, thumbnail_path) for product_data, thumbnail_path in items]
+
+
+def builder_config(cert_path, key_path, wwdr_path, pass_type_id, team_id, password=None,
+                   organization=ORGANIZATION_NAME, icon_path=DEFAULT_ICON, logo_path=None):
+    """Picklable description of a PassBuilder, for make_builder() and build_bulk()"""
+    return (cert_path, key_path, wwdr_path, password, pass_type_id, team_id, organization, icon_path, logo_path)
+
+
+def build_bulk(config, items, workers=None, chunk_size=32):
+    """
+    Build many passes from (product_data, thumbnail_path or None) pairs, in
+    a process pool when more than one CPU is available. Each worker parses
+    the certificates and renders the assets once. Returns build() results in order.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(items) <= chunk_size:
+        builder = make_builder(config)
+        return [builder.build(product_data, thumbnail_path) for product_data, thumbnail_path in items]
+
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(config,)) as executor:
+        return [result for chunk in executor.map(_build_chunk, chunks) for result in chunk]
+
+
+# -- local pass index ------------------------------------------------------------
+
+class PassIndex:
+    """
+    Built passes on disk, indexed by certificate ID (and product ID).
+    Each pass is <directory>/<serial>.pkpass; index.jsonl is an append-only
+    log of entries, replayed into dicts on open. This replaces
+    getAllPasses + findPassByCertificate's list-and-scan with dict lookups.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, 'index.jsonl')
+        self._lock = threading.Lock()
+        self._by_certificate = {}
+        self._by_product = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn final write
+                self._apply(entry)
+
+    def _apply(self, entry):
+        certificate_id = entry['certificateId']
+        previous = self._by_certificate.pop(certificate_id, None)
+        if previous and self._by_product.get(previous['productId']) is previous:
+            del self._by_product[previous['productId']]
+        if entry.get('deleted'):
+            return
+        self._by_certificate[certificate_id] = entry
+        self._by_product[entry['productId']] = entry
+
+    def path(self, entry):
+        return os.path.join(self.directory, entry['serialNumber'] + '.pkpass')
+
+    def get(self, certificate_id):
+        """Index entry for a certificate, or None"""
+        return self._by_certificate.get(certificate_id)
+
+    def find(self, certificate_id=None, product_id=None):
+        """Entry by certificate ID, else by product ID (like findPassByCertificate), or None"""
+        entry = self._by_certificate.get(certificate_id) if certificate_id else None
+        if entry is None and product_id:
+            entry = self._by_product.get(product_id)
+        return entry
+
+    def put(self, certificate_id, product_id, serial, data, digest):
+        """Store a built pass and index it; returns the entry"""
+        entry = {
+            "certificateId": certificate_id,
+            "productId": product_id,
+            "serialNumber": serial,
+            "manifestHash": digest,
+            "size": len(data),
+            "updatedAt": time.time(),
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path(entry))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._append(entry)
+        return entry
+
+    def delete(self, certificate_id):
+        """Remove a pass (like deletePass); returns whether it existed"""
+        entry = self._by_certificate.get(certificate_id)
+        if entry is None:
+            return False
+        self._append({"certificateId": certificate_id, "productId": entry['productId'], "deleted": True})
+        try:
+            os.unlink(self.path(entry))
+        except OSError:
+            pass
+        return True
+
+    def _append(self, entry):
+        with self._lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+            self._apply(entry)
+
+    def __len__(self):
+        return len(self._by_certificate)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apple Wallet .pkpass builder")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    certs = sub.add_parser('generate-certs', help="Write a local CA and pass certificate for development")
+    certs.add_argument('-o', '--output', required=True, help="Directory for wwdr.pem, pass-cert.pem, pass-key.pem")
+    certs.add_argument('--pass-type-id', default="pass.com.louisvuitton.dpp")
+    certs.add_argument('--team-id', default="LVDPPDEV01")
+
+    build = sub.add_parser('build', help="Write a .pkpass per product for a JSON list of products")
+    build.add_argument('products')
+    build.add_argument('-o', '--output', required=True, help="Pass directory (indexed by certificate ID)")
+    build.add_argument('--cert', default=os.environ.get('APPLE_PASS_CERT'))
+    build.add_argument('--key', default=os.environ.get('APPLE_PASS_KEY'))
+    build.add_argument('--wwdr', default=os.environ.get('APPLE_WWDR_CERT'))
+    build.add_argument('--pass-type-id', default=os.environ.get('APPLE_PASS_TYPE_ID'))
+    build.add_argument('--team-id', default=os.environ.get('APPLE_TEAM_ID'))
+    build.add_argument('--workers', type=int, default=None)
+
+    args = parser.parse_args(argv)
+    if args.command == 'generate-certs':
+        os.makedirs(args.output, exist_ok=True)
+        for name, data in generate_certificates(args.pass_type_id, args.team_id).items():
+            fd = os.open(os.path.join(args.output, name), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+        print(f"✅ Wrote development certificates to {args.output}")
+        print(f"   APPLE_PASS_CERT={os.path.join(args.output, 'pass-cert.pem')} "
+              f"APPLE_PASS_KEY={os.path.join(args.output, 'pass-key.pem')} "
+              f"APPLE_WWDR_CERT={os.path.join(args.output, 'wwdr.pem')} "
+              f"APPLE_PASS_TYPE_ID={args.pass_type_id} APPLE_TEAM_ID={args.team_id}")
+        return 0
+
+    if not all((args.cert, args.key, args.wwdr, args.pass_type_id, args.team_id)):
+        parser.error("build needs --cert, --key, --wwdr, --pass-type-id and --team-id (or the APPLE_* variables)")
+    with open(args.products) as f:
+        products = json.load(f)
+
+    config = builder_config(args.cert, args.key, args.wwdr, args.pass_type_id, args.team_id)
+    index = PassIndex(args.output)
+    results = build_bulk(config, [(product, None) for product in products], args.workers)
+    for product, (serial, data, digest) in zip(products, results):
+        product_id, certificate_id = product_ids(product)
+        print(json.dumps(index.put(certificate_id, product_id, serial, data, digest)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""
+Incremental badge evaluation.
+
+evaluateBadges in badge-engine.service.ts recomputes every badge for a
+product on every page view (linear search of product.json, full filter of
+repairs.json). Here the inputs are kept as per-product aggregates (repair
+count, carbon saved, ownership start, craftsmanship hours) and each
+product's badges as a bitmask:
+
+- reads are one dict lookup; the badge list for a mask is built once and shared
+- a repair or transfer event re-evaluates only that product (repairs come
+  from repair_log.py, transfers from the ownership ledger)
+- time-based criteria (yearsOwned) are re-checked by a sweep over a heap of
+  due times, instead of on every request
+
+Badges are defined by badges.json; criteria of the form "<metric> <op> <number>"
+or a bare boolean metric are evaluated against the aggregates. Criteria on
+unknown metrics keep the static "achieved" value, as in the TS service.
+"""
+import heapq
+import json
+import operator
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+YEAR_SECONDS = 365 * 24 * 60 * 60
+
+CRITERION = re.compile(r'^\s*(\w+)\s*(?:(>=|<=|==|>|<)\s*(-?\d+(?:\.\d+)?))?\s*$')
+OPERATORS = {'>=': operator.ge, '<=': operator.le, '==': operator.eq, '>': operator.gt, '<': operator.lt}
+TIME_METRICS = ('yearsOwned',)
+
+
+def parse_timestamp(value):
+    """ISO 8601 string -> epoch seconds (naive timestamps are UTC)"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def compile_criteria(badge):
+    """(metric, compare, threshold) for a badge, or None if it can't be evaluated"""
+    match = CRITERION.match(badge.get('criteria') or '')
+    if not match:
+        return None
+    metric, op, threshold = match.groups()
+    if op is None:
+        return metric, None, None
+    return metric, OPERATORS[op], float(threshold)
+
+
+class ProductAggregate:
+    __slots__ = ('owner_id', 'ownership_start', 'transfers', 'repairs', 'carbon_saved',
+                 'craftsmanship_hours', 'mask')
+
+    def __init__(self, craftsmanship_hours=0):
+        self.owner_id = None
+        self.ownership_start = None  # epoch seconds, None until activated
+        self.transfers = 0
+        self.repairs = 0
+        self.carbon_saved = 0.0
+        self.craftsmanship_hours = craftsmanship_hours
+        self.mask = 0
+
+
+def _years_owned(aggregate, now):
+    if aggregate.ownership_start is None:
+        return 0
+    return (now - aggregate.ownership_start) / YEAR_SECONDS
+
+
+# Criteria metric -> value for an aggregate at time now
+METRICS = {
+    'firstOwner': lambda aggregate, now: aggregate.ownership_start is not None and aggregate.transfers == 0,
+    'craftsmanshipHours': lambda aggregate, now: aggregate.craftsmanship_hours,
+    'repairs': lambda aggregate, now: aggregate.repairs,
+    'carbonSaved': lambda aggregate, now: aggregate.carbon_saved,
+    'yearsOwned': _years_owned,
+}
+
+
+class BadgeEngine:
+    def __init__(self, badges, products=(), repairs=(), ownership=(), now=None):
+        self.definitions = list(badges)
+        rules = [compile_criteria(badge) for badge in self.definitions]
+        self._time_thresholds = sorted({
+            rule[2] for rule in rules if rule and rule[0] in TIME_METRICS and rule[2] is not None
+        })
+        # Badges that always have their static value are folded into one mask
+        self._static_mask = 0
+        self._checks = []  # (bit, metric function, compare or None, threshold)
+        for bit, (badge, rule) in enumerate(zip(self.definitions, rules)):
+            if rule is not None and rule[0] in METRICS:
+                metric, compare, threshold = rule
+                self._checks.append((1 << bit, METRICS[metric], compare, threshold))
+            elif badge.get('achieved', False):
+                self._static_mask |= 1 << bit
+        self._views = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+        self.events = 0
+        self.sweeps = 0
+        self.swept = 0
+        self.rebuild(products, repairs, ownership, now)
+
+    @classmethod
+    def from_data_dir(cls, data_dir, ownership=None, now=None, extra_repairs=()):
+        """
+        Engine over app/data JSON; ownership records default to ownership.json.
+        extra_repairs (e.g. from a RepairLog) are counted after repairs.json.
+        """
+        data = {}
+        for name in ('badges', 'product', 'repairs', 'ownership'):
+            if name == 'ownership' and ownership is not None:
+                continue
+            with open(os.path.join(data_dir, f'{name}.json')) as f:
+                data[name] = json.load(f)
+        return cls(data['badges'], data['product'], [*data['repairs'], *extra_repairs],
+                   ownership if ownership is not None else data['ownership'], now)
+
+    # -- evaluation --------------------------------------------------------
+
+    def _evaluate(self, aggregate, now):
+        mask = self._static_mask
+        for bit, metric, compare, threshold in self._checks:
+            value = metric(aggregate, now)
+            if (value if compare is None else compare(value, threshold)):
+                mask |= bit
+        aggregate.mask = mask
+
+    def _next_due(self, aggregate, now):
+        """Next time a time-based criterion changes for this product, or None"""
+        if aggregate.ownership_start is None:
+            return None
+        for threshold in self._time_thresholds:
+            due = aggregate.ownership_start + threshold * YEAR_SECONDS
+            if due > now:
+                return due
+        return None
+
+    def _update(self, product_id, aggregate, now, reschedule=True):
+        # Called with the lock held; only a new ownership start (or a sweep) moves the due time
+        self._evaluate(aggregate, now)
+        if not reschedule:
+            return
+        due = self._next_due(aggregate, now)
+        if due is not None:
+            heapq.heappush(self._due, (due, product_id, aggregate.ownership_start))
+
+    # -- bulk load ---------------------------------------------------------
+
+    def rebuild(self, products, repairs, ownership, now=None):
+        """Recompute every aggregate and badge from scratch"""
+        now = time.time() if now is None else now
+        self._rebuild(products, repairs, ownership, now)
+
+    def _rebuild(self, products, repairs, ownership, now):
+        # Products missing from product.json fall back to the first entry, as in the TS service
+        default_hours = (products[0].get('craftsmanshipHours') or 0) if products else 0
+        hours = {product['productId']: product.get('craftsmanshipHours') or 0 for product in products}
+
+        aggregates = {}
+
+        def aggregate_for(product_id):
+            aggregate = aggregates.get(product_id)
+            if aggregate is None:
+                aggregate = aggregates[product_id] = ProductAggregate(hours.get(product_id, default_hours))
+            return aggregate
+
+        for repair in repairs:
+            aggregate = aggregate_for(repair['productId'])
+            aggregate.repairs += 1
+            aggregate.carbon_saved += repair.get('carbonSavedKg', 0)
+
+        for record in ownership:
+            self._apply_ownership(aggregate_for(record['productId']), record.get('ownership') or {})
+
+        due = []
+        for product_id, aggregate in aggregates.items():
+            self._evaluate(aggregate, now)
+            next_due = self._next_due(aggregate, now)
+            if next_due is not None:
+                due.append((next_due, product_id, aggregate.ownership_start))
+        heapq.heapify(due)
+
+        with self._lock:
+            self._default_hours = default_hours
+            self._hours = hours
+            self._aggregates = aggregates
+            self._due = due
+
+    @staticmethod
+    def _apply_ownership(aggregate, ownership):
+        """Current owner's holding period: from the last transfer, else from activation"""
+        history = ownership.get('transferHistory') or []
+        started_at = history[-1].get('transferDate') if history else \
+            (ownership.get('firstActivation') or {}).get('activatedAt')
+        aggregate.owner_id = (ownership.get('currentOwner') or {}).get('clientId')
+        aggregate.transfers = len(history)
+        aggregate.ownership_start = parse_timestamp(started_at) if started_at else None
+
+    # -- events ------------------------------------------------------------
+
+    def _aggregate_for(self, product_id):
+        # Called with the lock held
+        aggregate = self._aggregates.get(product_id)
+        if aggregate is None:
+            aggregate = self._aggregates[product_id] = \
+                ProductAggregate(self._hours.get(product_id, self._default_hours))
+        return aggregate
+
+    def on_repair(self, repair, now=None):
+        """A repair (shaped like a repairs.json entry) was completed"""
+        now = time.time() if now is None else now
+        with self._lock:
+            aggregate = self._aggregate_for(repair['productId'])
+            aggregate.repairs += 1
+            aggregate.carbon_saved += repair.get('carbonSavedKg', 0)
+            self._update(repair['productId'], aggregate, now, reschedule=False)
+            self.events += 1
+
+    def on_transfer(self, entry, now=None):
+        """An ownership transfer (an OwnershipLedger log entry) was recorded"""
+        now = time.time() if now is None else now
+        with self._lock:
+            aggregate = self._aggregate_for(entry['productId'])
+            aggregate.owner_id = entry['toClientId']
+            aggregate.transfers += 1
+            aggregate.ownership_start = parse_timestamp(entry['transferDate'])
+            self._update(entry['productId'], aggregate, now)
+            self.events += 1
+
+    def on_activation(self, record, now=None):
+        """A product's ownership was activated (an ownership.json record)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            aggregate = self._aggregate_for(record['productId'])
+            self._apply_ownership(aggregate, record.get('ownership') or {})
+            self._update(record['productId'], aggregate, now)
+            self.events += 1
+
+    # -- time-based badges -------------------------------------------------
+
+    def sweep(self, now=None):
+        """Re-evaluate products whose time-based badges are due; returns how many"""
+        now = time.time() if now is None else now
+        swept = 0
+        with self._lock:
+            while self._due and self._due[0][0] <= now:
+                _, product_id, started_at = heapq.heappop(self._due)
+                aggregate = self._aggregates.get(product_id)
+                # Skip entries made stale by a later transfer
+                if aggregate is None or aggregate.ownership_start != started_at:
+                    continue
+                self._update(product_id, aggregate, now)
+                swept += 1
+            self.sweeps += 1
+            self.swept += swept
+        return swept
+
+    def start_sweeper(self, interval=3600.0):
+        """Run sweep() every interval seconds in a daemon thread"""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while not self._wake.wait(interval):
+                self.sweep()
+
+        self._thread = threading.Thread(target=loop, name='badge-sweeper', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # -- reads -------------------------------------------------------------
+
+    def _view(self, mask, achieved_only):
+        key = (mask, achieved_only)
+        view = self._views.get(key)
+        if view is None:
+            view = tuple(
+                {**badge, "achieved": bool(mask >> bit & 1)}
+                for bit, badge in enumerate(self.definitions)
+                if not achieved_only or mask >> bit & 1
+            )
+            self._views[key] = view
+        return view
+
+    def badges(self, product_id):
+        """
+        All badges for a product, with "achieved" set (like evaluateBadges),
+        or None for an unknown product. The dicts are shared; don't mutate them.
+        """
+        aggregate = self._aggregates.get(product_id)
+        if aggregate is None:
+            return None
+        return self._view(aggregate.mask, False)
+
+    def achieved_badges(self, product_id):
+        """Achieved badges only (like getAchievedBadges), or None for an unknown product"""
+        aggregate = self._aggregates.get(product_id)
+        if aggregate is None:
+            return None
+        return self._view(aggregate.mask, True)
+
+    def aggregate(self, product_id):
+        """Per-product inputs behind the badges, or None"""
+        aggregate = self._aggregates.get(product_id)
+        if aggregate is None:
+            return None
+        return {
+            "ownerId": aggregate.owner_id,
+            "ownershipStart": aggregate.ownership_start,
+            "transfers": aggregate.transfers,
+            "repairs": aggregate.repairs,
+            "carbonSavedKg": aggregate.carbon_saved,
+            "craftsmanshipHours": aggregate.craftsmanship_hours,
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "products": len(self._aggregates),
+                "events": self.events,
+                "scheduledChecks": len(self._due),
+                "sweeps": self.sweeps,
+                "swept": self.swept,
+            }
@@ -0,0 +1,103 @@
+"""
+Certificate verification for QR scans.
+
+Every scan of a verificationUrl ends up here, including floods of
+counterfeit IDs. An in-memory Bloom filter of anchored certificate IDs
+answers "unknown" without touching the receipt store; only IDs that pass
+it are looked up; the root is recomputed from the certificate hash and its
+Merkle inclusion proof (O(log batch size) hashes) and must equal the batch
+root stored in the anchor ledger.
+"""
+import threading
+from datetime import datetime, timezone
+
+from bloom_filter import BloomFilter
+from hash_engine import proof_root
+
+
+def now_iso():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+class CertificateVerifier:
+    def __init__(self, engine, capacity=1_000_000, error_rate=0.001):
+        self.engine = engine
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self.rejected_by_filter = 0
+        self.store_lookups = 0
+        self._build_filter(capacity)
+        engine.listeners.append(self._on_anchored)
+
+    def _build_filter(self, capacity):
+        certificate_ids = self.engine.certificate_ids()
+        bloom = BloomFilter(max(capacity, len(certificate_ids) * 2), self.error_rate)
+        for certificate_id in certificate_ids:
+            bloom.add(certificate_id)
+        self.bloom = bloom
+
+    def _on_anchored(self, receipts):
+        with self._lock:
+            for receipt in receipts:
+                self.bloom.add(receipt['certificateId'])
+            # Keep the false-positive rate in check as the catalog grows
+            if len(self.bloom) > self.bloom.capacity:
+                self._build_filter(self.bloom.capacity * 2)
+
+    def verify(self, certificate_id, blockchain_hash=None):
+        """
+        Verify one certificate ID. If blockchain_hash is given it must match
+        the anchored hash. Returns a result shaped like VerificationResult in
+        certificate-verifier.ts.
+        """
+        result = {
+            "isValid": False,
+            "certificateId": certificate_id,
+            "blockchainHash": None,
+            "verifiedAt": now_iso(),
+            "errors": [],
+        }
+
+        if certificate_id not in self.bloom:
+            self.rejected_by_filter += 1
+            result["errors"].append("Unknown certificate")
+            return result
+
+        self.store_lookups += 1
+        receipt = self.engine.receipt(certificate_id)
+        if receipt is None:
+            result["errors"].append("Unknown certificate")
+            return result
+
+        result.update({
+            "blockchainHash": receipt['blockchainHash'],
+            "batchId": receipt['batchId'],
+            "root": receipt['root'],
+            "anchorTx": receipt['anchorTx'],
+            "anchoredAt": receipt['anchoredAt'],
+        })
+        if blockchain_hash and blockchain_hash != receipt['blockchainHash']:
+            result["errors"].append("Blockchain hash verification failed - tamper detected")
+        anchored_root = self.engine.anchored_root(receipt['batchId'])
+        if anchored_root is None:
+            result["errors"].append("Batch is not in the anchor ledger")
+        elif proof_root(receipt['blockchainHash'], receipt['proof']) != anchored_root:
+            result["errors"].append("Merkle inclusion proof does not lead to the anchored root")
+
+        result["isValid"] = not result["errors"]
+        return result
+
+    def verify_many(self, certificate_ids):
+        results = [self.verify(certificate_id) for certificate_id in certificate_ids]
+        valid = sum(1 for r in results if r['isValid'])
+        return {
+            "results": results,
+            "summary": {"total": len(results), "valid": valid, "invalid": len(results) - valid},
+        }
+
+    def stats(self):
+        return {
+            "knownCertificates": len(self.bloom),
+            "rejectedByFilter": self.rejected_by_filter,
+            "storeLookups": self.store_lookups,
+        }
@@ -0,0 +1,91 @@
+"""
+Request credentials for the wallet service's write routes.
+
+Callers send "Authorization: Bearer <credential>". Issuer routes (certificate
+anchoring) take one of the API keys configured on the server, compared in
+constant time.
+
+Owner routes (ownership transfers) take a client token: the client ID and an
+expiry, signed with HMAC-SHA256 under a secret shared with the sign-in
+service, which issues a token when a client signs in. The route then acts as
+that client only, so knowing someone's client ID is not enough to act for them.
+
+    python credentials.py client-token CL-782134 --ttl 3600   # CLIENT_AUTH_SECRET from the environment
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import time
+
+DEFAULT_CLIENT_TOKEN_TTL = 12 * 60 * 60
+
+
+def bearer_token(header):
+    """Credential from an "Authorization: Bearer <credential>" header, or None"""
+    scheme, _, token = (header or '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
+
+
+def key_matches(presented, keys):
+    """True if presented is one of keys; every key is compared so timing doesn't leak which"""
+    if not presented:
+        return False
+    presented = presented.encode()
+    matched = False
+    for key in keys:
+        matched |= hmac.compare_digest(presented, key.encode())
+    return matched
+
+
+def _signature(secret, message):
+    digest = hmac.new(secret.encode(), message.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def client_token(secret, client_id, ttl=DEFAULT_CLIENT_TOKEN_TTL, now=None):
+    """Token "<clientId>.<expires>.<signature>" proving the bearer signed in as client_id"""
+    expires = int((time.time() if now is None else now) + ttl)
+    message = f"{client_id}.{expires}"
+    return f"{message}.{_signature(secret, message)}"
+
+
+def verify_client_token(secret, token, now=None):
+    """Client ID a token was issued to, or None if it is malformed, forged or expired"""
+    if not secret or not token:
+        return None
+    message, _, signature = token.rpartition('.')
+    client_id, _, expires = message.rpartition('.')
+    if not client_id or not expires.isdigit():
+        return None
+    if not hmac.compare_digest(signature.encode(), _signature(secret, message).encode()):
+        return None
+    if int(expires) <= (time.time() if now is None else now):
+        return None
+    return client_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Issue credentials for the wallet service")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('secret', help="print a new random CLIENT_AUTH_SECRET")
+    issue = commands.add_parser('client-token', help="sign a client token with CLIENT_AUTH_SECRET")
+    issue.add_argument('client_id')
+    issue.add_argument('--ttl', type=int, default=DEFAULT_CLIENT_TOKEN_TTL, help="seconds until it expires")
+    args = parser.parse_args()
+
+    if args.command == 'secret':
+        print(secrets.token_urlsafe(32))
+        return
+    secret = os.environ.get('CLIENT_AUTH_SECRET')
+    if not secret:
+        parser.error("set CLIENT_AUTH_SECRET")
+    print(client_token(secret, args.client_id, args.ttl))
+
+
+if __name__ == '__main__':
+    main()
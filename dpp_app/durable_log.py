@@ -0,0 +1,57 @@
+"""
+Helpers shared by the append-only JSON-lines logs (ownership_ledger.py,
+transfer_service.py).
+
+Each entry is one JSON object per line, fsync'd before it is acknowledged.
+A crash can leave the last line half written: it was never acknowledged,
+so replay drops it and truncates the file back to the end of the last
+complete line. Otherwise the next append would be glued onto the broken
+line and lost, along with everything after it, on the following restart.
+
+A log has a single writer process, enforced with an exclusive flock. The
+lock is taken on a sidecar <log>.lock file rather than the log itself,
+because compaction renames the log and the lock would move with it.
+"""
+import fcntl
+import json
+import os
+
+
+class LogLocked(Exception):
+    """Another process already has the log open for writing"""
+
+
+def lock_writer(log_path):
+    """Take the writer lock for a log; returns the lock file, which holds the lock until closed"""
+    lock_file = open(log_path + '.lock', 'a')
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise LogLocked(f"{log_path} is already open for writing in another process")
+    return lock_file
+
+
+def read_entries(path):
+    """
+    Entries of a log, in order. The first torn or unparseable line ends the
+    log: the file is truncated there, so later appends start on a clean line.
+    """
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    end = 0
+    with open(path, 'rb+') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+            end += len(line)
+        if end < os.fstat(f.fileno()).st_size:
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+    return entries
@@ -0,0 +1,319 @@
+"""
+Signed Google Wallet "save" links for product passports.
+
+A save link is https://pay.google.com/gp/v/save/<JWT>, where the JWT is
+signed (RS256) with a Google Cloud service account key and carries the
+pass class and one or more pass objects. Everything here is local: the
+objects are embedded in the JWT and Google creates them when the link is
+opened, so no API call is needed to issue a pass.
+
+Built for volume:
+- the service account key is parsed once per process (and per worker)
+- the pass class is built once per (issuer, class suffix)
+- many objects can share one JWT (one signature, one link for a whole collection)
+- sign_bulk() spreads signing over a process pool for mass issuance
+
+For development, generate a local key instead of a real service account:
+    python google_wallet.py generate-key -o wallet-dev-key.json
+    GOOGLE_WALLET_KEY_FILE=wallet-dev-key.json GOOGLE_WALLET_ISSUER_ID=3388000000012345678 python wallet_backend.py
+Links signed with such a key are well-formed but Google will reject them.
+"""
+import argparse
+import base64
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+SAVE_URL_BASE = "https://pay.google.com/gp/v/save/"
+DEFAULT_CLASS_SUFFIX = "lv_dpp_passport"
+# Objects are embedded in the link (about 1 kB of URL each), so links are
+# capped both in objects and in length, well under common 16-32 kB URL limits
+DEFAULT_MAX_OBJECTS = 10
+DEFAULT_MAX_URL_LENGTH = 16_000
+
+BACKGROUND_COLOR = "#0d0b08"
+LOGO_URL = "https://upload.wikimedia.org/wikipedia/commons/thumb/7/76/Louis_Vuitton_logo_and_wordmark.svg/1200px-Louis_Vuitton_logo_and_wordmark.svg.png"
+
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def b64url_decode(segment):
+    if isinstance(segment, str):
+        segment = segment.encode()
+    return base64.urlsafe_b64decode(segment + b'=' * (-len(segment) % 4))
+
+
+def _compact_json(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+class WalletSigner:
+    """A parsed service account key, with its JWT header segment encoded once"""
+
+    def __init__(self, service_account):
+        self.email = service_account['client_email']
+        self.key_id = service_account.get('private_key_id')
+        self.private_key = serialization.load_pem_private_key(service_account['private_key'].encode(), password=None)
+        header = {"alg": "RS256", "typ": "JWT"}
+        if self.key_id:
+            header["kid"] = self.key_id
+        self._header_segment = b64url(_compact_json(header))
+
+    def sign_payload(self, claims):
+        """Encode and sign JWT claims; returns the compact JWT string"""
+        signing_input = self._header_segment + b'.' + b64url(_compact_json(claims))
+        signature = self.private_key.sign(signing_input, padding.PKCS1v15(), hashes.SHA256())
+        return (signing_input + b'.' + b64url(signature)).decode()
+
+    def public_key(self):
+        return self.private_key.public_key()
+
+
+@lru_cache(maxsize=8)
+def _load_signer(path, mtime_ns):
+    with open(path) as f:
+        return WalletSigner(json.load(f))
+
+
+def load_signer(path):
+    """Signer for a service account key file, parsed once per process (reloaded if the file changes)"""
+    return _load_signer(os.path.abspath(path), os.stat(path).st_mtime_ns)
+
+
+def generate_service_account(email="lv-dpp-wallet@localhost.iam.gserviceaccount.com", key_size=2048):
+    """A service-account-shaped key with a fresh local RSA key (never sent anywhere)"""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    return {
+        "type": "service_account",
+        "private_key_id": os.urandom(20).hex(),
+        "private_key": pem,
+        "client_email": email,
+    }
+
+
+def verify_jwt(token, public_key):
+    """Check an RS256 JWT signature and return its claims; raises ValueError if invalid"""
+    try:
+        header_segment, payload_segment, signature_segment = token.split('.')
+    except ValueError:
+        raise ValueError("Malformed JWT")
+    header = json.loads(b64url_decode(header_segment))
+    if header.get('alg') != 'RS256':
+        raise ValueError(f"Unexpected JWT algorithm: {header.get('alg')}")
+    try:
+        public_key.verify(b64url_decode(signature_segment), f"{header_segment}.{payload_segment}".encode(),
+                          padding.PKCS1v15(), hashes.SHA256())
+    except InvalidSignature:
+        raise ValueError("Invalid JWT signature")
+    return json.loads(b64url_decode(payload_segment))
+
+
+# -- pass class and objects --------------------------------------------------
+
+def _resource_id(value):
+    # Google Wallet IDs allow letters, digits, '.', '_' and '-'
+    return re.sub(r'[^\w.-]', '_', value)
+
+
+@lru_cache(maxsize=16)
+def pass_class(issuer_id, class_suffix=DEFAULT_CLASS_SUFFIX):
+    """Generic pass class shared by every passport object (built once per process)"""
+    return {
+        "id": f"{issuer_id}.{_resource_id(class_suffix)}",
+        "classTemplateInfo": {
+            "cardTemplateOverride": {
+                "cardRowTemplateInfos": [{
+                    "twoItems": {
+                        "startItem": {"firstValue": {"fields": [{"fieldPath": "object.textModulesData['owner']"}]}},
+                        "endItem": {"firstValue": {"fields": [{"fieldPath": "object.textModulesData['certificate']"}]}},
+                    }
+                }]
+            }
+        },
+    }
+
+
+# Product fields read by pass_object(); any of them that is present must be a string
+PRODUCT_FIELDS = ('productId', 'id', 'certificateId', 'cert', 'name', 'owner', 'blockchainHash',
+                  'verificationUrl', 'image')
+
+
+def product_error(product_data):
+    """Why pass_object() can't use product_data, or None if it can"""
+    if not isinstance(product_data, dict):
+        return "Product is not an object"
+    for field in PRODUCT_FIELDS:
+        if product_data.get(field) is not None and not isinstance(product_data[field], str):
+            return f"{field} must be a string"
+    if not any(product_data.get(field) for field in ('productId', 'id', 'certificateId', 'cert')):
+        return "Product needs a productId or certificate ID"
+    return None
+
+
+def pass_object(product_data, issuer_id, class_suffix=DEFAULT_CLASS_SUFFIX):
+    """Generic pass object for one product, shaped from the wallet's product data"""
+    product_id = product_data.get('productId') or product_data.get('id')
+    certificate_id = product_data.get('certificateId') or product_data.get('cert') or product_id
+    text_modules = [
+        {"id": "owner", "header": "Owner", "body": product_data.get('owner') or "-"},
+        {"id": "certificate", "header": "Certificate", "body": certificate_id},
+    ]
+    if product_data.get('blockchainHash'):
+        text_modules.append({"id": "blockchain", "header": "Blockchain hash", "body": product_data['blockchainHash']})
+
+    obj = {
+        "id": f"{issuer_id}.{_resource_id(certificate_id)}",
+        "classId": pass_class(issuer_id, class_suffix)['id'],
+        "state": "ACTIVE",
+        "hexBackgroundColor": BACKGROUND_COLOR,
+        "logo": {"sourceUri": {"uri": LOGO_URL}},
+        "cardTitle": {"defaultValue": {"language": "en", "value": "Louis Vuitton"}},
+        "subheader": {"defaultValue": {"language": "en", "value": "Digital Product Passport"}},
+        "header": {"defaultValue": {"language": "en", "value": product_data.get('name') or product_id}},
+        "textModulesData": text_modules,
+    }
+    if product_data.get('verificationUrl'):
+        obj["barcode"] = {"type": "QR_CODE", "value": product_data['verificationUrl'],
+                          "alternateText": certificate_id}
+    if product_data.get('image') and product_data['image'].startswith('https://'):
+        obj["heroImage"] = {"sourceUri": {"uri": product_data['image']}}
+    return obj
+
+
+# -- save links ----------------------------------------------------------------
+
+def save_claims(signer, objects, classes=(), origins=(), issued_at=None):
+    """JWT claims for a save link carrying the given generic classes and objects"""
+    payload = {}
+    if classes:
+        payload["genericClasses"] = list(classes)
+    payload["genericObjects"] = list(objects)
+    claims = {
+        "iss": signer.email,
+        "aud": "google",
+        "typ": "savetowallet",
+        "iat": int(issued_at if issued_at is not None else time.time()),
+        "payload": payload,
+    }
+    if origins:
+        claims["origins"] = list(origins)
+    return claims
+
+
+def save_link(signer, objects, classes=(), origins=()):
+    """One signed save URL for one or more pass objects"""
+    return SAVE_URL_BASE + signer.sign_payload(save_claims(signer, objects, classes, origins))
+
+
+def batch_objects(objects, max_objects=DEFAULT_MAX_OBJECTS, max_url_length=DEFAULT_MAX_URL_LENGTH,
+                  overhead=1200):
+    """
+    Greedily group objects so each save link holds at most max_objects and
+    stays under max_url_length. Sizes are estimated from the JSON length
+    (base64 grows it by 4/3); overhead covers the header, claims, class
+    and signature.
+    """
+    batch, size = [], overhead
+    for obj in objects:
+        obj_size = len(_compact_json(obj)) * 4 // 3 + 1
+        if batch and (len(batch) >= max_objects or size + obj_size > max_url_length):
+            yield batch
+            batch, size = [], overhead
+        batch.append(obj)
+        size += obj_size
+    if batch:
+        yield batch
+
+
+def save_links(signer, objects, issuer_id, class_suffix=DEFAULT_CLASS_SUFFIX, origins=(),
+               max_objects=DEFAULT_MAX_OBJECTS, max_url_length=DEFAULT_MAX_URL_LENGTH):
+    """Signed save links for many objects, several objects per link; returns [{"url", "objectIds"}]"""
+    classes = (pass_class(issuer_id, class_suffix),)
+    return [
+        {"url": save_link(signer, batch, classes, origins), "objectIds": [obj['id'] for obj in batch]}
+        for batch in batch_objects(objects, max_objects, max_url_length)
+    ]
+
+
+# -- bulk signing in a process pool ----------------------------------------------
+
+_worker_signer = None
+
+
+def _init_worker(key_path):
+    global _worker_signer
+    _worker_signer = load_signer(key_path)
+
+
+def _sign_claims_chunk(claims_list):
+    return [_worker_signer.sign_payload(claims) for claims in claims_list]
+
+
+def sign_bulk(key_path, claims_list, workers=None, chunk_size=64):
+    """
+    Sign many sets of JWT claims, in a process pool when more than one CPU
+    is available. Each worker parses the key once. Returns JWTs in order.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(claims_list) <= chunk_size:
+        signer = load_signer(key_path)
+        return [signer.sign_payload(claims) for claims in claims_list]
+
+    chunks = [claims_list[i:i + chunk_size] for i in range(0, len(claims_list), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(key_path,)) as executor:
+        return [token for chunk in executor.map(_sign_claims_chunk, chunks) for token in chunk]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Google Wallet save links")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    keygen = sub.add_parser('generate-key', help="Write a local service-account-shaped key for development")
+    keygen.add_argument('-o', '--output', required=True)
+    keygen.add_argument('--email', default="lv-dpp-wallet@localhost.iam.gserviceaccount.com")
+
+    sign = sub.add_parser('sign', help="Print save links (NDJSON) for a JSON list of products")
+    sign.add_argument('products')
+    sign.add_argument('--key', default=os.environ.get('GOOGLE_WALLET_KEY_FILE'))
+    sign.add_argument('--issuer-id', default=os.environ.get('GOOGLE_WALLET_ISSUER_ID'))
+    sign.add_argument('--max-objects', type=int, default=DEFAULT_MAX_OBJECTS)
+    sign.add_argument('--workers', type=int, default=None)
+
+    args = parser.parse_args(argv)
+    if args.command == 'generate-key':
+        fd = os.open(args.output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(generate_service_account(args.email), f, indent=2)
+        print(f"✅ Wrote a local development key to {args.output}")
+        return 0
+
+    if not args.key or not args.issuer_id:
+        parser.error("sign needs --key and --issuer-id (or GOOGLE_WALLET_KEY_FILE / GOOGLE_WALLET_ISSUER_ID)")
+    with open(args.products) as f:
+        products = json.load(f)
+
+    signer = load_signer(args.key)
+    classes = (pass_class(args.issuer_id),)
+    objects = [pass_object(product, args.issuer_id) for product in products]
+    batches = list(batch_objects(objects, args.max_objects))
+    claims_list = [save_claims(signer, batch, classes) for batch in batches]
+    for batch, token in zip(batches, sign_bulk(args.key, claims_list, args.workers)):
+        print(json.dumps({"url": SAVE_URL_BASE + token, "objectIds": [obj['id'] for obj in batch]}))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,322 @@
+"""
+Certificate hashing and batched Merkle anchoring.
+
+Certificate hashes are real SHA-256 over the same payload as
+generateBlockchainHash in lib/blockchain/hash-generator.ts:
+
+    productId:transactionId:ownerId:timestamp
+
+Pending certificates are grouped into a Merkle tree and only the root is
+written to the ledger, so a batch of N certificates costs one write instead
+of N. Each certificate gets an inclusion proof against its batch root.
+A certificate ID is anchored once: resubmitting it raises AlreadyAnchored,
+and if a ledger holds it twice the first receipt wins. Certificates issued
+before this service (app/data/certificate.json) are anchored on startup,
+with the hash inputs the TS verifier uses (see issued_certificates).
+
+LocalLedger is a stand-in for the Aura adapter: an append-only JSONL file
+(or memory) of anchored batches.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from durable_log import read_entries
+
+# Domain separation so a leaf can never be passed off as an inner node
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def certificate_payload(product_id, transaction_id, owner_id, timestamp):
+    return f"{product_id}:{transaction_id}:{owner_id}:{timestamp}"
+
+
+def certificate_hash(product_id, transaction_id, owner_id, timestamp):
+    """SHA-256 certificate hash, hex with a 0x prefix"""
+    payload = certificate_payload(product_id, transaction_id, owner_id, timestamp)
+    return '0x' + hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _hash_bytes(value):
+    return bytes.fromhex(value[2:] if value.startswith('0x') else value)
+
+
+def leaf_node(cert_hash):
+    return hashlib.sha256(LEAF_PREFIX + _hash_bytes(cert_hash)).digest()
+
+
+def inner_node(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_merkle_levels(cert_hashes):
+    """
+    Build a Merkle tree over certificate hashes. Returns the list of levels,
+    leaves first and the root level last. An odd node is carried up unchanged.
+    """
+    if not cert_hashes:
+        raise ValueError("Cannot build a Merkle tree with no leaves")
+    levels = [[leaf_node(h) for h in cert_hashes]]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parent = [inner_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parent.append(level[-1])
+        levels.append(parent)
+    return levels
+
+
+def merkle_root(levels):
+    return '0x' + levels[-1][0].hex()
+
+
+def merkle_proof(levels, index):
+    """Sibling hashes from leaf to root: [{"side": "left"|"right", "hash": "0x..."}]"""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({"side": "left" if sibling < index else "right", "hash": '0x' + level[sibling].hex()})
+        index //= 2
+    return proof
+
+
+def proof_root(cert_hash, proof):
+    """Root recomputed from a certificate hash and its inclusion proof"""
+    node = leaf_node(cert_hash)
+    for step in proof:
+        sibling = _hash_bytes(step['hash'])
+        node = inner_node(sibling, node) if step['side'] == 'left' else inner_node(node, sibling)
+    return '0x' + node.hex()
+
+
+def verify_proof(cert_hash, proof, root):
+    """Check that cert_hash is included under root"""
+    return proof_root(cert_hash, proof) == root
+
+
+def issued_certificates(data_dir):
+    """
+    (certificateId, productId, transactionId, ownerId, timestamp) for every
+    certificate in certificate.json, hashed as verifyBlockchainHash in
+    certificate-verifier.ts does: the first activation's transaction and
+    time, and the owner it was issued to.
+    """
+    def load(name):
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    ownership = {entry['productId']: entry.get('ownership', {}) for entry in load('ownership.json')}
+    certificates = []
+    for entry in load('certificate.json'):
+        certificate = entry.get('certificate', entry)
+        record = ownership.get(certificate['productId'])
+        if not record:
+            continue
+        activation = record.get('firstActivation', {})
+        history = record.get('transferHistory') or []
+        first_owner = history[0]['fromClientId'] if history else record.get('currentOwner', {}).get('clientId')
+        if not first_owner:
+            continue
+        certificates.append((
+            certificate['certificateId'],
+            certificate['productId'],
+            activation.get('transactionId') or certificate['transactionId'],
+            first_owner,
+            activation.get('activatedAt') or certificate['issuedAt'],
+        ))
+    return certificates
+
+
+class AlreadyAnchored(Exception):
+    """Certificate IDs that are already anchored or waiting in the pending batch"""
+
+    def __init__(self, certificate_ids):
+        super().__init__(f"Already anchored: {', '.join(certificate_ids)}")
+        self.certificate_ids = certificate_ids
+
+
+def now_iso():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class LocalLedger:
+    """Append-only record of anchored batches; path=None keeps it in memory"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        # A torn last line is truncated away (see durable_log.py)
+        self.anchors = read_entries(path) if path else []
+
+    def anchor(self, root, certificate_ids, cert_hashes):
+        """Write one batch root and return its anchor record"""
+        record = {
+            "batchId": f"BATCH-{uuid.uuid4().hex[:12].upper()}",
+            "root": root,
+            "anchorTx": '0x' + hashlib.sha256(f"{root}:{time.time_ns()}".encode()).hexdigest(),
+            "anchoredAt": now_iso(),
+            "certificateIds": certificate_ids,
+            "leaves": cert_hashes,
+        }
+        with self._lock:
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.anchors.append(record)
+        return record
+
+
+class HashEngine:
+    """
+    Collects certificate hashes and anchors them in batches.
+    A batch is flushed when it reaches batch_size, or by calling flush().
+    """
+
+    def __init__(self, ledger=None, batch_size=1024):
+        self.ledger = ledger or LocalLedger()
+        self.batch_size = batch_size
+        self._pending = []
+        self._pending_ids = set()
+        self._receipts = {}
+        self._roots = {}
+        self._lock = threading.Lock()
+        # Called with the receipts of every newly anchored batch
+        self.listeners = []
+        for anchor in self.ledger.anchors:
+            self._index_batch(anchor)
+
+    def _index_batch(self, anchor):
+        levels = build_merkle_levels(anchor['leaves'])
+        self._roots[anchor['batchId']] = anchor['root']
+        receipts = []
+        for index, (certificate_id, cert_hash) in enumerate(zip(anchor['certificateIds'], anchor['leaves'])):
+            if certificate_id in self._receipts:
+                continue
+            receipt = {
+                "certificateId": certificate_id,
+                "blockchainHash": cert_hash,
+                "batchId": anchor['batchId'],
+                "root": anchor['root'],
+                "anchorTx": anchor['anchorTx'],
+                "anchoredAt": anchor['anchoredAt'],
+                "proof": merkle_proof(levels, index),
+            }
+            self._receipts[certificate_id] = receipt
+            receipts.append(receipt)
+        return receipts
+
+    def submit(self, certificate_id, product_id, transaction_id, owner_id, timestamp):
+        """
+        Hash a certificate and queue it for anchoring. Returns its hash and,
+        if this filled a batch, the receipts of the flushed batch.
+        Raises AlreadyAnchored if the certificate ID was submitted before.
+        """
+        hashes, receipts = self.submit_many([(certificate_id, product_id, transaction_id, owner_id, timestamp)])
+        return hashes[0], receipts
+
+    def submit_many(self, certificates):
+        """
+        Queue (certificateId, productId, transactionId, ownerId, timestamp)
+        tuples, all or none: if any ID was submitted before (or repeats in
+        the list) nothing is queued and AlreadyAnchored lists them.
+        Returns the hashes and the receipts of any batches this filled.
+        """
+        entries = [(c[0], certificate_hash(*c[1:])) for c in certificates]
+        receipts = []
+        with self._lock:
+            self._check_new(entries)
+            self._pending.extend(entries)
+            self._pending_ids.update(certificate_id for certificate_id, _ in entries)
+            while len(self._pending) >= self.batch_size:
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                receipts.extend(self._anchor(batch))
+        if receipts:
+            for listener in self.listeners:
+                listener(receipts)
+        return [cert_hash for _, cert_hash in entries], receipts
+
+    def _check_new(self, entries):
+        # Caller must hold the lock
+        seen = set()
+        taken = []
+        for certificate_id, _ in entries:
+            if certificate_id in self._receipts or certificate_id in self._pending_ids or certificate_id in seen:
+                taken.append(certificate_id)
+            seen.add(certificate_id)
+        if taken:
+            raise AlreadyAnchored(taken)
+
+    def anchor_many(self, certificates):
+        """
+        Hash and anchor certificates now, in batches of at most batch_size
+        of their own; certificates other callers queued stay pending. All or
+        none, like submit_many. Returns their receipts.
+        """
+        entries = [(c[0], certificate_hash(*c[1:])) for c in certificates]
+        receipts = []
+        with self._lock:
+            self._check_new(entries)
+            for start in range(0, len(entries), self.batch_size):
+                receipts.extend(self._anchor(entries[start:start + self.batch_size]))
+        if receipts:
+            for listener in self.listeners:
+                listener(receipts)
+        return receipts
+
+    def anchor_missing(self, certificates):
+        """Anchor the certificates not anchored or queued yet (e.g. issued before this service)"""
+        with self._lock:
+            known = self._receipts.keys() | self._pending_ids
+        return self.anchor_many([c for c in dict((c[0], c) for c in certificates).values() if c[0] not in known])
+
+    def _anchor(self, batch):
+        """Write one batch to the ledger and index its receipts; caller must hold the lock"""
+        certificate_ids = [certificate_id for certificate_id, _ in batch]
+        cert_hashes = [cert_hash for _, cert_hash in batch]
+        self._pending_ids.difference_update(certificate_ids)
+        root = merkle_root(build_merkle_levels(cert_hashes))
+        anchor = self.ledger.anchor(root, certificate_ids, cert_hashes)
+        return self._index_batch(anchor)
+
+    def flush(self):
+        """Anchor all pending certificates under one Merkle root; returns their receipts"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return []
+            receipts = self._anchor(batch)
+        for listener in self.listeners:
+            listener(receipts)
+        return receipts
+
+    def receipt(self, certificate_id):
+        """Inclusion proof and anchor details for an anchored certificate, or None"""
+        return self._receipts.get(certificate_id)
+
+    def anchored_root(self, batch_id):
+        """Root recorded in the ledger for a batch, or None"""
+        return self._roots.get(batch_id)
+
+    def certificate_ids(self):
+        return list(self._receipts)
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def stats(self):
+        return {
+            "anchoredCertificates": len(self._receipts),
+            "batches": len(self.ledger.anchors),
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,312 @@
+"""
+Image proxy for product imagery.
+
+Product cards show 250px thumbnails of multi-megabyte originals. This
+service fetches each source image once, renders size- and format-specific
+variants (WebP, AVIF or JPEG at a requested width) in a worker pool, and
+keeps them in a disk cache with LRU eviction. Downloaded sources and
+variants share one byte budget. Each variant is content-addressed, so its
+cache key doubles as a strong ETag.
+
+Sources must come from an allowed host (or an allowed local directory,
+for file:// stand-ins), so the proxy can't be used to fetch arbitrary URLs;
+redirects are checked against the same rules before they are followed.
+A source that fails to decode is deleted, so a later request fetches it again.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+from PIL import Image, features
+
+DEFAULT_ALLOWED_HOSTS = (
+    'louisvuitton.com',
+    'upload.wikimedia.org',
+)
+
+# Requested widths are rounded up to one of these, which bounds the number of variants
+WIDTHS = (64, 128, 256, 320, 500, 640, 800, 1024, 1280, 1600, 2400)
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', '.webp'),
+    'avif': ('AVIF', 'image/avif', '.avif'),
+    'jpeg': ('JPEG', 'image/jpeg', '.jpg'),
+}
+
+MAX_SOURCE_BYTES = 25 * 1024 * 1024
+FETCH_TIMEOUT = 15
+
+
+class ImageSourceError(Exception):
+    """The source image could not be fetched or decoded"""
+
+
+class ImageSourceNotAllowed(ImageSourceError):
+    """The source URL is not on an allowed host or directory"""
+
+
+class _CheckedRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Refuses to follow a redirect to a source that isn't allowed"""
+
+    def __init__(self, check_source):
+        self.check_source = check_source
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        self.check_source(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def supported_formats():
+    return [fmt for fmt in FORMATS if fmt == 'jpeg' or features.check(fmt)]
+
+
+def pick_format(accept_header, requested=None):
+    """Use the requested format if supported, else the best one the client accepts"""
+    available = supported_formats()
+    if requested in available:
+        return requested
+    accept = accept_header or ''
+    for fmt in ('avif', 'webp'):
+        if f'image/{fmt}' in accept and fmt in available:
+            return fmt
+    return 'jpeg'
+
+
+def snap_width(width):
+    for candidate in WIDTHS:
+        if width <= candidate:
+            return candidate
+    return WIDTHS[-1]
+
+
+def render_variant(source_path, output_path, width, fmt, quality):
+    """Resize one source image and write the variant (runs in a worker process)"""
+    pil_format = FORMATS[fmt][0]
+    with Image.open(source_path) as img:
+        img.load()
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+        if pil_format == 'JPEG':
+            if img.mode in ('RGBA', 'LA', 'P'):
+                # Product shots are on white; flatten transparency onto white
+                rgba = img.convert('RGBA')
+                background = Image.new('RGB', rgba.size, (255, 255, 255))
+                background.paste(rgba, mask=rgba.getchannel('A'))
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+
+        buffer = io.BytesIO()
+        img.save(buffer, format=pil_format, quality=quality)
+
+    _atomic_write(output_path, buffer.getvalue())
+    return len(buffer.getvalue())
+
+
+def _atomic_write(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ImageService:
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, workers=None, quality=80,
+                 allowed_hosts=DEFAULT_ALLOWED_HOSTS, allowed_dirs=()):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.allowed_hosts = tuple(allowed_hosts)
+        self.allowed_dirs = tuple(os.path.realpath(d) for d in allowed_dirs)
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+        self._opener = urllib.request.build_opener(_CheckedRedirectHandler(self.check_source))
+
+        self._sources_dir = os.path.join(cache_dir, 'sources')
+        self._variants_dir = os.path.join(cache_dir, 'variants')
+        os.makedirs(self._sources_dir, exist_ok=True)
+        os.makedirs(self._variants_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._lru = OrderedDict()  # source or variant path -> size, least recently used first
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.evictions = 0
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the LRU order of sources and variants from file modification times"""
+        entries = []
+        for directory in (self._sources_dir, self._variants_dir):
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(entries):
+            self._lru[path] = size
+            self._size += size
+        with self._lock:
+            self._evict()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    # -- sources -------------------------------------------------------------
+
+    def check_source(self, src):
+        """Raise ImageSourceNotAllowed unless src is an allowed http(s) or file URL"""
+        url = urlsplit(src)
+        if url.scheme in ('http', 'https'):
+            host = (url.hostname or '').lower()
+            if any(host == allowed or host.endswith('.' + allowed) for allowed in self.allowed_hosts):
+                return
+        elif url.scheme == 'file':
+            path = os.path.realpath(urllib.request.url2pathname(url.path))
+            if any(path.startswith(d + os.sep) for d in self.allowed_dirs):
+                return
+        raise ImageSourceNotAllowed(f"Image source not allowed: {src}")
+
+    def _source_path(self, src):
+        """Local copy of the source image, fetched on first use"""
+        path = os.path.join(self._sources_dir, hashlib.sha256(src.encode()).hexdigest())
+        if os.path.exists(path):
+            self._touch(path)
+            return path
+
+        request = urllib.request.Request(src, headers={"User-Agent": "LV-DPP-ImageService/1.0"})
+        try:
+            with self._opener.open(request, timeout=FETCH_TIMEOUT) as response:
+                # Redirects were checked as they were followed; check where we ended up too
+                self.check_source(response.geturl())
+                data = response.read(MAX_SOURCE_BYTES + 1)
+        except OSError as e:
+            raise ImageSourceError(f"Could not fetch {src}: {e}")
+        if len(data) > MAX_SOURCE_BYTES:
+            raise ImageSourceError(f"Image source too large: {src}")
+        _atomic_write(path, data)
+        with self._lock:
+            self.fetches += 1
+        self._record(path, len(data))
+        return path
+
+    def _discard(self, path):
+        """Forget and delete a cached file"""
+        with self._lock:
+            self._size -= self._lru.pop(path, 0)
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    # -- variants ------------------------------------------------------------
+
+    def variant_key(self, src, width, fmt):
+        return hashlib.sha256(f"{src}\x1f{width}\x1f{fmt}\x1f{self.quality}".encode()).hexdigest()
+
+    def _touch(self, path):
+        with self._lock:
+            if path in self._lru:
+                self._lru.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _record(self, path, size):
+        with self._lock:
+            self._size -= self._lru.pop(path, 0)
+            self._lru[path] = size
+            self._size += size
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used files until the cache fits; caller must hold the lock"""
+        while self._size > self.max_bytes and len(self._lru) > 1:
+            old_path, old_size = self._lru.popitem(last=False)
+            self._size -= old_size
+            self.evictions += 1
+            try:
+                os.unlink(old_path)
+            except OSError:
+                pass
+
+    def get_variant(self, src, width, fmt='webp'):
+        """
+        Return (path, etag, mimetype) for src resized to width in fmt,
+        rendering it on first request. Concurrent requests for the same
+        variant share one render.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown image format: {fmt}")
+        self.check_source(src)
+        width = snap_width(width)
+        key = self.variant_key(src, width, fmt)
+        path = os.path.join(self._variants_dir, key + FORMATS[fmt][2])
+        mimetype = FORMATS[fmt][1]
+
+        if os.path.exists(path):
+            with self._lock:
+                self.hits += 1
+            self._touch(path)
+            return path, key, mimetype
+
+        with self._lock:
+            self.misses += 1
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+
+        if not leader:
+            event.wait()
+            if not os.path.exists(path):
+                raise ImageSourceError(f"Could not render {src}")
+            return path, key, mimetype
+
+        try:
+            source_path = self._source_path(src)
+            future = self._get_executor().submit(render_variant, source_path, path, width, fmt, self.quality)
+            try:
+                size = future.result()
+            except (OSError, Image.DecompressionBombError) as e:
+                # Don't keep a source that can't be rendered; the next request fetches it again
+                self._discard(source_path)
+                raise ImageSourceError(f"Could not decode {src}: {e}")
+            self._record(path, size)
+            return path, key, mimetype
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._lru),
+                "bytes": self._size,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "sourceFetches": self.fetches,
+                "evictions": self.evictions,
+            }
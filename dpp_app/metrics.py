@@ -0,0 +1,284 @@
+"""
+Operational metrics for the wallet service.
+
+- per-stage timers (QR matrix, rasterization, PNG encoding, base64, template
+  rendering, ...) recorded as histograms labelled by stage
+- request latency histograms per route, method and status
+- render() produces the Prometheus text exposition format for /metrics
+- SlowRequestProfiler: opt-in sampling profiler that writes folded stacks
+  (flamegraph.pl / speedscope input) for requests slower than a threshold
+
+METRICS_ENABLED=0 turns every timer into a shared no-op context manager.
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+
+# Seconds; wide enough for a cached lookup (sub-ms) and a cold 1600px render
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _StageTimer:
+    __slots__ = ('registry', 'labels', 'started')
+
+    def __init__(self, registry, labels):
+        self.registry = registry
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry._observe('dpp_stage_seconds', self.labels, time.perf_counter() - self.started)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}  # name -> {label key: Histogram}
+        self._counters = {}  # name -> {label key: value}
+        self._help = {
+            'dpp_stage_seconds': "Time spent in each stage of request handling",
+            'dpp_http_request_duration_seconds': "Request latency, including streamed bodies",
+        }
+        # Callables returning (name, type, help, value, labels) tuples, read at scrape time
+        self.collectors = []
+
+    def _observe(self, name, label_key, value):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(label_key)
+            if histogram is None:
+                histogram = series[label_key] = Histogram()
+            histogram.observe(value)
+
+    def observe(self, name, value, **labels):
+        if self.enabled:
+            self._observe(name, _label_key(labels), value)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def stage(self, name):
+        """Context manager timing one stage: `with metrics.stage('qr_matrix'): ...`"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, (('stage', name),))
+
+    def time_iter(self, name, iterable):
+        """Time spent producing the items of iterable (e.g. a streamed template), as one stage"""
+        if not self.enabled:
+            return iterable
+        return self._time_iter(name, iterable)
+
+    def _time_iter(self, name, iterable):
+        spent = 0.0
+        iterator = iter(iterable)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    spent += time.perf_counter() - started
+                    break
+                spent += time.perf_counter() - started
+                yield item
+        finally:
+            self._observe('dpp_stage_seconds', (('stage', name),), spent)
+
+    def observe_request(self, route, method, status, seconds):
+        self.observe('dpp_http_request_duration_seconds', seconds, route=route, method=method, status=status)
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            histograms = {name: {key: (list(h.counts), h.sum, h.count, h.buckets) for key, h in series.items()}
+                          for name, series in self._histograms.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+
+        for name in sorted(histograms):
+            lines.append(f"# HELP {name} {self._help.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, (counts, total, count, buckets) in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+
+        for name in sorted(counters):
+            lines.append(f"# HELP {name} {self._help.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        described = set()
+        for collect in self.collectors:
+            for name, kind, help_text, value, labels in collect():
+                if name not in described:
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    described.add(name)
+                lines.append(f"{name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry used by the wallet service and qr_render
+registry = Registry(enabled=METRICS_ENABLED)
+stage = registry.stage
+time_iter = registry.time_iter
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# -- sampling profiler -----------------------------------------------------
+
+def fold_stack(frame, max_depth=128):
+    """'outer;...;inner' stack of a frame, in the folded format flamegraph tools read"""
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SlowRequestProfiler:
+    """
+    Samples the stacks of threads that are handling requests, every interval
+    seconds, from one background thread. When a request took at least
+    threshold seconds its samples are written to output_dir as a .folded
+    file; faster requests are discarded. The sampler thread sleeps while no
+    request is in flight.
+    """
+
+    def __init__(self, threshold, output_dir, interval=0.005, max_depth=128):
+        self.threshold = threshold
+        self.output_dir = output_dir
+        self.interval = interval
+        self.max_depth = max_depth
+        os.makedirs(output_dir, exist_ok=True)
+
+        self._active = {}  # thread ident -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self.dumps = 0
+        self._thread = threading.Thread(target=self._sample_loop, name='slow-request-profiler', daemon=True)
+        self._thread.start()
+
+    def begin(self):
+        """Start sampling the calling thread; returns a token for end()"""
+        ident = threading.get_ident()
+        samples = Counter()
+        with self._lock:
+            self._active[ident] = samples
+        self._wake.set()
+        return ident, samples, time.perf_counter()
+
+    def end(self, token, name):
+        """Stop sampling; writes the stacks if the request was slow. Returns the file path or None."""
+        ident, samples, started = token
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            if self._active.get(ident) is samples:
+                del self._active[ident]
+        if elapsed < self.threshold or not samples:
+            return None
+
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S.%f')
+        slug = ''.join(c if c.isalnum() else '_' for c in name).strip('_')[:60]
+        path = os.path.join(self.output_dir, f"{stamp}-{slug}-{int(elapsed * 1000)}ms.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        self.dumps += 1
+        return path
+
+    def _sample_loop(self):
+        while True:
+            with self._lock:
+                idle = not self._active
+                if idle:
+                    self._wake.clear()
+            if idle:
+                self._wake.wait()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[fold_stack(frame, self.max_depth)] += 1
+            del frames
@@ -0,0 +1,393 @@
+"""
+Append-only ownership transfer ledger.
+
+Replaces the read-mutate-rewrite of the whole ownership.json on every
+transfer (see updateProductOwnership in ownership-file.service.ts):
+
+- each transfer is appended to a log file and fsync'd before it is applied
+- the current state lives in memory, indexed by productId
+- transfers on the same product are serialized by a per-product lock
+- a background thread compacts the log into ownership.json (same JSON shape)
+
+Replay is idempotent (a transfer already in a product's transferHistory is
+skipped), so a crash at any point of compaction never applies a transfer
+twice. A torn last line is truncated away on replay, and a second process
+opening the same ledger gets LogLocked (see durable_log.py).
+"""
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+from durable_log import lock_writer, read_entries
+
+LOCK_STRIPES = 256
+
+
+class OwnershipConflict(Exception):
+    """The transfer's previous owner is not the product's current owner"""
+
+
+def now_iso():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def new_ownership_record(product_id, entry):
+    """Record created when a product is transferred before it has any ownership data"""
+    return {
+        "productId": product_id,
+        "ownership": {
+            "status": "ACTIVE",
+            "currentOwner": entry['currentOwner'],
+            "firstActivation": {
+                "transactionId": entry['transactionId'],
+                "activatedAt": entry['transferDate'],
+            },
+            "transferHistory": [],
+            "transferable": True,
+            "resaleEligibility": True,
+            "repairHistoryAnchored": True,
+            "lostItemAlertOptIn": True,
+        },
+    }
+
+
+def already_applied(records, entry):
+    """True if the entry's transfer is already in its product's transferHistory"""
+    record = records.get(entry['productId'])
+    if not record:
+        return False
+    return any(
+        item.get('transactionId') == entry['transactionId'] and item.get('toClientId') == entry['toClientId']
+        for item in record['ownership'].get('transferHistory', [])
+    )
+
+
+def apply_entry(records, entry):
+    """
+    Apply a log entry to records (productId -> record). Records are replaced
+    rather than mutated, so a snapshot can hold references without copying.
+    """
+    product_id = entry['productId']
+    record = records.get(product_id) or new_ownership_record(product_id, entry)
+    ownership = record['ownership']
+    history_item = {
+        "fromClientId": entry['fromClientId'],
+        "toClientId": entry['toClientId'],
+        "transferDate": entry['transferDate'],
+        "transactionId": entry['transactionId'],
+    }
+    records[product_id] = {
+        **record,
+        "ownership": {
+            **ownership,
+            "currentOwner": entry['currentOwner'],
+            "transferHistory": [*ownership.get('transferHistory', []), history_item],
+        },
+    }
+
+
+def current_owner_of(record):
+    return record['ownership'].get('currentOwner', {}).get('clientId') if record else None
+
+
+class OwnershipLedger:
+    def __init__(self, snapshot_path, log_path, compact_every=1000, compact_interval=30.0):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+
+        self._records = {}
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._log_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._pending = 0
+        self._wake = threading.Event()
+        self._closed = False
+        self.transfers = 0
+        self.compactions = 0
+        # Called with the log entry of every durable transfer
+        self.listeners = []
+
+        self._writer_lock = lock_writer(self.log_path)
+        try:
+            self._load()
+        except BaseException:
+            self._writer_lock.close()
+            raise
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._compaction_loop, name='ownership-compaction', daemon=True)
+        self._thread.start()
+
+    # -- loading -----------------------------------------------------------
+
+    @property
+    def _rotated_log_path(self):
+        return self.log_path + '.compacting'
+
+    def _load(self):
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                for record in json.load(f):
+                    self._records[record['productId']] = record
+
+        # A leftover rotated log means compaction was interrupted
+        interrupted = os.path.exists(self._rotated_log_path)
+        for path in (self._rotated_log_path, self.log_path):
+            self._pending += self._replay(path)
+
+        if interrupted:
+            self._write_snapshot(list(self._records.values()))
+            os.unlink(self._rotated_log_path)
+
+    def _replay(self, path):
+        applied = 0
+        for entry in read_entries(path):
+            if not self._already_applied(entry):
+                self._apply(entry)
+                applied += 1
+        return applied
+
+    def _already_applied(self, entry):
+        return already_applied(self._records, entry)
+
+    # -- transfers ---------------------------------------------------------
+
+    def _lock_for(self, product_id):
+        return self._locks[hash(product_id) % LOCK_STRIPES]
+
+    def _apply(self, entry):
+        apply_entry(self._records, entry)
+
+    def transfer(self, product_id, new_owner_id, transaction_id, previous_owner_id=None,
+                 new_owner_name=None, new_owner_email=None):
+        """
+        Record a transfer durably and return the log entry.
+        Raises OwnershipConflict if previous_owner_id is given and is not the current owner.
+        """
+        with self._lock_for(product_id):
+            current = self.current_owner(product_id)
+            if previous_owner_id and current and current != previous_owner_id:
+                raise OwnershipConflict(f"{product_id} is owned by {current}, not {previous_owner_id}")
+
+            current_owner = {"clientId": new_owner_id}
+            if new_owner_name is not None:
+                current_owner["name"] = new_owner_name
+            if new_owner_email is not None:
+                current_owner["email"] = new_owner_email
+            entry = {
+                "productId": product_id,
+                "fromClientId": previous_owner_id or current,
+                "toClientId": new_owner_id,
+                "currentOwner": current_owner,
+                "transferDate": now_iso(),
+                "transactionId": transaction_id,
+            }
+            line = json.dumps(entry, ensure_ascii=False) + "\n"
+
+            with self._log_lock:
+                self._log.write(line)
+                self._log.flush()
+                os.fsync(self._log.fileno())
+                self._apply(entry)
+                self._pending += 1
+                self.transfers += 1
+                should_compact = self._pending >= self.compact_every
+
+        if should_compact:
+            self._wake.set()
+        for listener in self.listeners:
+            listener(entry)
+        return entry
+
+    def get(self, product_id):
+        """Current ownership record for a product, or None"""
+        return self._records.get(product_id)
+
+    def find_transfer(self, product_id, transaction_id):
+        """transferHistory item recorded under transaction_id, or None"""
+        record = self._records.get(product_id)
+        for item in reversed(record['ownership'].get('transferHistory', []) if record else []):
+            if item.get('transactionId') == transaction_id:
+                return item
+        return None
+
+    def records(self):
+        """Snapshot of every current ownership record"""
+        return list(self._records.values())
+
+    def current_owner(self, product_id):
+        return current_owner_of(self._records.get(product_id))
+
+    # -- compaction --------------------------------------------------------
+
+    def _write_snapshot(self, records):
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(records, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def compact(self):
+        """Snapshot the current state to ownership.json and start a fresh log"""
+        with self._compact_lock:
+            if os.path.exists(self._rotated_log_path):
+                # The last snapshot write failed after rotating; rotating again would
+                # replace that log, so fold it into a snapshot first (or fail again here)
+                with self._log_lock:
+                    records = list(self._records.values())
+                self._write_snapshot(records)
+                os.unlink(self._rotated_log_path)
+
+            with self._log_lock:
+                if not self._pending:
+                    return False
+                # Consistent cut: everything in the rotated log is in this snapshot
+                self._log.close()
+                os.replace(self.log_path, self._rotated_log_path)
+                self._log = open(self.log_path, 'a', encoding='utf-8')
+                records = list(self._records.values())
+                self._pending = 0
+
+            self._write_snapshot(records)
+            os.unlink(self._rotated_log_path)
+            self.compactions += 1
+            return True
+
+    def _compaction_loop(self):
+        while not self._closed:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            if self._closed:
+                break
+            try:
+                self.compact()
+            except OSError as e:
+                print(f"⚠️  Ownership compaction failed: {e}")
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.compact()
+        self._log.close()
+        self._writer_lock.close()
+
+    def stats(self):
+        return {
+            "products": len(self._records),
+            "transfers": self.transfers,
+            "pendingLogEntries": self._pending,
+            "compactions": self.compactions,
+        }
+
+
+class OwnershipReader:
+    """
+    Read-only view of a ledger written by another process (serving processes
+    started with WALLET_LEDGERS=0). A lookup stats the snapshot and the log
+    and applies only the complete lines appended since the last lookup; once
+    compaction has replaced either file, the view is reloaded. It never takes
+    the writer lock and never truncates.
+    """
+
+    def __init__(self, snapshot_path, log_path):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._records = {}
+        self._loaded = False
+        self._snapshot_id = None
+        self._log_id = None
+        self._offset = 0
+        self.reloads = 0
+
+    @staticmethod
+    def _file_id(stat, with_mtime=False):
+        # The snapshot is replaced by rename; the log is renamed away, and grows in place
+        if stat is None:
+            return None
+        return (stat.st_dev, stat.st_ino, stat.st_mtime_ns) if with_mtime else (stat.st_dev, stat.st_ino)
+
+    @staticmethod
+    def _stat(path):
+        try:
+            return os.stat(path)
+        except FileNotFoundError:
+            return None
+
+    def _apply_lines(self, data):
+        """Apply the complete lines of data; returns how many bytes they span"""
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if not already_applied(self._records, entry):
+                apply_entry(self._records, entry)
+        return end
+
+    def _reload(self):
+        self._records = {}
+        self._snapshot_id = None
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                self._snapshot_id = self._file_id(os.fstat(f.fileno()), with_mtime=True)
+                for record in json.load(f):
+                    self._records[record['productId']] = record
+        except FileNotFoundError:
+            pass
+        try:
+            with open(self.log_path + '.compacting', 'rb') as f:
+                self._apply_lines(f.read())
+        except FileNotFoundError:
+            pass
+        self._log_id, self._offset = None, 0
+        self._loaded = True
+        self.reloads += 1
+        self._tail(None)
+
+    def _tail(self, expected_id):
+        try:
+            f = open(self.log_path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            log_id = self._file_id(os.fstat(f.fileno()))
+            if expected_id is not None and log_id != expected_id:
+                # Rotated since the stat: reload on the next lookup
+                self._loaded = False
+                return
+            f.seek(self._offset)
+            data = f.read()
+        self._log_id = log_id
+        self._offset += self._apply_lines(data)
+
+    def _refresh(self):
+        # Called with the lock held
+        log_stat = self._stat(self.log_path)
+        snapshot_id = self._file_id(self._stat(self.snapshot_path), with_mtime=True)
+        log_id = self._file_id(log_stat)
+        if not self._loaded or snapshot_id != self._snapshot_id or log_id != self._log_id:
+            self._reload()
+        elif log_stat is not None and log_stat.st_size > self._offset:
+            self._tail(log_id)
+
+    def get(self, product_id):
+        """Current ownership record for a product, or None"""
+        with self._lock:
+            self._refresh()
+            return self._records.get(product_id)
+
+    def current_owner(self, product_id):
+        return current_owner_of(self.get(product_id))
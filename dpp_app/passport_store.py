@@ -0,0 +1,219 @@
+"""
+Indexed, memory-mapped passport store.
+
+product.json, certificate.json, ownership.json and nfc_mapping.json are
+merged once into one passport record per product and written to a single
+binary file. Workers open the file with mmap, so every process shares the
+same page-cache copy and nothing is parsed up front; a lookup by productId,
+certificateId or NFC tag is one hash-table probe plus one record decode.
+
+File layout (little-endian):
+    header   MAGIC, version, record count, then (offset, slots) per index
+    records  u32 length + compact JSON, one per passport
+    indexes  open-addressing tables of (u64 key hash, u64 record offset)
+             slots; offset 0 marks an empty slot
+
+Build:
+    python passport_store.py build --data-dir app/data -o passports.bin
+    python passport_store.py get LV-DPP-9F3A2C --by certificateId
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+MAGIC = b'LVPS'
+VERSION = 1
+
+# Index name -> field of the passport record it is keyed on
+INDEXES = ('productId', 'certificateId', 'nfcUid')
+
+_HEADER = struct.Struct('<4sII')
+_INDEX_ENTRY = struct.Struct('<QI')
+_HEADER_SIZE = _HEADER.size + _INDEX_ENTRY.size * len(INDEXES)
+_SLOT = struct.Struct('<QQ')
+_LENGTH = struct.Struct('<I')
+
+
+def key_hash(key):
+    return struct.unpack('<Q', hashlib.blake2b(key.encode(), digest_size=8).digest())[0]
+
+
+def _load_json(data_dir, name):
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def merge_passports(data_dir):
+    """Join the app/data JSON files into one passport record per productId"""
+    passports = {}
+
+    def passport_for(product_id):
+        return passports.setdefault(product_id, {"productId": product_id})
+
+    for product in _load_json(data_dir, 'product.json'):
+        passport = passport_for(product['productId'])
+        passport['product'] = product
+        if product.get('digitalId'):
+            passport['certificateId'] = product['digitalId']
+
+    for entry in _load_json(data_dir, 'certificate.json'):
+        certificate = entry.get('certificate', entry)
+        passport = passport_for(certificate['productId'])
+        passport['certificate'] = certificate
+        passport['certificateId'] = certificate['certificateId']
+
+    for entry in _load_json(data_dir, 'ownership.json'):
+        passport_for(entry['productId'])['ownership'] = entry.get('ownership', {})
+
+    for entry in _load_json(data_dir, 'nfc_mapping.json'):
+        passport = passport_for(entry['productId'])
+        passport['nfc'] = entry
+        passport['nfcUid'] = entry['nfcUid']
+        passport.setdefault('certificateId', entry.get('certificateId'))
+
+    return list(passports.values())
+
+
+def _table_slots(count):
+    """Power-of-two table size with a load factor of at most 0.5"""
+    slots = 8
+    while slots < count * 2:
+        slots *= 2
+    return slots
+
+
+def write_store(passports, path):
+    """Write passport records and their indexes to path (atomically)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.seek(_HEADER_SIZE)
+            offsets = []
+            for passport in passports:
+                offsets.append(f.tell())
+                payload = json.dumps(passport, separators=(',', ':'), ensure_ascii=False).encode()
+                f.write(_LENGTH.pack(len(payload)))
+                f.write(payload)
+
+            index_entries = []
+            for field in INDEXES:
+                keyed = [(p[field], offset) for p, offset in zip(passports, offsets) if p.get(field)]
+                slots = _table_slots(len(keyed))
+                table = bytearray(slots * _SLOT.size)
+                mask = slots - 1
+                for key, offset in keyed:
+                    h = key_hash(key)
+                    slot = h & mask
+                    while _SLOT.unpack_from(table, slot * _SLOT.size)[1]:
+                        slot = (slot + 1) & mask
+                    _SLOT.pack_into(table, slot * _SLOT.size, h, offset)
+                index_entries.append((f.tell(), slots))
+                f.write(table)
+
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, VERSION, len(passports)))
+            for offset, slots in index_entries:
+                f.write(_INDEX_ENTRY.pack(offset, slots))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def build_store(data_dir, path):
+    passports = merge_passports(data_dir)
+    write_store(passports, path)
+    return len(passports)
+
+
+class PassportStore:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a passport store (version {VERSION})")
+
+        self._indexes = {}
+        for i, field in enumerate(INDEXES):
+            self._indexes[field] = _INDEX_ENTRY.unpack_from(self._mm, _HEADER.size + i * _INDEX_ENTRY.size)
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, offset):
+        (length,) = _LENGTH.unpack_from(self._mm, offset)
+        start = offset + _LENGTH.size
+        return json.loads(self._mm[start:start + length])
+
+    def get(self, field, key):
+        """Return the passport whose field equals key, or None"""
+        table_offset, slots = self._indexes[field]
+        mask = slots - 1
+        h = key_hash(key)
+        slot = h & mask
+        while True:
+            stored_hash, record_offset = _SLOT.unpack_from(self._mm, table_offset + slot * _SLOT.size)
+            if not record_offset:
+                return None
+            if stored_hash == h:
+                passport = self._record(record_offset)
+                if passport.get(field) == key:
+                    return passport
+            slot = (slot + 1) & mask
+
+    def by_product_id(self, product_id):
+        return self.get('productId', product_id)
+
+    def by_certificate_id(self, certificate_id):
+        return self.get('certificateId', certificate_id)
+
+    def by_nfc_tag(self, nfc_uid):
+        return self.get('nfcUid', nfc_uid)
+
+    def close(self):
+        self._mm.close()
+
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Build or query the passport store")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="Build the store from app/data JSON files")
+    build.add_argument('--data-dir', default=os.path.join(here, 'app', 'data'))
+    build.add_argument('-o', '--output', default=os.path.join(here, 'passports.bin'))
+
+    get = sub.add_parser('get', help="Look up one passport")
+    get.add_argument('key')
+    get.add_argument('--by', choices=INDEXES, default='productId')
+    get.add_argument('--store', default=os.path.join(here, 'passports.bin'))
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        count = build_store(args.data_dir, args.output)
+        print(f"✅ Wrote {count} passports to {args.output}")
+        return 0
+
+    passport = PassportStore(args.store).get(args.by, args.key)
+    if passport is None:
+        print(f"Not found: {args.by}={args.key}")
+        return 1
+    print(json.dumps(passport, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Bulk QR code generation for production runs of certificates.
+
+Products use the same shape as get_product_data_from_request() in
+wallet_backend.py. Rendering runs in a process pool across cores and
+results are streamed back as they finish, either as NDJSON lines or as
+a ZIP of PNG, SVG or packed matrix files.
+
+CLI usage:
+    python qr_batch.py products.json -o qr_codes.zip
+    python qr_batch.py products.ndjson -o qr_codes.ndjson --workers 8
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import qr_render
+
+VERIFICATION_URL_BASE = "http://localhost:3000/dpp/certificate?verify="
+
+# Pending renders per worker; keeps memory flat for very large batches
+IN_FLIGHT_PER_WORKER = 4
+
+WORKERS = int(os.environ.get('QR_BATCH_WORKERS', os.cpu_count() or 1))
+
+_executor = None
+
+
+def get_executor():
+    """Process pool shared by the web endpoint, created on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=WORKERS)
+    return _executor
+
+
+def validate_products(products):
+    """Return an error message if products isn't a list of product dicts, else None"""
+    if not isinstance(products, list):
+        return "Expected a list of products"
+    for index, product in enumerate(products):
+        if not isinstance(product, dict):
+            return f"Product {index} is not an object"
+        for field in ('id', 'cert', 'verificationUrl'):
+            if product.get(field) is not None and not isinstance(product[field], str):
+                return f"Product {index}: {field} must be a string"
+    return None
+
+
+def verification_url_for(product):
+    """Use the product's verificationUrl, or build one from its certificate"""
+    if product.get('verificationUrl'):
+        return product['verificationUrl']
+    if product.get('cert'):
+        return VERIFICATION_URL_BASE + product['cert']
+    return None
+
+
+def render_product(index, product, fmt='png'):
+    """
+    Render the QR code for one product (runs in a worker process).
+    Returns a result dict with the raw bytes in the given format (png, svg
+    or matrix), or an error message.
+    """
+    url = verification_url_for(product)
+    result = {
+        "index": index,
+        "id": product.get('id'),
+        "cert": product.get('cert'),
+        "verificationUrl": url,
+        "format": fmt,
+    }
+    if not url:
+        result["error"] = "Missing verificationUrl or cert"
+        return result
+    try:
+        result["data"] = qr_render.RENDERERS[fmt](url)
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def iter_rendered(products, executor=None, fmt='png', workers=None):
+    """
+    Render QR codes for an iterable of products, yielding results as each
+    finishes (not in input order; use the "index" field to match them up).
+    Pass the executor's worker count along with your own executor.
+    """
+    if executor is None:
+        executor, workers = get_executor(), WORKERS
+    max_in_flight = max(1, (workers or WORKERS) * IN_FLIGHT_PER_WORKER)
+    pending = set()
+
+    for index, product in enumerate(products):
+        pending.add(executor.submit(render_product, index, product, fmt))
+        if len(pending) >= max_in_flight:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+def to_ndjson_line(result):
+    record = {key: value for key, value in result.items() if key != 'data'}
+    if 'data' in result:
+        mimetype = qr_render.MIMETYPES[result['format']]
+        record["qrCode"] = f"data:{mimetype};base64," + base64.b64encode(result['data']).decode()
+    return json.dumps(record) + "\n"
+
+
+def iter_ndjson(results):
+    for result in results:
+        yield to_ndjson_line(result)
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+ZIP_EXTENSIONS = {'png': '.png', 'svg': '.svg', 'matrix': '.bin'}
+
+
+def zip_entry_name(result, taken=()):
+    """Archive name for a result; repeated names get the item index appended"""
+    name = result.get('cert') or result.get('id') or f"item-{result['index']}"
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+    extension = ZIP_EXTENSIONS[result['format']]
+    entry = safe_name + extension
+    suffix = 0
+    while entry in taken:
+        suffix += 1
+        entry = f"{safe_name}-{result['index']}" + (f"-{suffix}" if suffix > 1 else "") + extension
+    return entry
+
+
+def iter_zip(results):
+    """
+    Stream a ZIP archive of QR files. Failed items are listed in errors.ndjson
+    at the end of the archive.
+    """
+    sink = _ChunkSink()
+    errors = []
+    names = {"errors.ndjson"}
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for result in results:
+            if 'data' not in result:
+                errors.append(result)
+                continue
+            name = zip_entry_name(result, names)
+            names.add(name)
+            archive.writestr(name, result['data'])
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        if errors:
+            archive.writestr("errors.ndjson", "".join(to_ndjson_line(r) for r in errors))
+    yield sink.drain()
+
+
+def load_products(path):
+    """Read products from a JSON array or an NDJSON file"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    stripped = text.lstrip()
+    if stripped.startswith('['):
+        return json.loads(stripped)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render QR codes for a batch of products")
+    parser.add_argument('input', help="JSON array or NDJSON file of products")
+    parser.add_argument('-o', '--output', required=True, help="Output file (.zip or .ndjson)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--format', choices=sorted(qr_render.RENDERERS), default='png')
+    args = parser.parse_args(argv)
+
+    products = load_products(args.input)
+    error = validate_products(products)
+    if error:
+        parser.error(error)
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = iter_rendered(products, executor, args.format, args.workers)
+        if args.output.endswith('.zip'):
+            with open(args.output, 'wb') as f:
+                for chunk in iter_zip(results):
+                    f.write(chunk)
+        else:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                for line in iter_ndjson(results):
+                    f.write(line)
+
+    print(f"✅ Rendered {len(products)} QR codes to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
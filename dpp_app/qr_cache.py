@@ -0,0 +1,195 @@
+"""
+Content-addressed LRU cache for rendered QR codes.
+
+The same verification URL is scanned thousands of times per item, so the
+rendered output is cached by a hash of everything that affects the pixels
+(URL, error correction, box size, border, colors and output format).
+The memory tier is bounded by total bytes and evicts least recently used
+entries. An optional disk tier keeps the rendered files across restarts
+so a new worker starts warm; it has its own byte budget and evicts the
+least recently used files, ordered by modification time on startup.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_DISK_MAX_BYTES = 256 * 1024 * 1024
+
+
+class QRCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=None, disk_max_bytes=DEFAULT_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._disk_entries = OrderedDict()  # key -> size, least recently used first
+        self._disk_size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    @staticmethod
+    def make_key(url, fmt, error_correction, box_size, border, fill_color, back_color):
+        """Hash every rendering parameter into a stable cache key"""
+        raw = "\x1f".join(str(part) for part in (
+            url, fmt, error_correction, box_size, border, fill_color, back_color,
+        ))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _load_disk_index(self):
+        """Rebuild the disk LRU order from file modification times, pruning to the budget"""
+        entries = []
+        for prefix in os.listdir(self.disk_dir):
+            directory = os.path.join(self.disk_dir, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for key in os.listdir(directory):
+                if key.startswith('tmp'):
+                    continue  # left over from an interrupted write
+                try:
+                    stat = os.stat(os.path.join(directory, key))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, key, stat.st_size))
+        with self._lock:
+            for _, key, size in sorted(entries):
+                self._disk_entries[key] = size
+                self._disk_size += size
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Delete least recently used files until the disk tier fits; caller must hold the lock"""
+        while self._disk_size > self.disk_max_bytes and self._disk_entries:
+            key, size = self._disk_entries.popitem(last=False)
+            self._disk_size -= size
+            self.disk_evictions += 1
+            try:
+                os.unlink(self._disk_path(key))
+            except OSError:
+                pass
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        with self._lock:
+            if key in self._disk_entries:
+                self._disk_entries.move_to_end(key)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _write_disk(self, key, data):
+        if len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file then rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._disk_size -= self._disk_entries.pop(key, 0)
+            self._disk_entries[key] = len(data)
+            self._disk_size += len(data)
+            self._prune_disk()
+
+    def _store(self, key, data):
+        """Insert into the memory tier; caller must hold the lock"""
+        if len(data) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = data
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def get(self, key):
+        """Return cached bytes for a key, or None"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        if self.disk_dir:
+            data = self._read_disk(key)
+            if data is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, data)
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        with self._lock:
+            self._store(key, data)
+        if self.disk_dir:
+            self._write_disk(key, data)
+
+    def get_or_render(self, key, render):
+        """Return cached bytes, calling render() and caching the result on a miss"""
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "diskHits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "diskEntries": len(self._disk_entries),
+                "diskBytes": self._disk_size,
+                "diskMaxBytes": self.disk_max_bytes,
+                "diskEvictions": self.disk_evictions,
+                "hitRate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,144 @@
+"""
+QR code rendering for the wallet service.
+Uses the same settings as the QR code on the Next.js certificate page.
+
+Formats:
+    png    - RGB PNG rasterized through Pillow
+    svg    - vector image built straight from the module matrix
+    matrix - packed bit array of the module matrix (see render_matrix)
+"""
+import io
+
+import qrcode
+from qrcode.constants import ERROR_CORRECT_L
+
+import metrics
+
+# Same styling as the frontend certificate page
+FILL_COLOR = "#0d0b08"
+BACK_COLOR = "#ffffff"
+BOX_SIZE = 10
+BORDER = 2
+ERROR_CORRECTION = ERROR_CORRECT_L
+
+
+def build_qr(url, error_correction=ERROR_CORRECTION, box_size=BOX_SIZE, border=BORDER):
+    """Build the QR code object for a URL (version auto-adjusts to fit)"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=error_correction,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+    return qr
+
+
+def render_png(url, error_correction=ERROR_CORRECTION, box_size=BOX_SIZE, border=BORDER,
+               fill_color=FILL_COLOR, back_color=BACK_COLOR):
+    """Render a QR code for a URL and return the PNG bytes"""
+    with metrics.stage('qr_matrix'):
+        qr = build_qr(url, error_correction, box_size, border)
+    with metrics.stage('qr_rasterize'):
+        img = qr.make_image(fill_color=fill_color, back_color=back_color)
+
+    with metrics.stage('qr_png_encode'):
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG')
+        return buffer.getvalue()
+
+
+def render_svg(url, error_correction=ERROR_CORRECTION, box_size=BOX_SIZE, border=BORDER,
+               fill_color=FILL_COLOR, back_color=BACK_COLOR):
+    """
+    Render a QR code as SVG bytes, without going through Pillow.
+    Each run of dark modules in a row becomes one rectangle in a single path.
+    """
+    with metrics.stage('qr_matrix'):
+        matrix = build_qr(url, error_correction, box_size, border).get_matrix()
+    with metrics.stage('qr_svg_encode'):
+        return _matrix_to_svg(matrix, box_size, fill_color, back_color)
+
+
+def _matrix_to_svg(matrix, box_size, fill_color, back_color):
+    size = len(matrix)
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if row[x]:
+                start = x
+                while x < size and row[x]:
+                    x += 1
+                path.append(f"M{start} {y}h{x - start}v1h-{x - start}z")
+            else:
+                x += 1
+
+    pixels = size * box_size
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="{back_color}"/>'
+        f'<path fill="{fill_color}" d="{"".join(path)}"/>'
+        '</svg>'
+    )
+    return svg.encode()
+
+
+def render_matrix(url, error_correction=ERROR_CORRECTION, box_size=BOX_SIZE, border=BORDER,
+                  fill_color=FILL_COLOR, back_color=BACK_COLOR):
+    """
+    Return the QR module matrix (border included) as a packed bit array.
+    Layout: 2-byte big-endian side length, then the modules row by row,
+    most significant bit first, 1 = dark. Box size and colors are ignored.
+    """
+    with metrics.stage('qr_matrix'):
+        matrix = build_qr(url, error_correction, box_size, border).get_matrix()
+    with metrics.stage('qr_pack'):
+        return _pack_matrix(matrix)
+
+
+def _pack_matrix(matrix):
+    size = len(matrix)
+
+    packed = bytearray(size.to_bytes(2, 'big'))
+    byte = 0
+    bits = 0
+    for row in matrix:
+        for module in row:
+            byte = (byte << 1) | (1 if module else 0)
+            bits += 1
+            if bits == 8:
+                packed.append(byte)
+                byte = 0
+                bits = 0
+    if bits:
+        packed.append(byte << (8 - bits))
+    return bytes(packed)
+
+
+def unpack_matrix(data):
+    """Decode render_matrix() output back into a list of rows of booleans"""
+    size = int.from_bytes(data[:2], 'big')
+    rows = []
+    for y in range(size):
+        row = []
+        for x in range(size):
+            index = y * size + x
+            row.append(bool(data[2 + index // 8] & (0x80 >> (index % 8))))
+        rows.append(row)
+    return rows
+
+
+RENDERERS = {
+    'png': render_png,
+    'svg': render_svg,
+    'matrix': render_matrix,
+}
+
+MIMETYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'matrix': 'application/octet-stream',
+}
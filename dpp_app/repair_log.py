@@ -0,0 +1,60 @@
+"""
+Completed repairs recorded after repairs.json.
+
+repairs.json is the static history; repairs completed while the service runs
+are appended here, one fsync'd JSON line each (same shape as a repairs.json
+entry), and handed to listeners such as BadgeEngine.on_repair so only the
+repaired product is re-evaluated. On startup the log is replayed after
+repairs.json (see durable_log.py for torn-line handling and the writer lock).
+"""
+import json
+import os
+import threading
+
+from durable_log import lock_writer, read_entries
+
+
+class DuplicateRepair(Exception):
+    """A repair with this repairId is already recorded"""
+
+
+class RepairLog:
+    def __init__(self, path, known_ids=()):
+        self.path = path
+        self._writer_lock = lock_writer(path)
+        try:
+            self._repairs = read_entries(path)
+        except BaseException:
+            self._writer_lock.close()
+            raise
+        self._ids = set(known_ids) | {repair['repairId'] for repair in self._repairs}
+        self._log = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        # Called with every newly recorded repair
+        self.listeners = []
+
+    def repairs(self):
+        """Repairs recorded in the log, oldest first"""
+        return list(self._repairs)
+
+    def record(self, repair):
+        """Record a completed repair durably, then notify listeners. Raises DuplicateRepair."""
+        line = json.dumps(repair, ensure_ascii=False) + "\n"
+        with self._lock:
+            if repair['repairId'] in self._ids:
+                raise DuplicateRepair(f"Repair {repair['repairId']} is already recorded")
+            self._log.write(line)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._ids.add(repair['repairId'])
+            self._repairs.append(repair)
+        for listener in self.listeners:
+            listener(repair)
+        return repair
+
+    def close(self):
+        self._log.close()
+        self._writer_lock.close()
+
+    def __len__(self):
+        return len(self._repairs)
@@ -0,0 +1,186 @@
+"""
+Fleet-wide sustainability metrics.
+
+Same numbers as calculateEnvironmentalImpact in
+lib/services/sustainability.service.ts, computed for many owned items at
+once. sustainability.json and repairs.json are loaded once into columnar
+NumPy arrays (base footprint and total repair savings per product), so a
+batch costs one vectorized lookup plus array arithmetic on the dates.
+
+    python sustainability_engine.py report --ownership app/data/ownership.json
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+DEFAULT_CARBON_FOOTPRINT = 14.8
+FAST_FASHION_KG_PER_YEAR = 24.8
+MS_PER_DAY = 1000 * 60 * 60 * 24
+
+IMPACT_FIELDS = (
+    'totalCarbonFootprint',
+    'carbonSavedByRepairs',
+    'adjustedCarbonFootprint',
+    'ownershipDurationYears',
+    'dailyImpactGrams',
+    'comparisonVsFastFashion',
+)
+
+
+def to_datetime64(dates):
+    """
+    ISO 8601 strings (or datetime64 values) -> datetime64[ms] array.
+    Timestamps are taken as UTC; a trailing 'Z' is accepted.
+    """
+    dates = np.asarray(dates)
+    if np.issubdtype(dates.dtype, np.datetime64):
+        return dates.astype('datetime64[ms]')
+    return np.char.rstrip(dates.astype(str), 'Z').astype('datetime64[ms]')
+
+
+def js_round(values):
+    """Math.round: halves round up, not to even"""
+    return np.floor(values + 0.5)
+
+
+class SustainabilityEngine:
+    def __init__(self, sustainability, repairs):
+        # One row per known product ID, from either file
+        product_ids = sorted({s['productId'] for s in sustainability} | {r['productId'] for r in repairs})
+        self.product_ids = np.array(product_ids, dtype=str)
+        index = {product_id: i for i, product_id in enumerate(product_ids)}
+
+        # Products without sustainability data fall back to the first entry, as in the TS service
+        fallback = DEFAULT_CARBON_FOOTPRINT
+        if sustainability:
+            fallback = self._footprint(sustainability[0])
+        self.fallback_footprint = fallback
+
+        footprints = np.full(len(product_ids), fallback)
+        for entry in reversed(sustainability):  # first match wins, like Array.find
+            footprints[index[entry['productId']]] = self._footprint(entry)
+        self.footprints = footprints
+
+        repair_rows = np.array([index[r['productId']] for r in repairs], dtype=np.int64)
+        repair_savings = np.array([r.get('carbonSavedKg', 0) for r in repairs], dtype=float)
+        self.carbon_saved = np.bincount(repair_rows, weights=repair_savings, minlength=len(product_ids))
+
+    @staticmethod
+    def _footprint(entry):
+        return (entry.get('environmentalImpact') or {}).get('carbonFootprintKgCO2e') or DEFAULT_CARBON_FOOTPRINT
+
+    @classmethod
+    def from_data_dir(cls, data_dir):
+        with open(os.path.join(data_dir, 'sustainability.json')) as f:
+            sustainability = json.load(f)
+        with open(os.path.join(data_dir, 'repairs.json')) as f:
+            repairs = json.load(f)
+        return cls(sustainability, repairs)
+
+    def _rows(self, product_ids):
+        """Row of each product ID in the per-product arrays, -1 if unknown"""
+        product_ids = np.asarray(product_ids, dtype=str)
+        if not len(self.product_ids):
+            return np.full(len(product_ids), -1)
+        rows = np.searchsorted(self.product_ids, product_ids)
+        rows = np.minimum(rows, len(self.product_ids) - 1)
+        return np.where(self.product_ids[rows] == product_ids, rows, -1)
+
+    def impact_batch(self, product_ids, ownership_start_dates, now=None):
+        """
+        EnvironmentalImpact for each (product ID, ownership start date) pair,
+        as a dict of arrays keyed like the TS interface.
+        """
+        rows = self._rows(product_ids)
+        known = rows >= 0
+        base = np.where(known, self.footprints[rows], self.fallback_footprint)
+        saved = np.where(known, self.carbon_saved[rows], 0.0)
+
+        now = np.datetime64('now', 'ms') if now is None else to_datetime64(now)
+        elapsed_ms = (now - to_datetime64(ownership_start_dates)).astype(np.int64)
+        duration_days = np.floor_divide(elapsed_ms, MS_PER_DAY)
+        duration_years = duration_days / 365
+
+        adjusted = np.maximum(0, base - saved)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            daily = np.where(duration_days > 0, adjusted / duration_days * 1000, 0.0)
+
+        years = np.maximum(duration_years, 1)
+        fast_fashion_total = FAST_FASHION_KG_PER_YEAR * years
+        lv_total = adjusted / years
+        comparison = js_round((fast_fashion_total - lv_total) / fast_fashion_total * 100)
+
+        return {
+            'totalCarbonFootprint': base,
+            'carbonSavedByRepairs': saved,
+            'adjustedCarbonFootprint': adjusted,
+            'ownershipDurationYears': duration_years,
+            'dailyImpactGrams': daily,
+            'comparisonVsFastFashion': comparison.astype(np.int64),
+        }
+
+    def impact(self, product_id, ownership_start_date, now=None):
+        """Single-product EnvironmentalImpact, as plain Python values"""
+        batch = self.impact_batch([product_id], [ownership_start_date], now)
+        return {field: batch[field][0].item() for field in IMPACT_FIELDS}
+
+    @staticmethod
+    def summarize(batch):
+        """Fleet totals for ESG reporting"""
+        count = len(batch['adjustedCarbonFootprint'])
+        if not count:
+            return {"items": 0}
+        return {
+            "items": count,
+            "totalCarbonFootprintKg": round(float(batch['totalCarbonFootprint'].sum()), 3),
+            "carbonSavedByRepairsKg": round(float(batch['carbonSavedByRepairs'].sum()), 3),
+            "adjustedCarbonFootprintKg": round(float(batch['adjustedCarbonFootprint'].sum()), 3),
+            "meanOwnershipYears": round(float(batch['ownershipDurationYears'].mean()), 3),
+            "meanDailyImpactGrams": round(float(batch['dailyImpactGrams'].mean()), 3),
+            "meanComparisonVsFastFashion": round(float(batch['comparisonVsFastFashion'].mean()), 1),
+        }
+
+
+def owned_items(ownership_records):
+    """(product IDs, ownership start dates) of the active items in ownership.json"""
+    product_ids, start_dates = [], []
+    for record in ownership_records:
+        ownership = record.get('ownership') or {}
+        activated_at = (ownership.get('firstActivation') or {}).get('activatedAt')
+        if ownership.get('status') == 'ACTIVE' and activated_at:
+            product_ids.append(record['productId'])
+            start_dates.append(activated_at)
+    return product_ids, start_dates
+
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Sustainability metrics for owned items")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    report = sub.add_parser('report', help="Fleet totals for every active item in ownership.json")
+    report.add_argument('--data-dir', default=os.path.join(here, 'app', 'data'))
+    report.add_argument('--ownership', default=None, help="ownership.json (default: <data-dir>/ownership.json)")
+    report.add_argument('--items', action='store_true', help="Also print per-item metrics")
+
+    args = parser.parse_args(argv)
+    engine = SustainabilityEngine.from_data_dir(args.data_dir)
+    with open(args.ownership or os.path.join(args.data_dir, 'ownership.json')) as f:
+        product_ids, start_dates = owned_items(json.load(f))
+
+    batch = engine.impact_batch(product_ids, start_dates)
+    output = {"summary": engine.summarize(batch)}
+    if args.items:
+        output["items"] = [
+            dict(productId=product_id, **{field: batch[field][i].item() for field in IMPACT_FIELDS})
+            for i, product_id in enumerate(product_ids)
+        ]
+    print(json.dumps(output, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The service modules are flat files in dpp_app/, imported by name (as wallet_backend.py does)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,78 @@
+"""Merkle anchoring and verification against the anchor ledger."""
+import json
+import os
+
+import pytest
+
+from cert_verifier import CertificateVerifier
+from hash_engine import AlreadyAnchored, HashEngine, LocalLedger, certificate_hash, issued_certificates
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app', 'data')
+
+
+def certificates(count, prefix="LV-DPP-T"):
+    return [(f"{prefix}{i:04d}", f"LV-SYN-{i:06d}", f"TX-{i}", f"CL-{i}", "2026-01-01T00:00:00Z")
+            for i in range(count)]
+
+
+def test_anchor_many_leaves_other_callers_pending():
+    engine = HashEngine(batch_size=4)
+    engine.submit("LV-DPP-QUEUED", "LV-SYN-1", "TX-1", "CL-1", "2026-01-01T00:00:00Z")
+
+    receipts = engine.anchor_many(certificates(6))
+
+    assert [r['certificateId'] for r in receipts] == [c[0] for c in certificates(6)]
+    assert len({r['batchId'] for r in receipts}) == 2
+    assert engine.pending_count() == 1
+    assert engine.receipt("LV-DPP-QUEUED") is None
+
+
+def test_anchor_many_is_all_or_none():
+    engine = HashEngine()
+    engine.anchor_many(certificates(1))
+
+    with pytest.raises(AlreadyAnchored) as e:
+        engine.anchor_many(certificates(3))
+    assert e.value.certificate_ids == ["LV-DPP-T0000"]
+    assert engine.receipt("LV-DPP-T0001") is None
+
+
+def test_existing_certificates_are_anchored_once(tmp_path):
+    path = str(tmp_path / "anchors.jsonl")
+    issued = issued_certificates(DATA_DIR)
+    assert "LV-DPP-9F3A2C" in [c[0] for c in issued]
+
+    engine = HashEngine(LocalLedger(path))
+    assert len(engine.anchor_missing(issued)) == len(issued)
+    assert HashEngine(LocalLedger(path)).anchor_missing(issued) == []
+
+    result = CertificateVerifier(HashEngine(LocalLedger(path))).verify("LV-DPP-9F3A2C")
+    assert result['isValid'], result['errors']
+    # Same inputs as verifyBlockchainHash in certificate-verifier.ts
+    assert result['blockchainHash'] == certificate_hash(
+        "LV-JKT-4521-000987", "TX-LV-20250318-84921", "CL-782134", "2025-03-18T15:01:00Z")
+
+
+def test_tampered_ledger_leaf_fails_verification(tmp_path):
+    path = str(tmp_path / "anchors.jsonl")
+    HashEngine(LocalLedger(path)).anchor_many(certificates(4))
+
+    with open(path, encoding='utf-8') as f:
+        anchor = json.loads(f.readline())
+    anchor['leaves'][2] = certificate_hash("LV-FAKE", "TX-FAKE", "CL-FAKE", "2026-01-01T00:00:00Z")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(anchor) + "\n")
+
+    verifier = CertificateVerifier(HashEngine(LocalLedger(path)))
+    assert verifier.verify("LV-DPP-T0002")['errors'] == ["Merkle inclusion proof does not lead to the anchored root"]
+    assert verifier.verify("LV-DPP-T0000")['isValid'] is False
+
+
+def test_unknown_and_mismatched_hashes_are_rejected():
+    engine = HashEngine()
+    engine.anchor_many(certificates(2))
+    verifier = CertificateVerifier(engine)
+
+    assert verifier.verify("LV-DPP-NOPE")['errors'] == ["Unknown certificate"]
+    assert verifier.verify("LV-DPP-T0001", "0x00")['isValid'] is False
+    assert verifier.verify("LV-DPP-T0001")['isValid'] is True
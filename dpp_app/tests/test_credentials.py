@@ -0,0 +1,25 @@
+"""Signed client tokens for the owner routes."""
+from credentials import client_token, verify_client_token
+
+SECRET = "test-secret"
+
+
+def test_client_token_round_trips():
+    assert verify_client_token(SECRET, client_token(SECRET, "CL-782134", now=1000), now=1001) == "CL-782134"
+
+
+def test_client_token_with_dots_in_the_client_id():
+    assert verify_client_token(SECRET, client_token(SECRET, "a.b.c", now=0), now=1) == "a.b.c"
+
+
+def test_client_token_rejects_expired_forged_and_altered_tokens():
+    token = client_token(SECRET, "CL-782134", ttl=60, now=1000)
+    client_id, expires, signature = token.split('.')
+
+    assert verify_client_token(SECRET, token, now=1060) is None
+    assert verify_client_token("other-secret", token, now=1000) is None
+    assert verify_client_token(SECRET, f"ATTACKER.{expires}.{signature}", now=1000) is None
+    assert verify_client_token(SECRET, f"{client_id}.99999999999.{signature}", now=1000) is None
+    assert verify_client_token(SECRET, "not-a-token", now=1000) is None
+    assert verify_client_token(SECRET, token + "é", now=1000) is None
+    assert verify_client_token(None, token, now=1000) is None
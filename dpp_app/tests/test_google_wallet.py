@@ -0,0 +1,162 @@
+"""Google Wallet save links, signed with locally generated keys (nothing is sent to Google)."""
+import json
+
+import pytest
+
+import google_wallet
+
+ISSUER_ID = "3388000000012345678"
+
+
+@pytest.fixture(scope='module')
+def service_account():
+    return google_wallet.generate_service_account()
+
+
+@pytest.fixture(scope='module')
+def signer(service_account):
+    return google_wallet.WalletSigner(service_account)
+
+
+def product(i, **fields):
+    return {
+        "productId": f"LV-SYN-{i:06d}",
+        "cert": f"LV-DPP-{i:06X}",
+        "name": "Tailored Wool Jacket",
+        "owner": f"CL-{i:06d}",
+        "verificationUrl": f"http://localhost:3000/dpp/certificate?verify=LV-DPP-{i:06X}",
+        **fields,
+    }
+
+
+def objects(count, **fields):
+    return [google_wallet.pass_object(product(i, **fields), ISSUER_ID) for i in range(count)]
+
+
+def jwt_of(url):
+    assert url.startswith(google_wallet.SAVE_URL_BASE)
+    return url[len(google_wallet.SAVE_URL_BASE):]
+
+
+# -- verify_jwt ----------------------------------------------------------------
+
+def test_verify_jwt_round_trips_claims(signer, service_account):
+    claims = {"iss": service_account['client_email'], "aud": "google", "payload": {"genericObjects": []}}
+    token = signer.sign_payload(claims)
+
+    assert google_wallet.verify_jwt(token, signer.public_key()) == claims
+    header = json.loads(google_wallet.b64url_decode(token.split('.')[0]))
+    assert header == {"alg": "RS256", "typ": "JWT", "kid": service_account['private_key_id']}
+
+
+def test_verify_jwt_rejects_tampered_payload(signer):
+    header, _, signature = signer.sign_payload({"iss": "a"}).split('.')
+    forged = google_wallet.b64url(json.dumps({"iss": "b"}).encode()).decode()
+
+    with pytest.raises(ValueError, match="signature"):
+        google_wallet.verify_jwt(f"{header}.{forged}.{signature}", signer.public_key())
+
+
+def test_verify_jwt_rejects_other_key(signer):
+    other = google_wallet.WalletSigner(google_wallet.generate_service_account())
+
+    with pytest.raises(ValueError, match="signature"):
+        google_wallet.verify_jwt(signer.sign_payload({"iss": "a"}), other.public_key())
+
+
+def test_verify_jwt_rejects_malformed_and_unsigned_tokens(signer):
+    with pytest.raises(ValueError, match="Malformed"):
+        google_wallet.verify_jwt("not-a-jwt", signer.public_key())
+
+    header = google_wallet.b64url(json.dumps({"alg": "none"}).encode()).decode()
+    payload = google_wallet.b64url(b'{}').decode()
+    with pytest.raises(ValueError, match="algorithm"):
+        google_wallet.verify_jwt(f"{header}.{payload}.", signer.public_key())
+
+
+# -- batch_objects ---------------------------------------------------------------
+
+def test_batch_objects_caps_objects_per_link():
+    batches = list(google_wallet.batch_objects(objects(25), max_objects=10))
+
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert [obj['id'] for batch in batches for obj in batch] == [obj['id'] for obj in objects(25)]
+
+
+def test_batch_objects_caps_estimated_url_length():
+    large = objects(6, name="x" * 3000)
+    batches = list(google_wallet.batch_objects(large, max_objects=10, max_url_length=10_000))
+
+    assert len(batches) > 1
+    for batch in batches:
+        estimate = 1200 + sum(len(google_wallet._compact_json(obj)) * 4 // 3 + 1 for obj in batch)
+        assert estimate <= 10_000 or len(batch) == 1
+
+
+def test_batch_objects_gives_an_oversized_object_its_own_link():
+    huge = objects(1, name="x" * 20_000) + objects(2)
+    batches = list(google_wallet.batch_objects(huge, max_objects=10, max_url_length=10_000))
+
+    assert [len(batch) for batch in batches] == [1, 2]
+
+
+def test_batch_objects_of_nothing_is_empty():
+    assert list(google_wallet.batch_objects([])) == []
+
+
+# -- save_links ------------------------------------------------------------------
+
+def test_save_links_are_signed_and_carry_every_object(signer):
+    objs = objects(23)
+    links = google_wallet.save_links(signer, objs, ISSUER_ID, origins=("https://lv-dpp.example",),
+                                     max_objects=10)
+
+    assert [len(link['objectIds']) for link in links] == [10, 10, 3]
+    assert [object_id for link in links for object_id in link['objectIds']] == [obj['id'] for obj in objs]
+    for link in links:
+        assert len(link['url']) <= google_wallet.DEFAULT_MAX_URL_LENGTH
+        claims = google_wallet.verify_jwt(jwt_of(link['url']), signer.public_key())
+        assert claims['iss'] == signer.email
+        assert claims['aud'] == "google"
+        assert claims['typ'] == "savetowallet"
+        assert claims['origins'] == ["https://lv-dpp.example"]
+        assert claims['payload']['genericClasses'] == [google_wallet.pass_class(ISSUER_ID)]
+        assert [obj['id'] for obj in claims['payload']['genericObjects']] == link['objectIds']
+
+
+def test_save_links_objects_describe_the_products(signer):
+    [link] = google_wallet.save_links(signer, objects(1), ISSUER_ID)
+    [obj] = google_wallet.verify_jwt(jwt_of(link['url']), signer.public_key())['payload']['genericObjects']
+
+    assert obj['id'] == f"{ISSUER_ID}.LV-DPP-000000"
+    assert obj['classId'] == google_wallet.pass_class(ISSUER_ID)['id']
+    assert obj['barcode']['value'] == product(0)['verificationUrl']
+    assert {module['id']: module['body'] for module in obj['textModulesData']} == {
+        "owner": "CL-000000",
+        "certificate": "LV-DPP-000000",
+    }
+
+
+def test_load_signer_reads_a_generated_key_file(tmp_path, service_account):
+    path = tmp_path / "wallet-dev-key.json"
+    path.write_text(json.dumps(service_account))
+    signer = google_wallet.load_signer(str(path))
+
+    assert google_wallet.load_signer(str(path)) is signer
+    assert google_wallet.verify_jwt(signer.sign_payload({"iss": "a"}), signer.public_key()) == {"iss": "a"}
+
+
+# -- product validation ------------------------------------------------------------
+
+@pytest.mark.parametrize("value, error", [
+    (5, "not an object"),
+    ({"cert": 123}, "cert must be a string"),
+    ({"cert": "LV-DPP-1", "image": ["x"]}, "image must be a string"),
+    ({"name": "No IDs"}, "productId or certificate ID"),
+])
+def test_product_error_rejects_unusable_products(value, error):
+    assert error in google_wallet.product_error(value)
+
+
+def test_product_error_accepts_wallet_product_data():
+    assert google_wallet.product_error(product(0)) is None
@@ -0,0 +1,89 @@
+"""Ownership ledger as seen by the wallet and by read-only serving processes."""
+import pytest
+
+import wallet_backend
+from ownership_ledger import OwnershipLedger, OwnershipReader
+
+PRODUCT_ID = "LV-JKT-4521-000987"
+
+
+@pytest.fixture
+def paths(tmp_path):
+    snapshot = str(tmp_path / "ownership.json")
+    return snapshot, snapshot + '.log'
+
+
+@pytest.fixture
+def ledger(paths):
+    ledger = OwnershipLedger(*paths, compact_interval=3600)
+    yield ledger
+    ledger.close()
+
+
+def test_reader_follows_appended_transfers(paths, ledger):
+    reader = OwnershipReader(*paths)
+    assert reader.current_owner(PRODUCT_ID) is None
+    ledger.transfer(PRODUCT_ID, "CL-1", "TX-1")
+    assert reader.current_owner(PRODUCT_ID) == "CL-1"
+    ledger.transfer(PRODUCT_ID, "CL-2", "TX-2", previous_owner_id="CL-1")
+    assert reader.current_owner(PRODUCT_ID) == "CL-2"
+    assert reader.reloads == 1
+
+
+def test_reader_reloads_after_compaction(paths, ledger):
+    reader = OwnershipReader(*paths)
+    ledger.transfer(PRODUCT_ID, "CL-1", "TX-1")
+    assert reader.current_owner(PRODUCT_ID) == "CL-1"
+    ledger.compact()
+    ledger.transfer(PRODUCT_ID, "CL-2", "TX-2")
+    assert reader.current_owner(PRODUCT_ID) == "CL-2"
+    assert len(reader.get(PRODUCT_ID)['ownership']['transferHistory']) == 2
+
+
+def test_reader_skips_a_partial_line_without_truncating(paths, ledger):
+    _, log_path = paths
+    reader = OwnershipReader(*paths)
+    ledger.transfer(PRODUCT_ID, "CL-1", "TX-1")
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write('{"productId": "LV-')
+    size = len(open(log_path, 'rb').read())
+    assert reader.current_owner(PRODUCT_ID) == "CL-1"
+    assert len(open(log_path, 'rb').read()) == size
+
+
+def test_wallet_shows_the_owner_recorded_by_the_ledger(monkeypatch, ledger):
+    monkeypatch.setattr(wallet_backend, 'LEDGERS_ENABLED', True)
+    monkeypatch.setattr(wallet_backend, '_ownership_ledger', ledger)
+    passport = {
+        "productId": PRODUCT_ID,
+        "certificateId": "LV-DPP-9F3A2C",
+        "ownership": {"currentOwner": {"clientId": "CL-OLD"}},
+    }
+    assert wallet_backend.passport_to_product_data(passport)['owner'] == "CL-OLD"
+    ledger.transfer(PRODUCT_ID, "CL-NEW", "TX-1", previous_owner_id="CL-OLD")
+    assert wallet_backend.passport_to_product_data(passport)['owner'] == "CL-NEW"
+
+
+def test_failed_snapshot_write_loses_no_transfers(monkeypatch, paths):
+    ledger = OwnershipLedger(*paths, compact_interval=3600)
+    ledger.transfer(PRODUCT_ID, "CL-1", "TX-1")
+
+    def disk_full(records):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(ledger, '_write_snapshot', disk_full)
+    with pytest.raises(OSError):
+        ledger.compact()
+    ledger.transfer("LV-BAG-M27974-001234", "CL-2", "TX-2")
+    with pytest.raises(OSError):
+        ledger.compact()
+    monkeypatch.undo()
+    ledger.compact()
+    ledger.close()
+
+    ledger = OwnershipLedger(*paths, compact_interval=3600)
+    try:
+        assert ledger.current_owner(PRODUCT_ID) == "CL-1"
+        assert ledger.current_owner("LV-BAG-M27974-001234") == "CL-2"
+    finally:
+        ledger.close()
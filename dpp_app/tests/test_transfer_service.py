@@ -0,0 +1,108 @@
+"""Transfer requests persisted to a log: torn writes, the writer lock and claims recovered from the ledger."""
+import json
+
+import pytest
+
+from durable_log import LogLocked
+from transfer_service import TransferService
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    return str(tmp_path / "transfers.json")
+
+
+def approved(service, product_id="LV-JKT-4521-000987", owner_id="CL-782134"):
+    transfer = service.create(product_id, "LV-DPP-1", owner_id)
+    return service.approve(transfer['transferId'], transfer['approvalToken'])
+
+
+def crash(service):
+    # Drop the service without compacting, as a killed process would
+    service._log.close()
+    service._writer_lock.close()
+
+
+def test_second_writer_is_locked_out(snapshot):
+    service = TransferService(snapshot)
+    try:
+        with pytest.raises(LogLocked):
+            TransferService(snapshot)
+    finally:
+        service.close()
+
+
+def test_torn_tail_is_truncated_so_later_records_survive(snapshot):
+    service = TransferService(snapshot)
+    first = approved(service)
+    crash(service)
+    with open(snapshot + '.log', 'a', encoding='utf-8') as f:
+        f.write('{"transferId": "LV-TRANSFER-')
+
+    service = TransferService(snapshot)
+    assert service.get(first['transferId'])['status'] == 'approved'
+    second = service.create("LV-BAG-1", "LV-DPP-2", "CL-1")
+    crash(service)
+
+    service = TransferService(snapshot)
+    try:
+        assert service.get(second['transferId']) is not None
+        with open(snapshot + '.log', encoding='utf-8') as f:
+            assert all(json.loads(line) for line in f)
+    finally:
+        service.close()
+
+
+def test_claim_recorded_in_the_ledger_is_completed_on_load(snapshot):
+    service = TransferService(snapshot)
+    claimed = approved(service)
+    unclaimed = approved(service, product_id="LV-BAG-1")
+    crash(service)
+
+    ledger = {claimed['transferId']: "CL-NEW"}
+    service = TransferService(snapshot, claimed_by=lambda record: ledger.get(record['transferId']))
+    try:
+        completed = service.get(claimed['transferId'])
+        assert (completed['status'], completed['newOwnerId']) == ('completed', "CL-NEW")
+        assert service.get(unclaimed['transferId'])['status'] == 'approved'
+        assert service.pending_for_owner("CL-782134") == [service.get(unclaimed['transferId'])]
+    finally:
+        service.close()
+
+
+def test_overdue_claim_recorded_in_the_ledger_is_completed_not_expired(snapshot):
+    service = TransferService(snapshot, ttl=-1)
+    transfer = service.create("LV-JKT-4521-000987", "LV-DPP-1", "CL-782134")
+    service.update_status(transfer['transferId'], 'approved', now=0)
+    crash(service)
+
+    service = TransferService(snapshot, claimed_by=lambda record: "CL-NEW")
+    try:
+        assert service.get(transfer['transferId'])['status'] == 'completed'
+    finally:
+        service.close()
+
+
+def test_failed_snapshot_write_loses_no_records(monkeypatch, snapshot):
+    service = TransferService(snapshot)
+    first = approved(service)
+
+    def disk_full(records):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(service, '_write_snapshot', disk_full)
+    with pytest.raises(OSError):
+        service.compact()
+    second = service.create("LV-BAG-1", "LV-DPP-2", "CL-1")
+    with pytest.raises(OSError):
+        service.compact()
+    monkeypatch.undo()
+    service.compact()
+    crash(service)
+
+    service = TransferService(snapshot)
+    try:
+        assert service.get(first['transferId'])['status'] == 'approved'
+        assert service.get(second['transferId']) is not None
+    finally:
+        service.close()
@@ -0,0 +1,457 @@
+"""
+Server-side ownership transfer requests.
+
+transfer.service.ts keeps every request in one localStorage JSON blob that
+is re-parsed and scanned on each lookup, and expired requests are never
+removed. Here requests live in memory with:
+
+- hash indexes on transferId and on the 6-digit transferCode of live requests
+- an owner -> live transfers index
+- a min-heap of expiry (and purge) times, drained by sweep(); reads also
+  treat an overdue request as expired, so nothing waits for the sweeper
+- status changes as compare-and-set transitions under one lock, so two
+  claims of the same request cannot both succeed
+
+Lookups, claims and status changes are O(1) (expiry O(log n)) whatever
+the number of pending transfers.
+
+With a snapshot path, every change is appended to a log and fsync'd before
+it is applied, and a background thread compacts the log into the snapshot,
+as in ownership_ledger.py. Log entries set absolute state, so replaying
+them twice is harmless. A torn last line is truncated away on replay, and a
+second process opening the same log gets LogLocked (see durable_log.py).
+
+Completing a transfer writes the ownership change to the ledger first, under
+the ledger transaction ID transferId, then the completed record here. If the
+process dies between the two, the request is still approved on restart:
+reconcile() (run on load when claimed_by is given) completes it from the
+ledger, and a retried claim by the same new owner finds its ledger entry
+instead of conflicting with it.
+"""
+import heapq
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from durable_log import lock_writer, read_entries
+
+DEFAULT_TTL = 7 * 24 * 60 * 60  # as in createTransferRequest
+# Finished requests stay readable this long before their memory is reclaimed
+DEFAULT_RETENTION = 30 * 24 * 60 * 60
+
+LIVE = ('pending', 'approved')
+TRANSITIONS = {
+    'pending': {'approved', 'rejected', 'expired'},
+    'approved': {'completed', 'rejected', 'expired'},
+}
+STATUSES = ('pending', 'approved', 'rejected', 'completed', 'expired')
+
+CODE_SPACE = 900_000  # 100000-999999, as in generateTransferCode
+
+_EXPIRE, _PURGE = 0, 1
+
+
+class TransferConflict(Exception):
+    """The transfer is not in a state that allows the requested change"""
+
+
+class TransferCodesExhausted(Exception):
+    """Every 6-digit transfer code is held by a live transfer"""
+
+
+def to_iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def from_iso(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def generate_transfer_id(now):
+    return f"LV-TRANSFER-{int(now * 1000)}-{secrets.token_hex(3).upper()}"
+
+
+def _check_token(record, approval_token):
+    if not isinstance(approval_token, str) or \
+            not secrets.compare_digest(record['approvalToken'].encode(), approval_token.encode()):
+        raise TransferConflict("Invalid approval token")
+
+
+def public_view(record):
+    """A transfer request without its approval token, for anyone holding the code or ID"""
+    return {key: value for key, value in record.items() if key != 'approvalToken'}
+
+
+class TransferService:
+    def __init__(self, snapshot_path=None, log_path=None, ttl=DEFAULT_TTL, retention=DEFAULT_RETENTION,
+                 compact_every=10_000, compact_interval=30.0, claimed_by=None):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path or (snapshot_path + '.log' if snapshot_path else None)
+        self.ttl = ttl
+        self.retention = retention
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+
+        self._by_id = {}
+        self._by_code = {}  # live transfers only
+        self._by_owner = {}  # currentOwnerId -> {transferId: None}, live transfers only
+        self._due = []  # (time, transferId, kind)
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._pending = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+        self._log = None
+        self._writer_lock = None
+        self._thread = None
+        self._sweeper = None
+        self.created = 0
+        self.expired = 0
+        self.purged = 0
+
+        if self.snapshot_path:
+            self._writer_lock = lock_writer(self.log_path)
+            try:
+                self._load()
+            except BaseException:
+                self._writer_lock.close()
+                raise
+            self._log = open(self.log_path, 'a', encoding='utf-8')
+            self._thread = threading.Thread(target=self._compaction_loop, name='transfer-compaction', daemon=True)
+            self._thread.start()
+        # Before the sweep, which would expire an overdue claim that did go through
+        if claimed_by is not None:
+            self.reconcile(claimed_by)
+        self.sweep()
+
+    # -- loading -----------------------------------------------------------
+
+    @property
+    def _rotated_log_path(self):
+        return self.log_path + '.compacting'
+
+    def _load(self):
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                for record in json.load(f):
+                    self._apply(record)
+
+        interrupted = os.path.exists(self._rotated_log_path)
+        for path in (self._rotated_log_path, self.log_path):
+            for record in read_entries(path):
+                self._apply(record)
+                self._pending += 1
+
+        if interrupted:
+            self._write_snapshot(list(self._by_id.values()))
+            os.unlink(self._rotated_log_path)
+
+    # -- indexes -------------------------------------------------------------
+
+    def _apply(self, record):
+        """
+        Make record the current state of its transfer and update the indexes.
+        Records are replaced rather than mutated, so a snapshot can hold
+        references without copying.
+        """
+        transfer_id = record['transferId']
+        previous = self._by_id.get(transfer_id)
+        if previous is not None and previous['status'] in LIVE:
+            self._unindex(previous)
+
+        if record.get('purged'):
+            self._by_id.pop(transfer_id, None)
+            return
+        self._by_id[transfer_id] = record
+        if record['status'] in LIVE:
+            self._by_code[record['transferCode']] = transfer_id
+            self._by_owner.setdefault(record['currentOwnerId'], {})[transfer_id] = None
+            if previous is None or previous['status'] not in LIVE:
+                heapq.heappush(self._due, (from_iso(record['expiresAt']), transfer_id, _EXPIRE))
+        elif previous is None or previous['status'] in LIVE:
+            heapq.heappush(self._due, (from_iso(record['updatedAt']) + self.retention, transfer_id, _PURGE))
+
+    def _unindex(self, record):
+        if self._by_code.get(record['transferCode']) == record['transferId']:
+            del self._by_code[record['transferCode']]
+        owned = self._by_owner.get(record['currentOwnerId'])
+        if owned is not None:
+            owned.pop(record['transferId'], None)
+            if not owned:
+                del self._by_owner[record['currentOwnerId']]
+
+    def _commit(self, record, sync=True):
+        # Called with the lock held: durable first, then visible (sync=False leaves the fsync to the caller)
+        if self._log is not None:
+            self._log.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if sync:
+                self._sync()
+            self._pending += 1
+            if self._pending >= self.compact_every:
+                self._wake.set()
+        self._apply(record)
+        return record
+
+    def _sync(self):
+        self._log.flush()
+        os.fsync(self._log.fileno())
+
+    def _new_code(self):
+        if len(self._by_code) >= CODE_SPACE:
+            raise TransferCodesExhausted(f"{len(self._by_code)} live transfers hold every code")
+        while True:
+            code = str(100000 + secrets.randbelow(CODE_SPACE))
+            if code not in self._by_code:
+                return code
+
+    # -- requests ------------------------------------------------------------
+
+    def create(self, product_id, certificate_id, current_owner_id, new_owner_email=None, new_owner_name=None,
+               now=None):
+        """New pending transfer request (like createTransferRequest + saveTransferRequest)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            record = {
+                "transferId": generate_transfer_id(now),
+                "transferCode": self._new_code(),
+                "productId": product_id,
+                "certificateId": certificate_id,
+                "currentOwnerId": current_owner_id,
+                "status": "pending",
+                "createdAt": to_iso(now),
+                "updatedAt": to_iso(now),
+                "expiresAt": to_iso(now + self.ttl),
+                "approvalToken": secrets.token_urlsafe(16),
+            }
+            if new_owner_email is not None:
+                record["newOwnerEmail"] = new_owner_email
+            if new_owner_name is not None:
+                record["newOwnerName"] = new_owner_name
+            self.created += 1
+            return self._commit(record)
+
+    def _current(self, transfer_id, now):
+        # Called with the lock held; an overdue live request is expired on the spot
+        record = self._by_id.get(transfer_id)
+        if record is not None and record['status'] in LIVE and from_iso(record['expiresAt']) <= now:
+            record = self._expire(record, now)
+        return record
+
+    def _expire(self, record, now, sync=True):
+        self.expired += 1
+        return self._commit({**record, "status": "expired", "updatedAt": to_iso(now)}, sync)
+
+    def get(self, transfer_id, now=None):
+        """Transfer request by ID (like getTransferRequestById), or None"""
+        now = time.time() if now is None else now
+        record = self._by_id.get(transfer_id)
+        if record is None or record['status'] not in LIVE or from_iso(record['expiresAt']) > now:
+            return record
+        with self._lock:
+            return self._current(transfer_id, now)
+
+    def get_by_code(self, transfer_code, now=None):
+        """Live transfer request by its 6-digit code (like getTransferRequestByCode), or None"""
+        transfer_id = self._by_code.get(transfer_code)
+        if transfer_id is None:
+            return None
+        record = self.get(transfer_id, now)
+        return record if record is not None and record['status'] in LIVE else None
+
+    def pending_for_owner(self, owner_id, now=None):
+        """Live (pending or approved) transfer requests started by an owner"""
+        now = time.time() if now is None else now
+        with self._lock:
+            records = [self._current(transfer_id, now) for transfer_id in list(self._by_owner.get(owner_id, ()))]
+        return [record for record in records if record['status'] in LIVE]
+
+    def update_status(self, transfer_id, status, expected=None, now=None, before_commit=None, **fields):
+        """
+        Move a transfer to status, atomically (like updateTransferStatus).
+        With expected, the change only happens if the current status is
+        expected. before_commit(new record) runs under the lock first; if it
+        raises, nothing changes. Returns the new record, or None for an
+        unknown transfer; raises TransferConflict if the transition is not allowed.
+        """
+        if status not in STATUSES:
+            raise ValueError(f"Unknown transfer status: {status}")
+        now = time.time() if now is None else now
+        with self._lock:
+            record = self._current(transfer_id, now)
+            if record is None:
+                return None
+            if expected is not None and record['status'] != expected:
+                raise TransferConflict(f"{transfer_id} is {record['status']}, not {expected}")
+            if status not in TRANSITIONS.get(record['status'], ()):
+                raise TransferConflict(f"{transfer_id} is {record['status']}; it cannot become {status}")
+            record = {**record, **fields, "status": status, "updatedAt": to_iso(now)}
+            if before_commit is not None:
+                before_commit(record)
+            return self._commit(record)
+
+    def approve(self, transfer_id, approval_token, now=None):
+        """Approve a pending transfer with its token (like approveTransferRequest)"""
+        record = self._by_id.get(transfer_id)
+        if record is None:
+            return None
+        _check_token(record, approval_token)
+        return self.update_status(transfer_id, 'approved', expected='pending', now=now)
+
+    def reject(self, transfer_id, approval_token, now=None):
+        """Cancel a live transfer; only the current owner holds the token"""
+        record = self._by_id.get(transfer_id)
+        if record is None:
+            return None
+        _check_token(record, approval_token)
+        return self.update_status(transfer_id, 'rejected', now=now)
+
+    def complete(self, transfer_id, new_owner_id, new_owner_name=None, now=None, before_commit=None):
+        """
+        Claim an approved transfer for new_owner_id (like completeTransfer).
+        Exactly one concurrent claim succeeds; the others get TransferConflict.
+        before_commit (e.g. the ownership ledger write) decides whether it happens.
+        """
+        fields = {"newOwnerId": new_owner_id}
+        if new_owner_name is not None:
+            fields["newOwnerName"] = new_owner_name
+        return self.update_status(transfer_id, 'completed', expected='approved', now=now,
+                                  before_commit=before_commit, **fields)
+
+    def reconcile(self, claimed_by, now=None):
+        """
+        Complete approved transfers whose claim already reached the ownership
+        ledger (the process died before the completed record was written).
+        claimed_by(record) returns the new owner recorded for the transfer, or
+        None. Returns the completed records.
+        """
+        now = time.time() if now is None else now
+        completed = []
+        with self._lock:
+            for record in [r for r in self._by_id.values() if r['status'] == 'approved']:
+                new_owner_id = claimed_by(record)
+                if new_owner_id is not None:
+                    record = {**record, "newOwnerId": new_owner_id, "status": "completed", "updatedAt": to_iso(now)}
+                    completed.append(self._commit(record))
+        return completed
+
+    # -- expiry --------------------------------------------------------------
+
+    def sweep(self, now=None):
+        """Expire overdue live transfers and reclaim old finished ones; returns how many were changed"""
+        now = time.time() if now is None else now
+        changed = 0
+        with self._lock:
+            while self._due and self._due[0][0] <= now:
+                _, transfer_id, kind = heapq.heappop(self._due)
+                record = self._by_id.get(transfer_id)
+                if record is None:
+                    continue
+                # Entries made stale by a later status change are skipped
+                if kind == _EXPIRE and record['status'] in LIVE:
+                    self._expire(record, now, sync=False)
+                    changed += 1
+                elif kind == _PURGE and record['status'] not in LIVE:
+                    self._commit({"transferId": transfer_id, "purged": True}, sync=False)
+                    self.purged += 1
+                    changed += 1
+            # One fsync for the whole sweep
+            if changed and self._log is not None:
+                self._sync()
+        return changed
+
+    def start_sweeper(self, interval=60.0):
+        """Run sweep() every interval seconds in a daemon thread"""
+        if self._sweeper is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.sweep()
+
+        self._sweeper = threading.Thread(target=loop, name='transfer-sweeper', daemon=True)
+        self._sweeper.start()
+
+    # -- compaction --------------------------------------------------------
+
+    def _write_snapshot(self, records):
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(records, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def compact(self):
+        """Snapshot the current requests and start a fresh log"""
+        if self._log is None:
+            return False
+        with self._compact_lock:
+            if os.path.exists(self._rotated_log_path):
+                # The last snapshot write failed after rotating; rotating again would
+                # replace that log, so fold it into a snapshot first (or fail again here)
+                with self._lock:
+                    records = list(self._by_id.values())
+                self._write_snapshot(records)
+                os.unlink(self._rotated_log_path)
+
+            with self._lock:
+                if not self._pending:
+                    return False
+                # Consistent cut: everything in the rotated log is in this snapshot
+                self._log.close()
+                os.replace(self.log_path, self._rotated_log_path)
+                self._log = open(self.log_path, 'a', encoding='utf-8')
+                records = list(self._by_id.values())
+                self._pending = 0
+
+            self._write_snapshot(records)
+            os.unlink(self._rotated_log_path)
+            return True
+
+    def _compaction_loop(self):
+        while not self._closed:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            if self._closed:
+                break
+            try:
+                self.compact()
+            except OSError as e:
+                print(f"⚠️  Transfer log compaction failed: {e}")
+
+    def close(self):
+        self._closed = True
+        self._stop.set()
+        self._wake.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+        if self._thread is not None:
+            self._thread.join()
+            self.compact()
+            self._log.close()
+            self._writer_lock.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "transfers": len(self._by_id),
+                "live": len(self._by_code),
+                "owners": len(self._by_owner),
+                "scheduled": len(self._due),
+                "created": self.created,
+                "expired": self.expired,
+                "purged": self.purged,
+                "pendingLogEntries": self._pending,
+            }
@@ -0,0 +1,358 @@
+"""
+Production serving mode for the wallet service, on an ASGI stack.
+
+Same routes and output as wallet_backend.py. The hot read paths (wallet
+link, preview, QR images, passes, images) have async handlers here, and
+their CPU-bound rendering runs in a bounded thread pool so the event loop
+never blocks. When the render queue is full, requests are rejected with
+429 and a Retry-After header instead of piling up. Every other route
+(verification, transfers, ownership, badges, repairs, bulk endpoints,
+anchoring) is served by the Flask app itself, mounted behind them through
+a WSGI adapter.
+
+Run:
+    python wallet_asgi.py --render-threads 4 --render-queue 64
+
+Ownership, transfer and repair logs have a single writer process (see
+durable_log.py), and anchoring and verification use a per-process index, so
+one process serves every route. To use more cores, run the read paths with
+several workers and let a reverse proxy send the ledger routes (see
+wallet_backend.LEDGER_ROUTE_PREFIXES) to that one process:
+    python wallet_asgi.py --port 5000                                # ledger process
+    python wallet_asgi.py --port 5001 --workers 4 --without-ledgers  # read paths
+
+Each uvicorn worker is a separate process with its own QR cache and render
+pool; cache hits are the common case, so threads are enough per process.
+"""
+import argparse
+import asyncio
+import os
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import FileResponse, HTMLResponse, JSONResponse, Response
+from starlette.routing import Mount, Route
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    with warnings.catch_warnings():
+        # Starlette's own adapter, deprecated in favour of a2wsgi
+        warnings.simplefilter('ignore')
+        from starlette.middleware.wsgi import WSGIMiddleware
+
+import apple_wallet
+import google_wallet
+import metrics
+import qr_render
+import wallet_backend
+from image_service import ImageSourceError, ImageSourceNotAllowed, pick_format
+
+RENDER_THREADS = int(os.environ.get('WALLET_RENDER_THREADS', os.cpu_count() or 1))
+RENDER_QUEUE = int(os.environ.get('WALLET_RENDER_QUEUE', 64))
+RETRY_AFTER_SECONDS = int(os.environ.get('WALLET_RETRY_AFTER', 1))
+
+
+class RenderQueueFull(Exception):
+    pass
+
+
+class BoundedRenderer:
+    """
+    Runs blocking render calls in a thread pool, admitting at most
+    threads + max_queue calls at once. Only touched from the event loop,
+    so the in-flight counter needs no lock.
+    """
+
+    def __init__(self, threads=RENDER_THREADS, max_queue=RENDER_QUEUE):
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='qr-render')
+        self.limit = threads + max_queue
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            raise RenderQueueFull()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    def stats(self):
+        return {"inFlight": self.in_flight, "limit": self.limit, "rejected": self.rejected}
+
+
+renderer = BoundedRenderer()
+
+
+def too_busy():
+    return JSONResponse(
+        {"success": False, "message": "Render queue is full, please retry"},
+        status_code=429,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
+def render_preview(qr_mode, qr_format, product_id=None, nfc_uid=None):
+    product_data = wallet_backend.build_preview_data(
+        qr_mode, qr_format, lambda cert, ext: f"/qr/{cert}.{ext}", product_id, nfc_uid
+    )
+    if product_data is None:
+        return None
+    with metrics.stage('template_render'):
+        return wallet_backend.wallet_template.render(data=product_data)
+
+
+async def generate_link(request):
+    """Generate a Google Wallet link (see wallet_backend.generate_link)"""
+    if request.method == 'POST':
+        try:
+            product_data = await request.json()
+        except ValueError:
+            product_data = None
+        if not isinstance(product_data, dict):
+            return JSONResponse({"success": False, "message": "Expected a JSON product object"}, status_code=400)
+        error = google_wallet.product_error(product_data) if wallet_backend.google_wallet_enabled() else None
+        if error:
+            return JSONResponse({"success": False, "message": error}, status_code=400)
+    else:
+        product_data = wallet_backend.get_product_data_from_request(
+            request.query_params.get('productId'), request.query_params.get('nfc')
+        )
+        if product_data is None:
+            return JSONResponse({"success": False, "message": "Unknown product"}, status_code=404)
+    if wallet_backend.google_wallet_enabled():
+        # RSA signing is CPU-bound; keep it off the event loop
+        try:
+            return JSONResponse(await renderer.run(wallet_backend.wallet_link_payload, product_data))
+        except RenderQueueFull:
+            return too_busy()
+    return JSONResponse(wallet_backend.wallet_link_payload(product_data))
+
+
+async def preview_wallet(request):
+    """Display the Google Wallet simulation page with real QR code"""
+    qr_mode = request.query_params.get('qr', wallet_backend.WALLET_QR_MODE)
+    qr_format = request.query_params.get('format', wallet_backend.WALLET_QR_FORMAT)
+    try:
+        html = await renderer.run(
+            render_preview, qr_mode, qr_format,
+            request.query_params.get('productId'), request.query_params.get('nfc'),
+        )
+    except RenderQueueFull:
+        return too_busy()
+    if html is None:
+        return Response(status_code=404)
+    return HTMLResponse(html)
+
+
+async def qr_image(request):
+    """Serve a certificate's verification QR code (see wallet_backend.qr_image)"""
+    cert = request.path_params['cert']
+    fmt = wallet_backend.QR_EXTENSIONS.get(request.path_params['ext'])
+    product_data = wallet_backend.find_product_by_cert(cert)
+    if not fmt or not product_data or not product_data.get('verificationUrl'):
+        return Response(status_code=404)
+
+    try:
+        key, data = await renderer.run(wallet_backend.generate_qr_code, product_data['verificationUrl'], fmt)
+    except RenderQueueFull:
+        return too_busy()
+
+    headers = {
+        "ETag": f'"{key}"',
+        "Cache-Control": f"public, max-age={wallet_backend.QR_MAX_AGE}",
+    }
+    if request.headers.get('if-none-match') == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(data, media_type=qr_render.MIMETYPES[fmt], headers=headers)
+
+
+async def apple_wallet_pass_file(request):
+    """A certificate's Apple Wallet pass (see wallet_backend.apple_wallet_pass_file)"""
+    if not wallet_backend.apple_wallet_enabled():
+        return JSONResponse({"success": False, "message": "Apple Wallet signing is not configured"}, status_code=503)
+    product_data = wallet_backend.find_product_by_cert(request.path_params['cert'])
+    if not product_data:
+        return Response(status_code=404)
+
+    # Signing and zipping are CPU-bound; keep them off the event loop
+    try:
+        entry = await renderer.run(wallet_backend.apple_wallet_pass, product_data)
+    except RenderQueueFull:
+        return too_busy()
+
+    headers = {
+        "ETag": f'"{entry["manifestHash"]}"',
+        "Content-Disposition": f'attachment; filename="{entry["serialNumber"]}.pkpass"',
+    }
+    if request.headers.get('if-none-match') == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(wallet_backend.get_pass_index().path(entry), media_type=apple_wallet.MIMETYPE,
+                        headers=headers)
+
+
+async def image_variant(request):
+    """Serve a resized product image (see wallet_backend.image_variant)"""
+    src = request.query_params.get('src')
+    try:
+        width = int(request.query_params.get('w', 500))
+    except ValueError:
+        width = 0
+    if not src or width <= 0:
+        return JSONResponse({"error": "src and a positive w are required"}, status_code=400)
+
+    fmt = pick_format(request.headers.get('accept'), request.query_params.get('fmt'))
+    try:
+        path, key, mimetype = await renderer.run(wallet_backend.get_image_service().get_variant, src, width, fmt)
+    except RenderQueueFull:
+        return too_busy()
+    except ImageSourceNotAllowed as e:
+        return JSONResponse({"error": str(e)}, status_code=403)
+    except ImageSourceError as e:
+        return JSONResponse({"error": str(e)}, status_code=502)
+
+    headers = {
+        "ETag": f'"{key}"',
+        "Cache-Control": f"public, max-age={wallet_backend.IMAGE_MAX_AGE}",
+        "Vary": "Accept",
+    }
+    if request.headers.get('if-none-match') == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=mimetype, headers=headers)
+
+
+async def metrics_endpoint(request):
+    """Prometheus scrape endpoint (per worker process)"""
+    return Response(metrics.registry.render(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
+
+def collect_render_queue_metrics():
+    stats = renderer.stats()
+    yield ('dpp_render_queue_in_flight', 'gauge', "Renders running or queued", stats['inFlight'], {})
+    yield ('dpp_render_queue_rejected_total', 'counter', "Requests answered 429 because the render queue was full",
+           stats['rejected'], {})
+
+metrics.registry.collectors.append(collect_render_queue_metrics)
+
+
+class RequestMetricsMiddleware:
+    """Records request latency per route, up to the last byte of the response body"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Routes served by the mounted Flask app are recorded by its own request hooks
+            if scope.get('endpoint') is not flask_app:
+                route = ROUTE_PATHS.get(scope.get('endpoint'), 'unmatched')
+                metrics.registry.observe_request(route, scope['method'], status, time.perf_counter() - started)
+
+
+async def health(request):
+    """Health check endpoint"""
+    return JSONResponse({
+        "status": "ok",
+        "service": "LV DPP Wallet Service",
+        "mode": "asgi",
+        "qrCache": wallet_backend.qr_cache.stats(),
+        "renderQueue": renderer.stats(),
+    })
+
+
+routes = [
+    Route('/generate-wallet-link', generate_link, methods=['GET', 'POST']),
+    Route('/preview-wallet', preview_wallet),
+    Route('/qr/{cert}.{ext}', qr_image),
+    Route('/apple-wallet/{cert}.pkpass', apple_wallet_pass_file),
+    Route('/img', image_variant),
+    Route('/metrics', metrics_endpoint),
+    Route('/health', health),
+]
+# Endpoint -> route template, used as the latency label
+ROUTE_PATHS = {route.endpoint: route.path for route in routes}
+
+# Everything not routed above goes to the Flask app
+flask_app = WSGIMiddleware(wallet_backend.app)
+routes.append(Mount('', app=flask_app))
+
+middleware = [Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])]
+if metrics.registry.enabled:
+    middleware.insert(0, Middleware(RequestMetricsMiddleware))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Once per worker, before it takes requests (see wallet_backend.warm_up)
+    wallet_backend.warm_up()
+    yield
+
+
+app = Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the wallet service with uvicorn")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes")
+    parser.add_argument('--render-threads', type=int, default=RENDER_THREADS, help="Render threads per worker")
+    parser.add_argument('--render-queue', type=int, default=RENDER_QUEUE,
+                        help="Renders allowed to wait per worker before answering 429")
+    parser.add_argument('--limit-concurrency', type=int, default=None,
+                        help="Max open connections per worker before uvicorn answers 503")
+    parser.add_argument('--without-ledgers', action='store_true',
+                        help="Answer 503 on ownership, transfer, repair, badge, anchoring and verification "
+                             "routes, which another single-worker process serves (required with --workers > 1)")
+    args = parser.parse_args()
+    if args.workers > 1 and not args.without_ledgers:
+        parser.error("the ownership, transfer and repair logs have one writer process: use --workers 1, "
+                     "or --without-ledgers and serve those routes from a single-worker process")
+
+    # Picked up by each worker process when it imports this module
+    os.environ['WALLET_RENDER_THREADS'] = str(args.render_threads)
+    os.environ['WALLET_RENDER_QUEUE'] = str(args.render_queue)
+    if args.without_ledgers:
+        os.environ['WALLET_LEDGERS'] = '0'
+        # A single worker reuses the wallet_backend module this process already imported
+        wallet_backend.LEDGERS_ENABLED = False
+
+    print(f"✅ ASGI wallet service on http://{args.host}:{args.port} "
+          f"({args.workers} workers, {args.render_threads} render threads, queue {args.render_queue}"
+          f"{', without ledger routes' if args.without_ledgers else ''})")
+    uvicorn.run(
+        'wallet_asgi:app',
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        limit_concurrency=args.limit_concurrency,
+        log_level='warning',
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,54 +1,518 @@
-from flask import Flask, jsonify, render_template_string, request
+from flask import Flask, Response, abort, g, jsonify, request, send_file, stream_template, url_for
 from flask_cors import CORS
-import qrcode
-import io
 import base64
+import gc
+import json
+import os
+import time
+from urllib.parse import urlencode
+
+import apple_wallet
+import google_wallet
+import metrics
+import qr_batch
+import qr_render
+from badge_engine import BadgeEngine
+from cert_verifier import CertificateVerifier
+from credentials import bearer_token, key_matches, verify_client_token
+from durable_log import LogLocked
+from hash_engine import AlreadyAnchored, HashEngine, LocalLedger, issued_certificates
+from image_service import ImageService, ImageSourceError, ImageSourceNotAllowed, pick_format
+from ownership_ledger import OwnershipConflict, OwnershipLedger, OwnershipReader
+from passport_store import PassportStore
+from qr_cache import QRCache, DEFAULT_DISK_MAX_BYTES, DEFAULT_MAX_BYTES
+from repair_log import DuplicateRepair, RepairLog
+from transfer_service import TransferCodesExhausted, TransferConflict, TransferService, public_view
 
 app = Flask(__name__)
 CORS(app)  # Allow requests from Next.js frontend
 
+# Rendered QR codes, keyed by URL + rendering settings.
+# Set QR_CACHE_DIR to keep them on disk across restarts.
+qr_cache = QRCache(
+    max_bytes=int(os.environ.get('QR_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+    disk_dir=os.environ.get('QR_CACHE_DIR') or None,
+    disk_max_bytes=int(os.environ.get('QR_CACHE_DISK_MAX_BYTES', DEFAULT_DISK_MAX_BYTES)),
+)
+QR_BATCH_LIMIT = int(os.environ.get('QR_BATCH_LIMIT', 10_000))
+
+# Passport lookups by productId / certificateId / NFC tag.
+# Build the file with `python passport_store.py build`; without it the demo product is used.
+PASSPORT_STORE_PATH = os.environ.get(
+    'PASSPORT_STORE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'passports.bin')
+)
+passport_store = PassportStore(PASSPORT_STORE_PATH) if os.path.exists(PASSPORT_STORE_PATH) else None
+
+# Product imagery by productId (same as PRODUCT_IMAGES in app/collection/page.tsx)
+PRODUCT_IMAGES = {
+    "LV-JKT-4521-000987": "https://eu.louisvuitton.com/images/is/image/lv/1/PP_VP_L/louis-vuitton-tailored-bomber--HTB40WLGT151_PM2_Front%20view.png?wid=2400&hei=2400",
+    "LV-BAG-M27974-001234": "https://us.louisvuitton.com/images/is/image/lv/1/PP_VP_L/louis-vuitton-speedy-p9-bandouliere-25--M27974_PM2_Front%20view.png?wid=2400&hei=2400",
+}
+DEFAULT_PRODUCT_IMAGE = PRODUCT_IMAGES["LV-JKT-4521-000987"]
+
+def passport_to_product_data(passport):
+    """
+    Convert a passport store record to the product data shape used by the wallet.
+    The owner comes from the ownership ledger; passports.bin only has the owner at build time.
+    """
+    product = passport.get('product', {})
+    certificate_id = passport.get('certificateId')
+    owner = get_ownership_view().current_owner(passport['productId'])
+    return {
+        "name": product.get('name'),
+        "id": passport['productId'],
+        "productId": passport['productId'],
+        "cert": certificate_id,
+        "certificateId": certificate_id,
+        "image": product.get('image') or PRODUCT_IMAGES.get(passport['productId']),
+        "owner": owner or passport.get('ownership', {}).get('currentOwner', {}).get('clientId'),
+        "blockchainHash": passport.get('nfc', {}).get('blockchainHash'),
+        "verificationUrl": qr_batch.VERIFICATION_URL_BASE + certificate_id if certificate_id else None,
+    }
+
+# Ownership transfers: append-only log, compacted into app/data/ownership.json
+OWNERSHIP_SNAPSHOT_PATH = os.environ.get(
+    'OWNERSHIP_SNAPSHOT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'data', 'ownership.json')
+)
+OWNERSHIP_LOG_PATH = os.environ.get('OWNERSHIP_LOG', OWNERSHIP_SNAPSHOT_PATH + '.log')
+_ownership_ledger = None
+
+def get_ownership_ledger():
+    """Ownership ledger, opened on first use (it replays the log and starts compaction)"""
+    global _ownership_ledger
+    if _ownership_ledger is None:
+        _ownership_ledger = OwnershipLedger(OWNERSHIP_SNAPSHOT_PATH, OWNERSHIP_LOG_PATH)
+    return _ownership_ledger
+
+_ownership_reader = None
+
+def get_ownership_view():
+    """
+    Current ownership records: the ledger in the process that owns it, otherwise
+    a read-only view that follows the ledger's snapshot and log
+    """
+    global _ownership_reader
+    if LEDGERS_ENABLED:
+        return get_ownership_ledger()
+    if _ownership_reader is None:
+        _ownership_reader = OwnershipReader(OWNERSHIP_SNAPSHOT_PATH, OWNERSHIP_LOG_PATH)
+    return _ownership_reader
+
+@app.errorhandler(LogLocked)
+def log_locked(e):
+    # Durable logs have one writer process; other processes run with WALLET_LEDGERS=0
+    return jsonify({"success": False, "message": str(e)}), 503
+
+# Routes backed by the single-writer logs (ownership, transfers, repairs and badges) or by the
+# in-memory anchor index (anchoring, verification). WALLET_LEDGERS=0 turns them off in extra
+# serving processes (see wallet_asgi.py --without-ledgers); one process that owns the logs serves them.
+LEDGERS_ENABLED = os.environ.get('WALLET_LEDGERS', '1') != '0'
+LEDGER_ROUTE_PREFIXES = ('/ownership/', '/transfers', '/badges/', '/repairs', '/certificates/', '/verify/')
+
+@app.before_request
+def ledger_routes_need_the_ledger_process():
+    if not LEDGERS_ENABLED and request.path.startswith(LEDGER_ROUTE_PREFIXES):
+        return jsonify({"error": "This route is served by the ledger process"}), 503
+
+# Transfer requests (see transfer_service.py): log + snapshot, expired by a periodic sweep
+TRANSFER_SNAPSHOT_PATH = os.environ.get(
+    'TRANSFER_SNAPSHOT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'transfers.json')
+)
+TRANSFER_TTL = float(os.environ.get('TRANSFER_TTL', 7 * 24 * 60 * 60))
+TRANSFER_SWEEP_INTERVAL = float(os.environ.get('TRANSFER_SWEEP_INTERVAL', 60))
+TRANSFER_CLAIM_URL_BASE = os.environ.get(
+    'TRANSFER_CLAIM_URL_BASE', "http://localhost:3000/dpp/certificate/transfer/claim?id="
+)
+_transfer_service = None
+
+def _ledger_claim(transfer):
+    """New owner the ownership ledger recorded for a transfer's claim, or None"""
+    item = get_ownership_ledger().find_transfer(transfer['productId'], transfer['transferId'])
+    return item['toClientId'] if item else None
+
+def get_transfer_service():
+    """
+    Transfer service, opened on first use (it replays its log, completes claims
+    the ledger already recorded and starts the expiry sweeper)
+    """
+    global _transfer_service
+    if _transfer_service is None:
+        _transfer_service = TransferService(TRANSFER_SNAPSHOT_PATH, ttl=TRANSFER_TTL, claimed_by=_ledger_claim)
+        _transfer_service.start_sweeper(TRANSFER_SWEEP_INTERVAL)
+    return _transfer_service
+
+# Owner routes take a client token issued at sign-in, signed with this secret (see credentials.py),
+# sent as "Authorization: Bearer <token>"
+CLIENT_AUTH_SECRET = os.environ.get('CLIENT_AUTH_SECRET')
+
+def authenticated_client():
+    """Client ID the request's token was issued to, or None"""
+    return verify_client_token(CLIENT_AUTH_SECRET, bearer_token(request.headers.get('Authorization')))
+
+def client_auth_required():
+    if not CLIENT_AUTH_SECRET:
+        return jsonify({"error": "Client sign-in is not configured (set CLIENT_AUTH_SECRET)"}), 503
+    return jsonify({"error": "A valid client token is required"}), 401
+
+# Certificate hashing: batches are anchored as one Merkle root each in a local ledger file
+ANCHOR_LEDGER_PATH = os.environ.get(
+    'ANCHOR_LEDGER', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'anchors.jsonl')
+)
+# Certificates already issued (certificate.json + ownership.json), anchored when the engine opens
+CERTIFICATE_DATA_DIR = os.environ.get(
+    'CERTIFICATE_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'data')
+)
+# Issuer API keys allowed to anchor certificates (comma-separated), sent as "Authorization: Bearer <key>"
+ANCHOR_ISSUER_KEYS = [key.strip() for key in os.environ.get('ANCHOR_ISSUER_KEYS', '').split(',') if key.strip()]
+_hash_engine = None
+
+def get_hash_engine():
+    """
+    Hash engine, opened on first use (it rebuilds inclusion proofs from the
+    ledger and anchors certificates in app/data that are not anchored yet)
+    """
+    global _hash_engine
+    if _hash_engine is None:
+        engine = HashEngine(LocalLedger(ANCHOR_LEDGER_PATH))
+        engine.anchor_missing(issued_certificates(CERTIFICATE_DATA_DIR))
+        _hash_engine = engine
+    return _hash_engine
+
+VERIFY_BLOOM_CAPACITY = int(os.environ.get('VERIFY_BLOOM_CAPACITY', 1_000_000))
+VERIFY_BULK_LIMIT = int(os.environ.get('VERIFY_BULK_LIMIT', 10_000))
+_certificate_verifier = None
+
+def get_certificate_verifier():
+    """Verifier with a Bloom filter of anchored certificate IDs, built on first use"""
+    global _certificate_verifier
+    if _certificate_verifier is None:
+        _certificate_verifier = CertificateVerifier(get_hash_engine(), VERIFY_BLOOM_CAPACITY)
+    return _certificate_verifier
+
+# Badges: per-product aggregates, updated by ownership transfers and a periodic sweep
+BADGE_DATA_DIR = os.environ.get(
+    'BADGE_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'data')
+)
+BADGE_SWEEP_INTERVAL = float(os.environ.get('BADGE_SWEEP_INTERVAL', 3600))
+_badge_engine = None
+
+# Repairs completed after repairs.json, recorded by POST /repairs
+REPAIR_LOG_PATH = os.environ.get('REPAIR_LOG', os.path.join(BADGE_DATA_DIR, 'repairs.json.log'))
+# Atelier API keys allowed to record repairs (comma-separated), sent as "Authorization: Bearer <key>"
+REPAIR_KEYS = [key.strip() for key in os.environ.get('REPAIR_KEYS', '').split(',') if key.strip()]
+_repair_log = None
+
+def get_repair_log():
+    """Repair log, opened on first use (it replays the log)"""
+    global _repair_log
+    if _repair_log is None:
+        with open(os.path.join(BADGE_DATA_DIR, 'repairs.json'), encoding='utf-8') as f:
+            known_ids = [repair['repairId'] for repair in json.load(f)]
+        _repair_log = RepairLog(REPAIR_LOG_PATH, known_ids)
+    return _repair_log
+
+def get_badge_engine():
+    """Badge engine over the ownership ledger and repair log, built on first use"""
+    global _badge_engine
+    if _badge_engine is None:
+        ledger = get_ownership_ledger()
+        repair_log = get_repair_log()
+        _badge_engine = BadgeEngine.from_data_dir(BADGE_DATA_DIR, ownership=ledger.records(),
+                                                  extra_repairs=repair_log.repairs())
+        ledger.listeners.append(_badge_engine.on_transfer)
+        repair_log.listeners.append(_badge_engine.on_repair)
+        _badge_engine.start_sweeper(BADGE_SWEEP_INTERVAL)
+    return _badge_engine
+
+def warm_up():
+    """
+    Build the badge aggregates before serving, then freeze everything allocated
+    so far (modules, app, aggregates) out of the cyclic GC's generations, so
+    later collections don't rescan millions of long-lived objects. gc.freeze()
+    is process-wide: call this once at startup, never from a request.
+    """
+    if LEDGERS_ENABLED:
+        get_badge_engine()
+    gc.freeze()
+
+# Resized product imagery, cached on disk (see image_service.py)
+IMAGE_CACHE_DIR = os.environ.get(
+    'IMAGE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.image_cache')
+)
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+# Extra local directories allowed as file:// sources, separated by os.pathsep
+IMAGE_ALLOWED_DIRS = [d for d in os.environ.get('IMAGE_ALLOWED_DIRS', '').split(os.pathsep) if d]
+IMAGE_MAX_AGE = int(os.environ.get('IMAGE_MAX_AGE', 7 * 86400))
+# The wallet card shows the product at 224 CSS px; 2x for high-density screens
+WALLET_IMAGE_WIDTH = 448
+_image_service = None
+
+def get_image_service():
+    global _image_service
+    if _image_service is None:
+        _image_service = ImageService(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, allowed_dirs=IMAGE_ALLOWED_DIRS)
+    return _image_service
+
+def image_variant_url(src, width):
+    """Relative URL of a resized variant of src, served by /img"""
+    return '/img?' + urlencode({"src": src, "w": width})
+
+# Google Wallet save links (see google_wallet.py); without a key, links point at /preview-wallet
+GOOGLE_WALLET_KEY_FILE = os.environ.get('GOOGLE_WALLET_KEY_FILE')
+GOOGLE_WALLET_ISSUER_ID = os.environ.get('GOOGLE_WALLET_ISSUER_ID')
+GOOGLE_WALLET_CLASS_SUFFIX = os.environ.get('GOOGLE_WALLET_CLASS_SUFFIX', google_wallet.DEFAULT_CLASS_SUFFIX)
+GOOGLE_WALLET_ORIGINS = [o for o in os.environ.get('GOOGLE_WALLET_ORIGINS', 'http://localhost:3000').split(',') if o]
+GOOGLE_WALLET_MAX_OBJECTS = int(os.environ.get('GOOGLE_WALLET_MAX_OBJECTS', google_wallet.DEFAULT_MAX_OBJECTS))
+GOOGLE_WALLET_BULK_LIMIT = int(os.environ.get('GOOGLE_WALLET_BULK_LIMIT', 10_000))
+
+def google_wallet_enabled():
+    return bool(GOOGLE_WALLET_KEY_FILE and GOOGLE_WALLET_ISSUER_ID)
+
+def google_wallet_object(product_data):
+    return google_wallet.pass_object(product_data, GOOGLE_WALLET_ISSUER_ID, GOOGLE_WALLET_CLASS_SUFFIX)
+
+def google_wallet_save_links(products, max_objects=None):
+    """Signed save links for many products, several passes per link"""
+    signer = google_wallet.load_signer(GOOGLE_WALLET_KEY_FILE)
+    with metrics.stage('wallet_jwt_sign'):
+        return google_wallet.save_links(
+            signer,
+            [google_wallet_object(product) for product in products],
+            GOOGLE_WALLET_ISSUER_ID,
+            GOOGLE_WALLET_CLASS_SUFFIX,
+            GOOGLE_WALLET_ORIGINS,
+            max_objects=max_objects or GOOGLE_WALLET_MAX_OBJECTS,
+        )
+
+# Apple Wallet passes, built and signed locally (see apple_wallet.py) and kept in APPLE_PASS_DIR
+APPLE_PASS_CERT = os.environ.get('APPLE_PASS_CERT')
+APPLE_PASS_KEY = os.environ.get('APPLE_PASS_KEY')
+APPLE_PASS_KEY_PASSWORD = os.environ.get('APPLE_PASS_KEY_PASSWORD')
+APPLE_WWDR_CERT = os.environ.get('APPLE_WWDR_CERT')
+APPLE_PASS_TYPE_ID = os.environ.get('APPLE_PASS_TYPE_ID')
+APPLE_TEAM_ID = os.environ.get('APPLE_TEAM_ID')
+APPLE_PASS_LOGO = os.environ.get('APPLE_PASS_LOGO') or None
+APPLE_PASS_DIR = os.environ.get(
+    'APPLE_PASS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'passes')
+)
+APPLE_PASS_BULK_LIMIT = int(os.environ.get('APPLE_PASS_BULK_LIMIT', 10_000))
+APPLE_PASS_WORKERS = int(os.environ.get('APPLE_PASS_WORKERS', 0)) or None
+# The pass thumbnail is 90 pt; 3x for the densest screens
+APPLE_PASS_THUMBNAIL_WIDTH = 270
+_pass_builder = None
+_pass_index = None
+
+def apple_wallet_enabled():
+    return bool(APPLE_PASS_CERT and APPLE_PASS_KEY and APPLE_WWDR_CERT and APPLE_PASS_TYPE_ID and APPLE_TEAM_ID)
+
+def apple_wallet_config():
+    return apple_wallet.builder_config(
+        APPLE_PASS_CERT, APPLE_PASS_KEY, APPLE_WWDR_CERT, APPLE_PASS_TYPE_ID, APPLE_TEAM_ID,
+        password=APPLE_PASS_KEY_PASSWORD, logo_path=APPLE_PASS_LOGO,
+    )
+
+def get_pass_builder():
+    """Pass builder, created on first use (it parses the certificates and renders the shared assets)"""
+    global _pass_builder
+    if _pass_builder is None:
+        _pass_builder = apple_wallet.make_builder(apple_wallet_config())
+    return _pass_builder
+
+def get_pass_index():
+    """Certificate -> stored pass index, opened on first use"""
+    global _pass_index
+    if _pass_index is None:
+        _pass_index = apple_wallet.PassIndex(APPLE_PASS_DIR)
+    return _pass_index
+
+def pass_thumbnail_path(product_data):
+    """Local, resized copy of the product image for the pass thumbnail (fetched once), or None"""
+    if not product_data.get('image'):
+        return None
+    try:
+        path, _, _ = get_image_service().get_variant(product_data['image'], APPLE_PASS_THUMBNAIL_WIDTH, 'jpeg')
+    except ImageSourceError:
+        return None
+    return path
+
+def _current_pass(product_data, thumbnail_path):
+    """Stored pass entry if it matches what would be built now, else None"""
+    _, certificate_id = apple_wallet.product_ids(product_data)
+    index = get_pass_index()
+    entry = index.get(certificate_id)
+    if entry and entry['manifestHash'] == get_pass_builder().digest(product_data, thumbnail_path) \
+            and os.path.exists(index.path(entry)):
+        return entry
+    return None
+
+def apple_wallet_pass(product_data):
+    """Index entry of a product's .pkpass, built and stored unless the stored one is current"""
+    thumbnail_path = pass_thumbnail_path(product_data)
+    entry = _current_pass(product_data, thumbnail_path)
+    if entry is None:
+        product_id, certificate_id = apple_wallet.product_ids(product_data)
+        with metrics.stage('pkpass_build'):
+            serial, data, digest = get_pass_builder().build(product_data, thumbnail_path)
+        entry = get_pass_index().put(certificate_id, product_id, serial, data, digest)
+    return entry
+
+def apple_wallet_passes(products):
+    """Index entries for many products; passes that need (re)building are signed in a process pool"""
+    entries = [None] * len(products)
+    pending = []
+    for i, product_data in enumerate(products):
+        thumbnail_path = pass_thumbnail_path(product_data)
+        entries[i] = _current_pass(product_data, thumbnail_path)
+        if entries[i] is None:
+            pending.append((i, product_data, thumbnail_path))
+
+    with metrics.stage('pkpass_build'):
+        results = apple_wallet.build_bulk(
+            apple_wallet_config(), [(product_data, path) for _, product_data, path in pending], APPLE_PASS_WORKERS
+        )
+    index = get_pass_index()
+    for (i, product_data, _), (serial, data, digest) in zip(pending, results):
+        product_id, certificate_id = apple_wallet.product_ids(product_data)
+        entries[i] = index.put(certificate_id, product_id, serial, data, digest)
+    return entries
+
+# Operational metrics (see metrics.py), scraped from /metrics
+# PROFILE_SLOW_MS=<ms> writes folded stacks of slower requests to PROFILE_DIR
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 0))
+PROFILE_DIR = os.environ.get(
+    'PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+)
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+profiler = None
+if PROFILE_SLOW_MS > 0:
+    profiler = metrics.SlowRequestProfiler(PROFILE_SLOW_MS / 1000, PROFILE_DIR, PROFILE_INTERVAL_MS / 1000)
+
+def collect_service_metrics():
+    """Cache and store counters, read at scrape time"""
+    stats = qr_cache.stats()
+    yield ('dpp_qr_cache_lookups_total', 'counter', "QR cache lookups by result", stats['hits'], {"result": "memory_hit"})
+    yield ('dpp_qr_cache_lookups_total', 'counter', "QR cache lookups by result", stats['diskHits'], {"result": "disk_hit"})
+    yield ('dpp_qr_cache_lookups_total', 'counter', "QR cache lookups by result", stats['misses'], {"result": "miss"})
+    yield ('dpp_qr_cache_bytes', 'gauge', "Bytes held by the in-memory QR cache", stats['bytes'], {})
+    yield ('dpp_qr_cache_evictions_total', 'counter', "QR cache evictions", stats['evictions'], {})
+    yield ('dpp_qr_cache_disk_bytes', 'gauge', "Bytes held by the on-disk QR cache", stats['diskBytes'], {})
+    yield ('dpp_qr_cache_disk_evictions_total', 'counter', "QR disk cache evictions", stats['diskEvictions'], {})
+    if passport_store:
+        yield ('dpp_passport_store_passports', 'gauge', "Passports in the loaded store", len(passport_store), {})
+    if profiler:
+        yield ('dpp_profiler_dumps_total', 'counter', "Slow-request profiles written", profiler.dumps, {})
+    if _transfer_service:
+        stats = _transfer_service.stats()
+        yield ('dpp_transfers_live', 'gauge', "Pending or approved transfer requests", stats['live'], {})
+        yield ('dpp_transfers_expired_total', 'counter', "Transfer requests expired", stats['expired'], {})
+
+metrics.registry.collectors.append(collect_service_metrics)
+
+def _start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.request_profile = profiler.begin() if profiler else None
+
+def _request_recorder(status):
+    """Takes the request's timer and profile token from g; returns a callable that records them"""
+    started = g.pop('request_started')
+    profile = g.pop('request_profile', None)
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    method = request.method
+
+    def record():
+        metrics.registry.observe_request(route, method, status, time.perf_counter() - started)
+        if profile:
+            profiler.end(profile, f"{method} {route}")
+
+    return record
+
+def _finish_request_metrics(response):
+    if 'request_started' in g:
+        # Runs once the body has been sent, so streamed pages are fully counted
+        response.call_on_close(_request_recorder(response.status_code))
+    return response
+
+def _teardown_request_metrics(exc):
+    # after_request is skipped when a view raises; record the request here so its
+    # latency is counted and the profiler stops sampling the thread
+    if 'request_started' in g:
+        _request_recorder(500)()
+
+# With metrics off and no profiler, requests don't go through any hook
+if metrics.registry.enabled or profiler:
+    app.before_request(_start_request_metrics)
+    app.after_request(_finish_request_metrics)
+    app.teardown_request(_teardown_request_metrics)
+
 # This would normally come from your Next.js frontend or database
-def get_product_data_from_request():
+def get_product_data_from_request(product_id=None, nfc_uid=None):
     """
     In production, you'd receive product data from the Next.js frontend
-    or fetch it from your database using the product ID
+    or fetch it from your database using the product ID.
+    Looks the product up in the passport store when one is loaded, and
+    returns None when it has no such productId or NFC tag.
     """
+    if passport_store and (product_id or nfc_uid):
+        if product_id:
+            passport = passport_store.by_product_id(product_id)
+        else:
+            passport = passport_store.by_nfc_tag(nfc_uid)
+        return passport_to_product_data(passport) if passport else None
+
     return {
         "name": "Tailored Wool Jacket",
         "id": "LV-JKT-4521-000987",
         "cert": "LV-DPP-9F3A2C",
-        "image": "https://eu.louisvuitton.com/images/is/image/lv/1/PP_VP_L/louis-vuitton-tailored-bomber--HTB40WLGT151_PM2_Front%20view.png?wid=2400&hei=2400",
+        "image": DEFAULT_PRODUCT_IMAGE,
         "owner": "You",
         "blockchainHash": "0x1234...abcd",
         # Add this for QR code generation
         "verificationUrl": "http://localhost:3000/dpp/certificate?verify=LV-CERT-998234"
     }
 
-def generate_qr_code_base64(url):
+def generate_qr_code(url, fmt='png', error_correction=qr_render.ERROR_CORRECTION,
+                     box_size=qr_render.BOX_SIZE, border=qr_render.BORDER,
+                     fill_color=qr_render.FILL_COLOR, back_color=qr_render.BACK_COLOR):
     """
-    Generate a QR code and return it as base64 string
-    This matches the QR code generated in the Next.js certificate page
+    Generate a QR code as raw bytes in the given format (png, svg or matrix).
+    Returns (key, data) where key is the content-addressed cache key, usable as an ETag.
     """
-    # Create QR code with same settings as frontend
-    qr = qrcode.QRCode(
-        version=1,  # Auto-adjust
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=2,  # Same margin as frontend
+    render = qr_render.RENDERERS[fmt]
+    key = QRCache.make_key(url, fmt, error_correction, box_size, border, fill_color, back_color)
+    data = qr_cache.get_or_render(
+        key, lambda: render(url, error_correction, box_size, border, fill_color, back_color)
     )
-    qr.add_data(url)
-    qr.make(fit=True)
-    
-    # Create image with same colors as frontend
-    img = qr.make_image(fill_color="#0d0b08", back_color="#ffffff")
-    
-    # Convert to base64
-    buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    img_base64 = base64.b64encode(buffer.getvalue()).decode()
-    
-    return f"data:image/png;base64,{img_base64}"
+    return key, data
+
+def generate_qr_code_base64(url, fmt='png', error_correction=qr_render.ERROR_CORRECTION,
+                            box_size=qr_render.BOX_SIZE, border=qr_render.BORDER,
+                            fill_color=qr_render.FILL_COLOR, back_color=qr_render.BACK_COLOR):
+    """
+    Generate a QR code and return it as base64 data URI
+    This matches the QR code generated in the Next.js certificate page
+    fmt="svg" or "matrix" skips Pillow entirely
+    """
+    key = QRCache.make_key(url, 'data-uri:' + fmt, error_correction, box_size, border, fill_color, back_color)
+
+    def render():
+        _, data = generate_qr_code(url, fmt, error_correction, box_size, border, fill_color, back_color)
+        with metrics.stage('qr_base64'):
+            img_base64 = base64.b64encode(data).decode()
+            return f"data:{qr_render.MIMETYPES[fmt]};base64,{img_base64}".encode()
+
+    return qr_cache.get_or_render(key, render).decode()
+
+def find_product_by_cert(cert):
+    """Look up the product data for a certificate ID, or None"""
+    if passport_store:
+        passport = passport_store.by_certificate_id(cert)
+        if passport:
+            return passport_to_product_data(passport)
+
+    product_data = get_product_data_from_request()
+    if cert in (product_data.get('cert'), product_data.get('certificateId')):
+        return product_data
+    return None
 
 # Google Wallet simulation HTML template
 HTML_TEMPLATE = """
@@ -86,7 +550,7 @@ HTML_TEMPLATE = """
         <div class="p-6 space-y-4">
             <!-- Product Image -->
             <div class="flex justify-center">
-                <img src="{{data.image}}" class="w-56 h-56 object-cover rounded-xl shadow-lg border border-gray-100">
+                {% if data.image %}<img src="{{data.image}}" class="w-56 h-56 object-cover rounded-xl shadow-lg border border-gray-100">{% endif %}
             </div>
             
             <!-- Product Info -->
@@ -183,6 +647,54 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# Compiled once at startup instead of on every request
+wallet_template = app.jinja_env.from_string(HTML_TEMPLATE)
+
+# "inline" embeds the QR as a data URI, "link" points at /qr/<cert>.png
+WALLET_QR_MODE = os.environ.get('WALLET_QR_MODE', 'inline')
+# "png" or "svg" for the QR shown in the wallet preview
+WALLET_QR_FORMAT = os.environ.get('WALLET_QR_FORMAT', 'png')
+QR_MAX_AGE = int(os.environ.get('QR_MAX_AGE', 86400))
+
+def build_preview_data(qr_mode, qr_format, qr_link, product_id=None, nfc_uid=None):
+    """
+    Product data for the wallet preview page, with its QR code attached,
+    or None for an unknown product.
+    qr_link(cert, ext) builds the /qr/<cert>.<ext> URL used in "link" mode.
+    """
+    with metrics.stage('product_lookup'):
+        product_data = get_product_data_from_request(product_id, nfc_uid)
+    if product_data is None:
+        return None
+    qr_format = 'svg' if qr_format == 'svg' else 'png'
+    if product_data.get('image'):
+        product_data['image'] = image_variant_url(product_data['image'], WALLET_IMAGE_WIDTH)
+
+    # Generate QR code matching the certificate page
+    if product_data.get('verificationUrl'):
+        if qr_mode == 'link' and product_data.get('cert'):
+            product_data['qrCode'] = qr_link(product_data['cert'], qr_format)
+        else:
+            with metrics.stage('qr_data_uri'):
+                product_data['qrCode'] = generate_qr_code_base64(product_data['verificationUrl'], qr_format)
+    return product_data
+
+def wallet_link_payload(product_data):
+    """Response body for /generate-wallet-link: a signed save link when a key is configured"""
+    if google_wallet_enabled() and product_data:
+        link = google_wallet_save_links([product_data])[0]
+        return {
+            "url": link['url'],
+            "objectId": link['objectIds'][0],
+            "success": True,
+            "message": "Google Wallet save link generated"
+        }
+    return {
+        "url": "http://127.0.0.1:5000/preview-wallet",
+        "success": True,
+        "message": "Wallet preview generated with real QR code"
+    }
+
 @app.route('/generate-wallet-link', methods=['GET', 'POST'])
 def generate_link():
     """
@@ -192,38 +704,494 @@ def generate_link():
     """
     # Get product data (from request body if POST, or use default)
     if request.method == 'POST':
-        product_data = request.json
+        product_data = request.get_json(silent=True)
+        if not isinstance(product_data, dict):
+            return jsonify({"success": False, "message": "Expected a JSON product object"}), 400
+        error = google_wallet.product_error(product_data) if google_wallet_enabled() else None
+        if error:
+            return jsonify({"success": False, "message": error}), 400
     else:
-        product_data = get_product_data_from_request()
-    
-    # In production, you would:
-    # 1. Create a Google Wallet pass object with product data
-    # 2. Sign it with your Google Wallet API credentials
-    # 3. Return the official Google Wallet URL
-    
-    # For demo, return our preview URL
+        product_data = get_product_data_from_request(request.args.get('productId'), request.args.get('nfc'))
+        if product_data is None:
+            return jsonify({"success": False, "message": "Unknown product"}), 404
+
+    # Signed Google Wallet save link when GOOGLE_WALLET_KEY_FILE is set, else our preview URL
+    return jsonify(wallet_link_payload(product_data))
+
+@app.route('/google-wallet/save-links', methods=['POST'])
+def google_wallet_links_bulk():
+    """
+    Signed save links for many products at once, several passes per link.
+    Body: {"products": [...], "maxObjectsPerLink": 10} (or a bare list of products)
+    """
+    if not google_wallet_enabled():
+        return jsonify({"success": False, "message": "Google Wallet signing is not configured"}), 503
+
+    body = request.get_json(silent=True)
+    max_objects = None
+    if isinstance(body, list):
+        products = body
+    elif isinstance(body, dict) and isinstance(body.get('products'), list):
+        products, max_objects = body['products'], body.get('maxObjectsPerLink')
+    else:
+        return jsonify({"success": False, "message": "Expected a list of products"}), 400
+    if len(products) > GOOGLE_WALLET_BULK_LIMIT:
+        return jsonify({"success": False, "message": f"At most {GOOGLE_WALLET_BULK_LIMIT} products per request"}), 413
+    for index, product in enumerate(products):
+        error = google_wallet.product_error(product)
+        if error:
+            return jsonify({"success": False, "message": f"Product {index}: {error}"}), 400
+    if max_objects is not None and (isinstance(max_objects, bool) or not isinstance(max_objects, int)
+                                    or max_objects < 1):
+        return jsonify({"success": False, "message": "maxObjectsPerLink must be a positive integer"}), 400
+
+    links = google_wallet_save_links(products, max_objects)
+    return jsonify({"success": True, "links": links})
+
+@app.route('/apple-wallet/<cert>.pkpass')
+def apple_wallet_pass_file(cert):
+    """A certificate's Apple Wallet pass, built locally on first request and whenever its data changes"""
+    if not apple_wallet_enabled():
+        return jsonify({"success": False, "message": "Apple Wallet signing is not configured"}), 503
+    product_data = find_product_by_cert(cert)
+    if not product_data:
+        abort(404)
+
+    entry = apple_wallet_pass(product_data)
+    return send_file(
+        get_pass_index().path(entry),
+        mimetype=apple_wallet.MIMETYPE,
+        as_attachment=True,
+        download_name=entry['serialNumber'] + '.pkpass',
+        etag=entry['manifestHash'],
+        conditional=True,
+    )
+
+@app.route('/apple-wallet/passes', methods=['POST'])
+def apple_wallet_passes_bulk():
+    """
+    Build (or reuse) Apple Wallet passes for many products at once.
+    Body: {"products": [...]} (or a bare list of products)
+    Returns the download URL of each pass.
+    """
+    if not apple_wallet_enabled():
+        return jsonify({"success": False, "message": "Apple Wallet signing is not configured"}), 503
+
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        body = body.get('products')
+    if not isinstance(body, list) or not all(isinstance(p, dict) and apple_wallet.product_ids(p)[1] for p in body):
+        return jsonify({"success": False, "message": "Expected a list of products with certificate IDs"}), 400
+    if len(body) > APPLE_PASS_BULK_LIMIT:
+        return jsonify({"success": False, "message": f"At most {APPLE_PASS_BULK_LIMIT} products per request"}), 413
+
+    entries = apple_wallet_passes(body)
+    return jsonify({"success": True, "passes": [
+        {
+            "certificateId": entry['certificateId'],
+            "serialNumber": entry['serialNumber'],
+            "url": url_for('apple_wallet_pass_file', cert=entry['certificateId']),
+        }
+        for entry in entries
+    ]})
+
+@app.route('/generate-wallet-links', methods=['POST'])
+def generate_links_bulk():
+    """
+    Render QR codes for many products at once.
+    Body: {"products": [...], "format": "ndjson" | "zip", "qrFormat": "png" | "svg" | "matrix"}
+    (or a bare list of products)
+    Results are streamed back as each QR code finishes rendering.
+    """
+    body = request.get_json(silent=True)
+    qr_format = 'png'
+    if isinstance(body, list):
+        products, output_format = body, 'ndjson'
+    elif isinstance(body, dict) and isinstance(body.get('products'), list):
+        products, output_format = body['products'], body.get('format', 'ndjson')
+        qr_format = body.get('qrFormat', 'png')
+    else:
+        return jsonify({"success": False, "message": "Expected a list of products"}), 400
+    if qr_format not in qr_render.RENDERERS:
+        return jsonify({"success": False, "message": f"Unknown qrFormat: {qr_format}"}), 400
+    # Checked up front: once the stream has started an error can only truncate it
+    error = qr_batch.validate_products(products)
+    if error:
+        return jsonify({"success": False, "message": error}), 400
+    if len(products) > QR_BATCH_LIMIT:
+        return jsonify({"success": False, "message": f"At most {QR_BATCH_LIMIT} products per request"}), 413
+
+    results = qr_batch.iter_rendered(products, fmt=qr_format)
+    if output_format == 'zip':
+        return Response(
+            qr_batch.iter_zip(results),
+            mimetype='application/zip',
+            headers={"Content-Disposition": "attachment; filename=qr_codes.zip"},
+        )
+    return Response(qr_batch.iter_ndjson(results), mimetype='application/x-ndjson')
+
+@app.route('/preview-wallet')
+def preview_wallet():
+    """
+    Display the Google Wallet simulation page with real QR code.
+    ?qr=link serves the QR as a separate cacheable image instead of an inline data URI.
+    ?format=svg uses a vector QR instead of a PNG.
+    ?productId=... or ?nfc=... picks the passport to show.
+    """
+    product_data = build_preview_data(
+        request.args.get('qr', WALLET_QR_MODE),
+        request.args.get('format', WALLET_QR_FORMAT),
+        lambda cert, ext: url_for('qr_image', cert=cert, ext=ext),
+        request.args.get('productId'),
+        request.args.get('nfc'),
+    )
+    if product_data is None:
+        abort(404)
+    return Response(
+        metrics.time_iter('template_render', stream_template(wallet_template, data=product_data)),
+        mimetype='text/html',
+    )
+
+# File extension -> QR output format for /qr/<cert>.<ext>
+QR_EXTENSIONS = {'png': 'png', 'svg': 'svg', 'bin': 'matrix'}
+
+@app.route('/qr/<cert>.<ext>')
+def qr_image(cert, ext):
+    """Serve a certificate's verification QR code as a cacheable PNG, SVG or packed matrix (.bin)"""
+    fmt = QR_EXTENSIONS.get(ext)
+    product_data = find_product_by_cert(cert)
+    if not fmt or not product_data or not product_data.get('verificationUrl'):
+        abort(404)
+
+    key, data = generate_qr_code(product_data['verificationUrl'], fmt)
+    response = Response(data, mimetype=qr_render.MIMETYPES[fmt])
+    response.set_etag(key)
+    response.cache_control.public = True
+    response.cache_control.max_age = QR_MAX_AGE
+    return response.make_conditional(request)
+
+@app.route('/ownership/transfer', methods=['POST'])
+def transfer_ownership():
+    """
+    Record an ownership transfer (same body as the Next.js /api/ownership/update route).
+    Requires the current owner's client token: "Authorization: Bearer <token>".
+    The transfer is durable once this returns.
+    """
+    client_id = authenticated_client()
+    if not client_id:
+        return client_auth_required()
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not all(isinstance(body.get(field), str) and body[field]
+                                             for field in ('productId', 'newOwnerId', 'transactionId')):
+        return jsonify({"error": "Missing required fields"}), 400
+    if body.get('previousOwnerId', client_id) != client_id:
+        return jsonify({"error": f"Signed in as {client_id}, not {body['previousOwnerId']}"}), 403
+
+    ledger = get_ownership_ledger()
+    if not ledger.get(body['productId']):
+        return jsonify({"error": "Product not found"}), 404
+    if ledger.current_owner(body['productId']) != client_id:
+        return jsonify({"error": "Only the current owner can transfer this product"}), 403
+    try:
+        # previous_owner_id makes the ledger re-check ownership under the product's lock
+        entry = ledger.transfer(
+            body['productId'],
+            body['newOwnerId'],
+            body['transactionId'],
+            previous_owner_id=client_id,
+            new_owner_name=body.get('newOwnerName'),
+            new_owner_email=body.get('newOwnerEmail'),
+        )
+    except OwnershipConflict as e:
+        return jsonify({"error": "Ownership conflict", "details": str(e)}), 409
+
     return jsonify({
-        "url": "http://127.0.0.1:5000/preview-wallet",
         "success": True,
-        "message": "Wallet preview generated with real QR code"
+        "message": "Ownership updated successfully",
+        "data": {
+            "productId": entry['productId'],
+            "newOwnerId": entry['toClientId'],
+            "transactionId": entry['transactionId'],
+            "transferDate": entry['transferDate'],
+        }
     })
 
-@app.route('/preview-wallet')
-def preview_wallet():
-    """Display the Google Wallet simulation page with real QR code"""
-    product_data = get_product_data_from_request()
-    
-    # Generate QR code matching the certificate page
-    if product_data.get('verificationUrl'):
-        qr_code_data = generate_qr_code_base64(product_data['verificationUrl'])
-        product_data['qrCode'] = qr_code_data
-    
-    return render_template_string(HTML_TEMPLATE, data=product_data)
+@app.route('/ownership/<product_id>')
+def get_ownership(product_id):
+    """Current ownership record for a product"""
+    record = get_ownership_ledger().get(product_id)
+    if not record:
+        return jsonify({"error": "Product not found"}), 404
+    return jsonify(record)
+
+@app.route('/transfers', methods=['POST'])
+def create_transfer():
+    """
+    Start an ownership transfer (like createTransferRequest).
+    Requires the current owner's client token: "Authorization: Bearer <token>".
+    Body: {"productId", "certificateId", "newOwnerEmail"?, "newOwnerName"?}
+    The response, to the owner only, carries the approval token; every other read omits it.
+    """
+    client_id = authenticated_client()
+    if not client_id:
+        return client_auth_required()
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not all(isinstance(body.get(field), str) and body[field]
+                                             for field in ('productId', 'certificateId')):
+        return jsonify({"error": "Missing required fields"}), 400
+    if body.get('currentOwnerId', client_id) != client_id:
+        return jsonify({"error": f"Signed in as {client_id}, not {body['currentOwnerId']}"}), 403
+
+    ledger = get_ownership_ledger()
+    if not ledger.get(body['productId']):
+        return jsonify({"error": "Product not found"}), 404
+    if ledger.current_owner(body['productId']) != client_id:
+        return jsonify({"error": "Only the current owner can transfer this product"}), 403
+    try:
+        transfer = get_transfer_service().create(
+            body['productId'], body['certificateId'], client_id,
+            new_owner_email=body.get('newOwnerEmail'), new_owner_name=body.get('newOwnerName'),
+        )
+    except TransferCodesExhausted as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify({
+        "success": True,
+        "transfer": transfer,
+        "qrData": {
+            "type": "ownership_transfer",
+            "transferId": transfer['transferId'],
+            "productId": transfer['productId'],
+            "certificateId": transfer['certificateId'],
+            "timestamp": transfer['createdAt'],
+            "claimUrl": TRANSFER_CLAIM_URL_BASE + transfer['transferId'],
+        },
+    }), 201
+
+@app.route('/transfers')
+def list_transfers():
+    """Pending and approved transfers started by the signed-in owner (?ownerId= must be that owner)"""
+    client_id = authenticated_client()
+    if not client_id:
+        return client_auth_required()
+    owner_id = request.args.get('ownerId', client_id)
+    if owner_id != client_id:
+        return jsonify({"error": f"Signed in as {client_id}, not {owner_id}"}), 403
+    return jsonify({"transfers": [public_view(t) for t in get_transfer_service().pending_for_owner(owner_id)]})
+
+@app.route('/transfers/<transfer_id>')
+def get_transfer(transfer_id):
+    """A transfer request by ID (like getTransferRequestById)"""
+    transfer = get_transfer_service().get(transfer_id)
+    if not transfer:
+        return jsonify({"error": "Transfer not found"}), 404
+    return jsonify(public_view(transfer))
+
+@app.route('/transfers/code/<code>')
+def get_transfer_by_code(code):
+    """A pending or approved transfer request by its 6-digit code (like getTransferRequestByCode)"""
+    transfer = get_transfer_service().get_by_code(code)
+    if not transfer:
+        return jsonify({"error": "Transfer not found"}), 404
+    return jsonify(public_view(transfer))
+
+@app.route('/transfers/<transfer_id>/<action>', methods=['POST'])
+def update_transfer(transfer_id, action):
+    """
+    Every action requires a client token: "Authorization: Bearer <token>".
+    approve / reject: the transfer's current owner, body {"approvalToken"}
+    complete: the new owner, body {"newOwnerName"?, "newOwnerEmail"?}; records the
+    ownership transfer in the ledger and completes the request atomically
+    """
+    if action not in ('approve', 'reject', 'complete'):
+        abort(404)
+    client_id = authenticated_client()
+    if not client_id:
+        return client_auth_required()
+
+    body = request.get_json(silent=True)
+    body = body if isinstance(body, dict) else {}
+    service = get_transfer_service()
+    transfer = service.get(transfer_id)
+    if not transfer:
+        return jsonify({"error": "Transfer not found"}), 404
+    try:
+        if action in ('approve', 'reject'):
+            if transfer['currentOwnerId'] != client_id:
+                return jsonify({"error": f"Only the current owner can {action} this transfer"}), 403
+            update = service.approve if action == 'approve' else service.reject
+            transfer = update(transfer_id, body.get('approvalToken'))
+        else:
+            if body.get('newOwnerId', client_id) != client_id:
+                return jsonify({"error": f"Signed in as {client_id}, not {body['newOwnerId']}"}), 403
+
+            def record_ownership(completed):
+                ledger = get_ownership_ledger()
+                # A retry after a crash between the ledger write and the completed record
+                claimed = ledger.find_transfer(completed['productId'], transfer_id)
+                if claimed is not None:
+                    if claimed['toClientId'] != client_id:
+                        raise OwnershipConflict(f"{transfer_id} was claimed by {claimed['toClientId']}")
+                    return
+                ledger.transfer(
+                    completed['productId'],
+                    client_id,
+                    transfer_id,
+                    previous_owner_id=completed['currentOwnerId'],
+                    new_owner_name=body.get('newOwnerName'),
+                    new_owner_email=body.get('newOwnerEmail'),
+                )
+
+            transfer = service.complete(transfer_id, client_id, body.get('newOwnerName'),
+                                        before_commit=record_ownership)
+    except (TransferConflict, OwnershipConflict) as e:
+        return jsonify({"error": "Transfer conflict", "details": str(e)}), 409
+
+    if not transfer:
+        return jsonify({"error": "Transfer not found"}), 404
+    return jsonify({"success": True, "transfer": public_view(transfer)})
+
+@app.route('/badges/<product_id>')
+def get_badges(product_id):
+    """Badges for a product (?achieved=true for achieved badges only)"""
+    engine = get_badge_engine()
+    if request.args.get('achieved', '').lower() in ('1', 'true', 'yes'):
+        badges = engine.achieved_badges(product_id)
+    else:
+        badges = engine.badges(product_id)
+    if badges is None:
+        return jsonify({"error": "Product not found"}), 404
+    return jsonify({"productId": product_id, "badges": badges})
+
+@app.route('/repairs', methods=['POST'])
+def record_repair():
+    """
+    Record a completed repair; only that product's badges are re-evaluated.
+    Requires an atelier key: "Authorization: Bearer <key>" (see REPAIR_KEYS).
+    Body: a repairs.json entry, e.g. {"repairId", "productId", "repairType", "date", "carbonSavedKg", ...}
+    """
+    if not REPAIR_KEYS:
+        return jsonify({"error": "Repair recording is not configured (set REPAIR_KEYS)"}), 503
+    if not key_matches(bearer_token(request.headers.get('Authorization')), REPAIR_KEYS):
+        return jsonify({"error": "A valid atelier key is required"}), 401
+
+    repair = request.get_json(silent=True)
+    if not isinstance(repair, dict) or not all(isinstance(repair.get(field), str) and repair[field]
+                                               for field in ('repairId', 'productId')):
+        return jsonify({"error": "Expected a repair with repairId and productId"}), 400
+    carbon_saved = repair.get('carbonSavedKg', 0)
+    if isinstance(carbon_saved, bool) or not isinstance(carbon_saved, (int, float)) or carbon_saved < 0:
+        return jsonify({"error": "carbonSavedKg must be a non-negative number"}), 400
+    if repair.get('status', 'Completed') != 'Completed':
+        return jsonify({"error": "Only completed repairs can be recorded"}), 400
+
+    engine = get_badge_engine()
+    try:
+        get_repair_log().record({**repair, "status": "Completed", "carbonSavedKg": carbon_saved})
+    except DuplicateRepair as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({
+        "success": True,
+        "productId": repair['productId'],
+        "badges": engine.achieved_badges(repair['productId']),
+    }), 201
+
+@app.route('/certificates/anchor', methods=['POST'])
+def anchor_certificates():
+    """
+    Hash certificates and anchor them now, as Merkle batches of their own
+    (certificates queued by other callers are left pending).
+    Requires an issuer key: "Authorization: Bearer <key>" (see ANCHOR_ISSUER_KEYS).
+    Body: {"certificates": [{"certificateId", "productId", "transactionId", "ownerId", "timestamp"}, ...]}
+    Returns one receipt per certificate with its hash and inclusion proof.
+    A certificate ID can only be anchored once; resubmitting one answers 409.
+    """
+    if not ANCHOR_ISSUER_KEYS:
+        return jsonify({"error": "Certificate anchoring is not configured (set ANCHOR_ISSUER_KEYS)"}), 503
+    if not key_matches(bearer_token(request.headers.get('Authorization')), ANCHOR_ISSUER_KEYS):
+        return jsonify({"error": "A valid issuer key is required"}), 401
+
+    body = request.get_json(silent=True)
+    certificates = body.get('certificates') if isinstance(body, dict) else None
+    fields = ('certificateId', 'productId', 'transactionId', 'ownerId', 'timestamp')
+    if not isinstance(certificates, list) or not certificates:
+        return jsonify({"error": "Expected a list of certificates"}), 400
+    if any(not isinstance(c, dict) or not all(isinstance(c.get(field), str) and c[field] for field in fields)
+           for c in certificates):
+        return jsonify({"error": "Each certificate needs these string fields", "required": list(fields)}), 400
+
+    engine = get_hash_engine()
+    try:
+        receipts = engine.anchor_many([tuple(c[field] for field in fields) for c in certificates])
+    except AlreadyAnchored as e:
+        return jsonify({"error": "Certificates are already anchored", "certificateIds": e.certificate_ids}), 409
+    return jsonify({"success": True, "receipts": receipts})
+
+@app.route('/verify/<cert>')
+def verify_certificate(cert):
+    """
+    Verify a scanned certificate ID against its anchored Merkle proof.
+    Optional ?hash=0x... must match the anchored certificate hash.
+    Unknown IDs are rejected by the Bloom filter with a 404.
+    """
+    result = get_certificate_verifier().verify(cert, request.args.get('hash'))
+    if result["blockchainHash"] is None:
+        return jsonify(result), 404
+    return jsonify(result)
+
+@app.route('/verify/bulk', methods=['POST'])
+def verify_certificates_bulk():
+    """
+    Verify many certificate IDs at once (customs and retail pallet scans).
+    Body: {"certificateIds": [...]}
+    """
+    body = request.get_json(silent=True)
+    certificate_ids = body.get('certificateIds') if isinstance(body, dict) else None
+    if not isinstance(certificate_ids, list) or not all(isinstance(c, str) for c in certificate_ids):
+        return jsonify({"error": "Expected a list of certificate IDs"}), 400
+    if len(certificate_ids) > VERIFY_BULK_LIMIT:
+        return jsonify({"error": f"At most {VERIFY_BULK_LIMIT} certificate IDs per request"}), 413
+    return jsonify(get_certificate_verifier().verify_many(certificate_ids))
+
+@app.route('/img')
+def image_variant():
+    """
+    Serve a resized product image.
+    ?src=<original URL>&w=<width in px>&fmt=webp|avif|jpeg (default: best format the client accepts)
+    """
+    src = request.args.get('src')
+    width = request.args.get('w', default=500, type=int)
+    if not src or not width or width <= 0:
+        return jsonify({"error": "src and a positive w are required"}), 400
+
+    fmt = pick_format(request.headers.get('Accept'), request.args.get('fmt'))
+    try:
+        path, key, mimetype = get_image_service().get_variant(src, width, fmt)
+    except ImageSourceNotAllowed as e:
+        return jsonify({"error": str(e)}), 403
+    except ImageSourceError as e:
+        return jsonify({"error": str(e)}), 502
+
+    response = send_file(path, mimetype=mimetype, etag=key, max_age=IMAGE_MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    response.vary.add('Accept')
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.registry.render(), content_type=metrics.PROMETHEUS_CONTENT_TYPE)
 
 @app.route('/health')
 def health():
     """Health check endpoint"""
-    return jsonify({"status": "ok", "service": "LV DPP Wallet Service"})
+    return jsonify({
+        "status": "ok",
+        "service": "LV DPP Wallet Service",
+        "qrCache": qr_cache.stats(),
+    })
 
 if __name__ == '__main__':
     print("=" * 60)
@@ -231,14 +1199,28 @@ if __name__ == '__main__':
     print("=" * 60)
     print("✅ Server running on: http://127.0.0.1:5000")
     print("📱 Wallet Preview: http://127.0.0.1:5000/preview-wallet")
+    print("🖼️  QR Image: http://127.0.0.1:5000/qr/<certificate>.png")
     print("🔗 API Endpoint: http://127.0.0.1:5000/generate-wallet-link")
+    print("📦 Bulk Endpoint: http://127.0.0.1:5000/generate-wallet-links")
+    print("🖼️  Product Images: http://127.0.0.1:5000/img?src=<url>&w=500")
+    print("🍎 Apple Wallet Pass: http://127.0.0.1:5000/apple-wallet/<certificate>.pkpass"
+          + ("" if apple_wallet_enabled() else " (set APPLE_PASS_CERT, APPLE_PASS_KEY, APPLE_WWDR_CERT, "
+                                               "APPLE_PASS_TYPE_ID and APPLE_TEAM_ID)"))
+    print("🔁 Transfers: http://127.0.0.1:5000/transfers"
+          + ("" if CLIENT_AUTH_SECRET else " (set CLIENT_AUTH_SECRET)"))
+    print("🛠️  Repairs: http://127.0.0.1:5000/repairs" + ("" if REPAIR_KEYS else " (set REPAIR_KEYS)"))
+    print("📊 Metrics: http://127.0.0.1:5000/metrics")
+    print("🎫 Google Wallet Links: http://127.0.0.1:5000/google-wallet/save-links"
+          + ("" if google_wallet_enabled() else " (set GOOGLE_WALLET_KEY_FILE and GOOGLE_WALLET_ISSUER_ID)"))
     print("=" * 60)
     print("\n💡 Features:")
     print("   ✅ Real QR code generation (matches certificate page)")
     print("   ✅ Same styling (#0d0b08 on #ffffff)")
     print("   ✅ Same verification URL format")
     print("   ✅ Scannable QR code in wallet preview")
+    print("   ✅ Cached QR rendering (set QR_CACHE_DIR to persist across restarts)")
     print("\n💡 Make sure your Next.js app is calling this endpoint!")
     print("   Frontend URL: http://localhost:3000/dpp/certificate\n")
-    
+
+    warm_up()
     app.run(port=5000, debug=True)